@@ -1,32 +1,85 @@
 from flask import Flask
 from flask_cors import CORS
+from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
-import os
+from .config import get_config, check_required
+from .utils.metrics import init_metrics
+from .utils.db import init_db
+from . import services
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# blueprint name -> "module:attribute", imported only when the app serves it
+BLUEPRINTS = {
+    'auth': 'app.routes.auth:auth_bp',
+    'users': 'app.routes.users:users_bp',
+    'hackathons': 'app.routes.hackathons:hackathons_bp',
+    'orgs': 'app.routes.orgs:orgs_bp',
+    'notifications': 'app.routes.notifications:notifications_bp',
+    'chat': 'app.routes.chat:chat_bp',
+    'calendar': 'app.routes.calendar:calendar_bp',
+}
+
+
+def register_blueprints(app):
+    """
+    Import and register the enabled blueprints (ENABLED_BLUEPRINTS, default all)
+    Route modules pull in their services (numpy, pypdf, ...), so a process
+    that only serves some of them doesn't pay for the others' imports.
+    """
+    names = app.config['ENABLED_BLUEPRINTS'] or list(BLUEPRINTS)
+    unknown = [n for n in names if n not in BLUEPRINTS]
+    if unknown:
+        raise ValueError(f"Unknown blueprints in ENABLED_BLUEPRINTS: {', '.join(unknown)}")
+
+    for name in names:
+        module_name, attribute = BLUEPRINTS[name].split(':')
+        started = time.perf_counter()
+        blueprint = getattr(importlib.import_module(module_name), attribute)
+        app.register_blueprint(blueprint)
+        logger.debug("Blueprint %s loaded in %.0fms", name, (time.perf_counter() - started) * 1000)
+
+
+def create_app(config_name=None):
+    started = time.perf_counter()
 
-def create_app():
     # Load environment variables
     load_dotenv()
-    
+
     app = Flask(__name__)
-    
-    # Configuration
-    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
-    app.config['MONGODB_URI'] = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub')
-    
+
+    # Configuration (see config.py)
+    app.config.from_object(get_config(config_name))
+    check_required(app.config)
+
     # Enable CORS
-    CORS(app, origins=os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(','))
-    
-    # Register blueprints (routes will be added later)
-    # from .routes import auth, users, hackathons, chat, orgs, notifications
-    # app.register_blueprint(auth.bp)
-    # app.register_blueprint(users.bp)
-    # app.register_blueprint(hackathons.bp)
-    # app.register_blueprint(chat.bp)
-    # app.register_blueprint(orgs.bp)
-    # app.register_blueprint(notifications.bp)
-    
+    CORS(app, origins=app.config['CORS_ORIGINS'])
+
+    JWTManager(app)
+
+    # MongoDB command metrics, query budget and GET /metrics
+    # (the command listener has to exist before the first MongoClient)
+    init_metrics(app)
+
+    # Pooled MongoDB connection - registered here, opened on first use in
+    # each worker (fork-safe with gunicorn --preload), see utils/db.py
+    init_db(app)
+
+    # model signal handlers (rollups, reminders, fan-out, calendar, badges)
+    # must run whichever blueprints this process serves
+    services.init()
+
+    register_blueprints(app)
+
     @app.route('/health')
     def health_check():
         return {'status': 'healthy', 'message': 'ThonHub API is running'}
-    
-    return app
\ No newline at end of file
+
+    elapsed = (time.perf_counter() - started) * 1000
+    if elapsed > app.config['STARTUP_BUDGET_MS']:
+        logger.warning("create_app took %.0fms (budget %dms)", elapsed, app.config['STARTUP_BUDGET_MS'])
+
+    return app
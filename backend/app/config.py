@@ -0,0 +1,111 @@
+"""
+App configuration
+
+Values come from the environment (and .env) with development defaults.
+Pick a class with APP_CONFIG=production|development|testing.
+"""
+import os
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+# class attributes are read at import time, so .env has to be loaded first
+load_dotenv()
+
+
+def _bool(name, default=False):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+# signing secret used by development and testing when none is set
+DEV_SECRET_KEY = 'dev-secret-key'
+
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.getenv('JWT_ACCESS_TOKEN_HOURS', 24)))
+    CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+
+    # MongoDB (see utils/db.py)
+    MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub')
+    # per worker process: gunicorn threads + background pools share one pool
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    # kept warm so the first requests after a quiet period don't pay for new sockets
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 2))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    # a request waiting longer than this for a pooled socket fails instead of piling up
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_APP_NAME = os.getenv('MONGO_APP_NAME', 'thonhub-api')
+    # off: indexes are created by `flask create-indexes`, not by each worker on first use
+    MONGO_AUTO_CREATE_INDEX = _bool('MONGO_AUTO_CREATE_INDEX', False)
+
+    # comma separated blueprint names to serve (empty = all, see BLUEPRINTS in app/__init__.py)
+    ENABLED_BLUEPRINTS = [b for b in os.getenv('ENABLED_BLUEPRINTS', '').split(',') if b]
+    # create_app() logs a warning when it takes longer than this
+    STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', 1500))
+
+    # live chat (routes/chat.py): open SSE streams per process, 0 = no cap.
+    # Each one holds a thread; gthread workers keep this well below
+    # GUNICORN_THREADS, the gevent stream server (gunicorn_stream.conf.py) raises it
+    CHAT_MAX_STREAMS = int(os.getenv('CHAT_MAX_STREAMS', 2))
+    # streams are closed after this long and the browser reconnects
+    CHAT_STREAM_MAX_SECONDS = int(os.getenv('CHAT_STREAM_MAX_SECONDS', 300))
+
+    # GET /metrics: bearer token, and the directory gunicorn workers share so
+    # that any of them can answer for all (utils/metrics.py)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_DIR = os.getenv('METRICS_DIR')
+
+    # create_app() refuses to start while any of these is empty
+    REQUIRED_SETTINGS = ()
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SECRET_KEY = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', SECRET_KEY)
+    # nobody runs the index step on a laptop
+    MONGO_AUTO_CREATE_INDEX = _bool('MONGO_AUTO_CREATE_INDEX', True)
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    # no fallback: tokens signed with a public default could be forged, and
+    # /metrics lists every route with its traffic
+    REQUIRED_SETTINGS = ('SECRET_KEY', 'JWT_SECRET_KEY', 'METRICS_TOKEN')
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', SECRET_KEY)
+    MONGODB_URI = os.getenv('MONGODB_TEST_URI', 'mongodb://localhost:27017/thonhub_test')
+    MONGO_AUTO_CREATE_INDEX = True
+    MONGO_MIN_POOL_SIZE = 0
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def get_config(name=None):
+    name = name or os.getenv('APP_CONFIG') or os.getenv('FLASK_ENV') or 'production'
+    return CONFIGS.get(name, ProductionConfig)
+
+
+def check_required(config):
+    """Raise if a REQUIRED_SETTINGS value is missing from the loaded config"""
+    missing = [name for name in config.get('REQUIRED_SETTINGS', ()) if not config.get(name)]
+    if missing:
+        raise RuntimeError(
+            f"Missing required settings: {', '.join(missing)} "
+            f"(set them in the environment or .env)"
+        )
@@ -0,0 +1,57 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    ReferenceField,
+    ObjectIdField,
+    DateTimeField,
+    IntField,
+    DictField
+)
+
+
+def encode_key(value):
+    """Make a string safe as a MongoDB field name ('node.js' -> 'node%2Ejs')"""
+    return str(value).replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+
+
+def decode_key(key):
+    return key.replace('%24', '$').replace('%2E', '.').replace('%25', '%')
+
+
+class HackathonStats(Document):
+    """
+    Pre-aggregated dashboard numbers for one hackathon
+
+    Kept current with $inc updates as registrations and views come in (see
+    services/analytics_service.py) and recomputed from scratch by the rebuild
+    job. Distribution fields are {encoded key: count} maps - use
+    decode_key() on the keys.
+    """
+
+    meta = {
+        'collection': 'hackathon_stats',
+        'indexes': [
+            {'fields': ['hackathon'], 'unique': True},
+            'organization'
+        ]
+    }
+
+    hackathon = ReferenceField('Hackathon', required=True)
+    organization = ObjectIdField()
+
+    registrations = IntField(default=0)
+    views = IntField(default=0)
+
+    # 'YYYY-MM-DD' -> count (sign-ups / views on that day)
+    registrations_by_day = DictField(default=dict)
+    views_by_day = DictField(default=dict)
+
+    # country -> approved participants, lowercase skill -> approved participants
+    countries = DictField(default=dict)
+    skills = DictField(default=dict)
+
+    # team size -> number of teams (recomputed by the rebuild job)
+    team_sizes = DictField(default=dict)
+
+    rebuilt_at = DateTimeField()
+    updated_at = DateTimeField(default=datetime.utcnow)
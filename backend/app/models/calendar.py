@@ -0,0 +1,73 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    ReferenceField,
+    DateTimeField,
+    IntField
+)
+from ..utils.dereference import raw_ref
+
+
+class CalendarEvent(Document):
+    """
+    One dated thing of a published hackathon, flattened for range queries
+
+    Hackathon dates (start/end, registration / submission deadlines, results)
+    and every Schedule item each become a row here, rewritten whenever the
+    hackathon is saved (see services/calendar_service.py). "What happens
+    between A and B" is then an index scan over (start, end) instead of
+    loading whole hackathon documents.
+
+    Deadlines are instants: end == start and duration == 0.
+    """
+
+    meta = {
+        'collection': 'calendar_events',
+        'indexes': [
+            {'fields': ['uid'], 'unique': True},
+            # range queries: start < B and end > A
+            ('start', 'end'),
+            ('hackathon', 'start'),
+            # the longest event bounds how far before A a range scan has to start
+            '-duration'
+        ]
+    }
+
+    # "<hackathon id>-<kind>[-<n>]", stable across syncs (also the ICS UID)
+    uid = StringField(required=True)
+    hackathon = ReferenceField('Hackathon', required=True)
+    hackathon_name = StringField()
+    hackathon_slug = StringField()
+
+    kind = StringField(
+        required=True,
+        choices=['hackathon', 'registration_deadline', 'submission_deadline', 'results', 'schedule']
+    )
+    title = StringField(required=True)
+    description = StringField()
+    location = StringField()
+    event_type = StringField()
+
+    start = DateTimeField(required=True)
+    end = DateTimeField(required=True)
+    duration = IntField(default=0, help_text="end - start in seconds")
+
+    # which sync wrote the row; rows from older syncs get deleted
+    sync_id = StringField()
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    def to_json(self):
+        return {
+            'id': self.uid,
+            'hackathon_id': str(raw_ref(self, 'hackathon')),
+            'hackathon_name': self.hackathon_name,
+            'hackathon_slug': self.hackathon_slug,
+            'kind': self.kind,
+            'title': self.title,
+            'description': self.description,
+            'location': self.location,
+            'event_type': self.event_type,
+            'start': self.start.isoformat() if self.start else None,
+            'end': self.end.isoformat() if self.end else None
+        }
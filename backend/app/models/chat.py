@@ -0,0 +1,123 @@
+from datetime import datetime
+from bson import ObjectId
+from mongoengine import (
+    Document,
+    EmbeddedDocument,
+    StringField,
+    DateTimeField,
+    IntField,
+    ListField,
+    EmbeddedDocumentField,
+    ObjectIdField
+)
+
+
+class ChatMessage(EmbeddedDocument):
+    """One message inside a ChatBucket"""
+    id = ObjectIdField(required=True)
+    sender = ObjectIdField()  # None for system messages
+    sender_name = StringField()  # copied in so history never needs a User lookup
+    kind = StringField(choices=['user', 'ai', 'system'], default='user')
+    text = StringField(required=True, max_length=4000)
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    def to_json(self):
+        return {
+            'id': str(self.id),
+            'sender_id': str(self.sender) if self.sender else None,
+            'sender_name': self.sender_name,
+            'kind': self.kind,
+            'text': self.text,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ChatBucket(Document):
+    """
+    A team's chat messages for one hour, at most BUCKET_SIZE of them
+
+    Messages are $push-ed into the team's open bucket (upserted when the hour
+    rolls over or the bucket is full), so the collection has one document per
+    team-hour instead of one per message, and the last 50 messages are one
+    indexed read of the newest bucket or two.
+    """
+
+    BUCKET_SIZE = 200
+
+    meta = {
+        'collection': 'chats',
+        'indexes': [
+            # history: newest buckets first, paged by message id
+            ('team', '-last_id'),
+            # the open bucket for appends
+            ('team', 'hour', 'count')
+        ]
+    }
+
+    team = StringField(required=True)  # same id as HackathonParticipation.team_id
+    hour = DateTimeField(required=True)
+    count = IntField(default=0)
+    first_id = ObjectIdField()
+    last_id = ObjectIdField()
+    messages = ListField(EmbeddedDocumentField(ChatMessage), default=list)
+
+    @classmethod
+    def append(cls, team_id, text, sender=None, sender_name=None, kind='user'):
+        """Store a message with one upsert; returns the ChatMessage"""
+        now = datetime.utcnow()
+        message = ChatMessage(
+            id=ObjectId(),
+            sender=sender,
+            sender_name=sender_name,
+            kind=kind,
+            text=text,
+            created_at=now
+        )
+        message.validate()
+
+        cls._get_collection().update_one(
+            {'team': team_id, 'hour': now.replace(minute=0, second=0, microsecond=0),
+             'count': {'$lt': cls.BUCKET_SIZE}},
+            {
+                '$push': {'messages': message.to_mongo().to_dict()},
+                '$inc': {'count': 1},
+                '$max': {'last_id': message.id},
+                '$min': {'first_id': message.id}
+            },
+            upsert=True
+        )
+        return message
+
+    @classmethod
+    def history(cls, team_id, limit=50, before=None, after=None):
+        """
+        Up to `limit` messages, oldest first
+        before=<id>: the page just older than that message (scrolling back)
+        after=<id>: everything newer than that message (catching up a reconnect)
+        """
+        query = {'team': team_id}
+        if before:
+            query['first_id'] = {'$lt': before}
+        if after:
+            query['last_id'] = {'$gt': after}
+
+        # newest buckets first; usually the first batch already has enough
+        buckets = cls._get_collection().find(
+            query, {'messages': 1}
+        ).sort('last_id', -1).batch_size(3)
+
+        messages = []
+        for bucket in buckets:
+            for raw in bucket.get('messages', []):
+                if (before and raw['id'] >= before) or (after and raw['id'] <= after):
+                    continue
+                messages.append(raw)
+            if not after and len(messages) >= limit:
+                break
+
+        messages.sort(key=lambda m: m['id'])
+        if after:
+            messages = messages[:limit]
+        else:
+            messages = messages[-limit:]
+        return [ChatMessage._from_son(m) for m in messages]
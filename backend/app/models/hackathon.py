@@ -14,9 +14,13 @@ from mongoengine import (
     FloatField,
     DictField
 )
+from mongoengine.errors import NotUniqueError
 from .user import User
 from .org import Organization
-from .team import Team
+from .registration import Registration
+from .signals import registration_changed
+from ..services.view_counter import view_counter
+from ..utils.dereference import ref_id, raw_ref, raw_refs, fetch_many, collect_refs
 
 # Embedded Documents (Sub-schemas)
 
@@ -124,6 +128,47 @@ class JudgingCriteria(EmbeddedDocument):
         }
 
 
+# Status lifecycle
+
+# stages a published hackathon moves through on its own, with the date field
+# that starts each one (advanced by services/status_scheduler.py)
+STATUS_LIFECYCLE = [
+    ('registration_open', 'registration_start'),
+    ('registration_closed', 'registration_deadline'),
+    ('ongoing', 'start_date'),
+    ('judging', 'end_date'),
+    ('completed', 'result_date'),
+]
+
+LIFECYCLE_FIELDS = ['status', 'is_published'] + [field for _, field in STATUS_LIFECYCLE]
+
+
+def plan_status(status, dates, now, is_published=True):
+    """
+    (status the hackathon should have at `now`, when it changes next or None)
+    `dates` maps the STATUS_LIFECYCLE fields to datetimes (a document works too).
+    Only ever moves forward, so a status an organizer set by hand isn't undone
+    until its next date passes. Drafts, unpublished, cancelled and completed
+    hackathons have no next transition.
+    """
+    stages = [stage for stage, _ in STATUS_LIFECYCLE]
+    if not is_published or (status != 'published' and status not in stages):
+        return status, None
+
+    position = stages.index(status) if status in stages else -1
+    for stage, field in STATUS_LIFECYCLE[position + 1:]:
+        boundary = dates.get(field) if isinstance(dates, dict) else getattr(dates, field, None)
+        if boundary is None:
+            if stage == 'registration_open':
+                # no registration_start: registration opens right away
+                status = stage
+            continue
+        if boundary > now:
+            return status, boundary
+        status = stage
+    return status, None
+
+
 # Main Hackathon Model
 
 class Hackathon(Document):
@@ -151,10 +196,58 @@ class Hackathon(Document):
             'start_date',
             'registration_deadline',
             'is_published',
-            'organization'
+            'organization',
+            # keyset pagination for GET /api/hackathons/
+            ('is_published', 'start_date', 'id'),
+            # same with ?status= (e.g. open for registration now)
+            ('is_published', 'status', 'start_date', 'id'),
+            # the status scheduler's only query
+            {'fields': ['next_transition_at'], 'sparse': True}
         ]
     }
     
+    # Keys accepted by ?fields= on listings (everything in the public to_json)
+    JSON_FIELDS = [
+        'id', 'name', 'slug', 'tagline', 'description', 'theme', 'logo_url',
+        'banner_url', 'images', 'organization', 'registration_start',
+        'registration_deadline', 'start_date', 'end_date', 'submission_deadline',
+        'result_date', 'mode', 'venue_name', 'venue_address', 'city', 'state',
+        'country', 'event_url', 'discord_url', 'slack_url', 'max_participants',
+        'min_team_size', 'max_team_size', 'allow_team_formation',
+        'require_approval', 'eligible_regions', 'min_age', 'eligibility_criteria',
+        'prizes', 'total_prize_pool', 'prize_currency', 'sponsors', 'tracks',
+        'schedule', 'faqs', 'rules', 'code_of_conduct', 'submission_guidelines',
+        'contact_email', 'social_links', 'hashtags', 'status', 'status_display',
+        'is_published', 'is_featured', 'view_count', 'registration_count',
+        'submission_count', 'created_at', 'updated_at', 'published_at'
+    ]
+    
+    # What a hackathon card needs (?view=summary)
+    SUMMARY_FIELDS = [
+        'id', 'name', 'slug', 'tagline', 'logo_url', 'organization',
+        'registration_deadline', 'start_date', 'end_date', 'mode', 'city',
+        'country', 'total_prize_pool', 'prize_currency', 'status',
+        'status_display', 'is_featured', 'registration_count'
+    ]
+    
+    # what get_status_label() shows for each stored status
+    STATUS_DISPLAY = {
+        'draft': 'Draft',
+        'published': 'Upcoming',
+        'registration_open': 'Upcoming',
+        'registration_closed': 'Upcoming',
+        'ongoing': 'Ongoing',
+        'judging': 'Ended',
+        'completed': 'Completed',
+        'cancelled': 'Cancelled'
+    }
+    
+    # JSON keys that are computed from other database fields
+    JSON_FIELD_SOURCES = {
+        'id': [],
+        'status_display': ['status']
+    }
+    
     # Basic Information
     name = StringField(
         required=True,
@@ -334,14 +427,17 @@ class Hackathon(Document):
     )
     
     # Participants & Teams
+    # NOTE: registrations now live in the `registrations` collection (see
+    # Registration). These two arrays are only read by
+    # Registration.migrate_embedded for documents created before the move.
     participants = ListField(
         ReferenceField(User),
         default=list,
-        help_text="Registered participants"
+        help_text="Legacy - registered participants"
     )
     
     teams = ListField(
-        ReferenceField(Team),
+        ReferenceField('Team'),
         default=list,
         help_text="Registered teams"
     )
@@ -349,7 +445,7 @@ class Hackathon(Document):
     pending_participants = ListField(
         ReferenceField(User),
         default=list,
-        help_text="Participants awaiting approval"
+        help_text="Legacy - participants awaiting approval"
     )
     
     # Judges
@@ -421,6 +517,12 @@ class Hackathon(Document):
         help_text="Current status of hackathon"
     )
     
+    # when the status scheduler next has to move `status` forward (None = never)
+    next_transition_at = DateTimeField()
+    status_changed_at = DateTimeField()
+    # which scheduler run made the last automatic transition
+    transition_id = StringField()
+    
     is_published = BooleanField(
         default=False,
         help_text="Whether hackathon is visible to public"
@@ -439,7 +541,7 @@ class Hackathon(Document):
     
     registration_count = IntField(
         default=0,
-        help_text="Number of registrations"
+        help_text="Number of approved registrations (kept in sync with $inc)"
     )
     
     submission_count = IntField(
@@ -472,24 +574,37 @@ class Hackathon(Document):
         """Override save to update timestamp"""
         self.updated_at = datetime.utcnow()
         
-        # Auto-update registration count
-        self.registration_count = len(self.participants)
-        
         # Calculate total prize pool
         if self.prizes:
             self.total_prize_pool = sum([p.amount or 0 for p in self.prizes])
         
+        # catch the status up with the dates and tell the scheduler when to look again
+        status, next_at = plan_status(self.status, self, self.updated_at, self.is_published)
+        if status != self.status:
+            self.status = status
+            self.status_changed_at = self.updated_at
+        if next_at != self.next_transition_at:
+            self.next_transition_at = next_at
+        
         return super(Hackathon, self).save(*args, **kwargs)
     
     def is_organizer(self, user):
         """Check if user is an organizer"""
-        return (user == self.created_by or 
-                user in self.organizers or 
+        user_id = ref_id(user)
+        return (user_id == raw_ref(self, 'created_by') or 
+                user_id in raw_refs(self, 'organizers') or 
                 (self.organization and self.organization.is_admin(user)))
     
+    def delete(self, *args, **kwargs):
+        """Override delete to drop this hackathon's registrations too"""
+        Registration.objects(hackathon=self.id).delete()
+        return super(Hackathon, self).delete(*args, **kwargs)
+    
     def is_registered(self, user):
         """Check if user is registered"""
-        return user in self.participants
+        return Registration.objects(
+            hackathon=self.id, user=user.id, status='approved'
+        ).only('id').first() is not None
     
     def is_judge(self, user):
         """Check if user is a judge"""
@@ -507,7 +622,7 @@ class Hackathon(Document):
             return False, "Registration has not started yet"
         
         # Check participant limit
-        if self.max_participants and len(self.participants) >= self.max_participants:
+        if self.max_participants and self.registration_count >= self.max_participants:
             return False, "Maximum participants reached"
         
         # Check status
@@ -516,6 +631,25 @@ class Hackathon(Document):
         
         return True, "Registration is open"
     
+    def _change_registration_count(self, amount):
+        """
+        Atomically $inc registration_count
+        When taking a seat the filter also enforces max_participants, so two
+        people can never grab the last seat at the same time.
+        """
+        query = {}
+        if amount > 0 and self.max_participants:
+            query['registration_count__lte'] = self.max_participants - amount
+        
+        updated = Hackathon.objects(id=self.id, **query).update_one(
+            inc__registration_count=amount
+        )
+        
+        if updated:
+            # keep our copy in step without marking the field as changed
+            self._data['registration_count'] = (self.registration_count or 0) + amount
+        return updated == 1
+    
     def register_participant(self, user):
         """Register a participant"""
         can_reg, message = self.can_register()
@@ -523,44 +657,65 @@ class Hackathon(Document):
         if not can_reg:
             return False, message
         
-        if self.is_registered(user):
-            return False, "Already registered"
-        
         if self.require_approval:
-            if user not in self.pending_participants:
-                self.pending_participants.append(user)
-                self.save()
-                return True, "Registration submitted for approval"
+            try:
+                Registration(hackathon=self, user=user, status='pending').save()
+            except NotUniqueError:
+                if self.is_registered(user):
+                    return False, "Already registered"
+                return False, "Registration already pending"
+            registration_changed.send(Hackathon, hackathon_id=self.id, user_id=user.id, status='pending')
+            return True, "Registration submitted for approval"
+        
+        # take a seat first, give it back if the user turns out to be registered
+        if not self._change_registration_count(1):
+            return False, "Maximum participants reached"
+        
+        try:
+            Registration(hackathon=self, user=user, status='approved').save()
+        except NotUniqueError:
+            self._change_registration_count(-1)
+            if self.is_registered(user):
+                return False, "Already registered"
             return False, "Registration already pending"
-        else:
-            self.participants.append(user)
-            self.save()
-            return True, "Registration successful"
+        
+        registration_changed.send(Hackathon, hackathon_id=self.id, user_id=user.id, status='approved')
+        return True, "Registration successful"
     
     def approve_participant(self, user):
         """Approve a pending participant"""
-        if user in self.pending_participants:
-            self.pending_participants.remove(user)
-            self.participants.append(user)
-            self.save()
-            return True
-        return False
+        if not self._change_registration_count(1):
+            return False
+        
+        approved = Registration.objects(
+            hackathon=self.id, user=user.id, status='pending'
+        ).update_one(set__status='approved', set__approved_at=datetime.utcnow())
+        
+        if not approved:
+            self._change_registration_count(-1)
+            return False
+        
+        registration_changed.send(Hackathon, hackathon_id=self.id, user_id=user.id, status='approved')
+        return True
     
     def unregister_participant(self, user):
         """Unregister a participant"""
-        if user in self.participants:
-            self.participants.remove(user)
-            self.save()
+        removed = Registration.objects(
+            hackathon=self.id, user=user.id, status='approved'
+        ).delete()
+        
+        if removed:
+            self._change_registration_count(-1)
+            registration_changed.send(Hackathon, hackathon_id=self.id, user_id=user.id, status=None)
             return True, "Unregistered successfully"
         return False, "Not registered"
     
     def add_team(self, team):
         """Add a team to hackathon"""
-        if team not in self.teams:
-            self.teams.append(team)
-            self.save()
-            return True
-        return False
+        updated = Hackathon.objects(id=self.id, teams__ne=team.id).update_one(
+            add_to_set__teams=team.id
+        )
+        return updated == 1
     
     def publish(self):
         """Publish the hackathon"""
@@ -570,32 +725,110 @@ class Hackathon(Document):
         self.save()
     
     def increment_views(self):
-        """Increment view count"""
-        self.view_count += 1
-        self.save()
-    
-    def get_status_display(self):
-        """Get human-readable status"""
-        now = datetime.utcnow()
-        
-        if self.status == 'completed':
-            return 'Completed'
-        elif self.status == 'cancelled':
-            return 'Cancelled'
-        elif now < self.start_date:
-            return 'Upcoming'
-        elif now >= self.start_date and now <= self.end_date:
-            return 'Ongoing'
-        elif now > self.end_date:
-            return 'Ended'
-        else:
-            return self.status.replace('_', ' ').title()
+        """
+        Increment view count
+        Buffered in memory and flushed as bulk $inc (see services/view_counter.py)
+        """
+        view_counter.increment(self.id)
+    
+    def get_view_count(self):
+        """Stored view count plus views not flushed yet"""
+        return (self.view_count or 0) + view_counter.pending(self.id)
+    
+    def get_status_label(self):
+        """
+        Get human-readable status
+        From the stored status only - the status scheduler keeps it in step
+        with the dates, so serializing doesn't need the dates or the clock.
+        (Not get_status_display: mongoengine sets that on every instance of a
+        document with a `choices` field, hiding a method of the same name.)
+        """
+        return self.STATUS_DISPLAY.get(self.status) or self.status.replace('_', ' ').title()
     
     def __str__(self):
         return f"Hackathon: {self.name}"
     
-    def to_json(self, include_private=False):
-        """Convert to JSON-friendly dictionary"""
+    @classmethod
+    def projection_for(cls, fields):
+        """Database fields to pass to .only() so `fields` can be serialized"""
+        db_fields = set()
+        for key in fields:
+            db_fields.update(cls.JSON_FIELD_SOURCES.get(key, [key]))
+        return list(db_fields)
+    
+    @classmethod
+    def to_json_many(cls, hackathons, include_private=False, fields=None):
+        """
+        Serialize a list of hackathons without N+1 queries
+        Organizations (and registrations, for the private view) are loaded
+        once for the whole page instead of once per hackathon.
+        """
+        hackathons = list(hackathons)
+        
+        organizations = {}
+        if fields is None or 'organization' in fields:
+            organizations = fetch_many(
+                Organization,
+                collect_refs(hackathons, 'organization'),
+                ['name', 'logo_url']
+            )
+        
+        registrations = None
+        if include_private:
+            registrations = Registration.user_ids_by_hackathon([h.id for h in hackathons])
+        
+        return [
+            h.to_json(
+                include_private=include_private,
+                organizations=organizations,
+                registrations=registrations and registrations[h.id],
+                fields=fields
+            )
+            for h in hackathons
+        ]
+    
+    def _json_field(self, key, organizations=None):
+        """Serialize a single public field (used for sparse fieldsets)"""
+        if key == 'id':
+            return str(self.id)
+        if key == 'organization':
+            return self._organization_json(organizations)
+        if key == 'status_display':
+            return self.get_status_label()
+        if key == 'view_count':
+            return self.get_view_count()
+        
+        value = getattr(self, key)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, list) and value and hasattr(value[0], 'to_json'):
+            return [v.to_json() for v in value]
+        return value
+    
+    def _organization_json(self, organizations=None):
+        """Organization summary, from the prefetched map when we have one"""
+        if organizations is None:
+            org = self.organization
+        else:
+            org = organizations.get(raw_ref(self, 'organization'))
+        
+        if not org:
+            return None
+        return {
+            'id': str(org.id),
+            'name': org.name,
+            'logo_url': org.logo_url
+        }
+    
+    def to_json(self, include_private=False, organizations=None, registrations=None, fields=None):
+        """
+        Convert to JSON-friendly dictionary
+        organizations / registrations: prefetched data from to_json_many
+        fields: only build these keys (see JSON_FIELDS / SUMMARY_FIELDS)
+        """
+        if fields is not None:
+            return {key: self._json_field(key, organizations) for key in fields}
+        
         data = {
             'id': str(self.id),
             'name': self.name,
@@ -608,11 +841,7 @@ class Hackathon(Document):
             'images': self.images,
             
             # Organization
-            'organization': {
-                'id': str(self.organization.id),
-                'name': self.organization.name,
-                'logo_url': self.organization.logo_url
-            } if self.organization else None,
+            'organization': self._organization_json(organizations),
             
             # Dates
             'registration_start': self.registration_start.isoformat() if self.registration_start else None,
@@ -672,12 +901,12 @@ class Hackathon(Document):
             
             # Status
             'status': self.status,
-            'status_display': self.get_status_display(),
+            'status_display': self.get_status_label(),
             'is_published': self.is_published,
             'is_featured': self.is_featured,
             
             # Stats
-            'view_count': self.view_count,
+            'view_count': self.get_view_count(),
             'registration_count': self.registration_count,
             'submission_count': self.submission_count,
             
@@ -689,11 +918,15 @@ class Hackathon(Document):
         
         # Include private data only if requested (for organizers)
         if include_private:
+            if registrations is None:
+                registrations = Registration.user_ids_by_hackathon([self.id])[self.id]
+            
+            # ids straight from the raw references - no need to load the documents
             data.update({
-                'participants': [str(p.id) for p in self.participants],
-                'pending_participants': [str(p.id) for p in self.pending_participants],
-                'teams': [str(t.id) for t in self.teams],
-                'judges': [str(j.id) for j in self.judges],
+                'participants': [str(uid) for uid in registrations['approved']],
+                'pending_participants': [str(uid) for uid in registrations['pending']],
+                'teams': [str(tid) for tid in raw_refs(self, 'teams')],
+                'judges': [str(jid) for jid in raw_refs(self, 'judges')],
                 'judging_criteria': [c.to_json() for c in self.judging_criteria],
             })
         
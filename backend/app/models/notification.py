@@ -0,0 +1,157 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    ReferenceField,
+    DateTimeField,
+    BooleanField,
+    IntField,
+    DictField,
+    ObjectIdField
+)
+from ..utils.dereference import raw_ref
+
+
+class Notification(Document):
+    """
+    In-app notification for one user
+
+    Written in bulk (insert_many) by the fan-out in services/fanout_service.py.
+    The unique (job, user) index makes a resumed fan-out safe to re-run: rows
+    that already exist are rejected instead of duplicated.
+
+    Fan-out rows for users who get email carry the email's delivery state, so
+    mail that was queued in a process that then died is found and sent again.
+    email_claim names the process holding the email; it renews
+    email_queued_at while it does, so only rows of a dead process go stale.
+    """
+
+    meta = {
+        'collection': 'notifications',
+        'indexes': [
+            ('user', '-id'),
+            ('user', 'is_read'),
+            {'fields': ['job', 'user'], 'unique': True, 'sparse': True},
+            # unsent fan-out emails (FanoutRunner.resend_pending_emails)
+            {'fields': ['email_status', 'email_queued_at'], 'sparse': True},
+            # claim renewal by the holding process (EmailQueue.renew)
+            {'fields': ['email_claim'], 'sparse': True}
+        ]
+    }
+
+    user = ReferenceField('User', required=True)
+    hackathon = ReferenceField('Hackathon')
+    # the fan-out job that created this notification, if any
+    job = ObjectIdField()
+
+    type = StringField(
+        required=True,
+        choices=['hackathon_update', 'reminder', 'system'],
+        default='system'
+    )
+    title = StringField(required=True, max_length=300)
+    message = StringField(max_length=5000)
+    data = DictField(default=dict)
+
+    is_read = BooleanField(default=False)
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    # email copy: pending until the channel took it, unset = no email wanted
+    email_status = StringField(choices=['pending', 'sent', 'failed', 'skipped'])
+    email_queued_at = DateTimeField()
+    email_sent_at = DateTimeField()
+    email_error = StringField()
+    # the process (EmailQueue.owner) holding it, unset once the channel answered
+    email_claim = StringField()
+    # times it was queued; it's marked failed after FANOUT_EMAIL_ATTEMPTS
+    email_attempts = IntField(default=0)
+
+    def to_json(self):
+        return {
+            'id': str(self.id),
+            'type': self.type,
+            'title': self.title,
+            'message': self.message,
+            'hackathon_id': str(raw_ref(self, 'hackathon')) if raw_ref(self, 'hackathon') else None,
+            'data': self.data,
+            'is_read': self.is_read,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class FanoutJob(Document):
+    """
+    "Tell every participant of hackathon X about Y"
+
+    Recipients are streamed in user-id order and `last_user` is checkpointed
+    after every batch, so an interrupted job continues right after the last
+    finished batch instead of starting over.
+    """
+
+    meta = {
+        'collection': 'fanout_jobs',
+        'indexes': [
+            ('status', 'heartbeat_at'),
+            ('hackathon', '-created_at')
+        ]
+    }
+
+    hackathon = ReferenceField('Hackathon', required=True)
+    event = StringField(
+        required=True,
+        choices=['schedule_changed', 'status_changed', 'dates_changed', 'announcement']
+    )
+    title = StringField(required=True, max_length=300)
+    message = StringField(max_length=5000)
+    changes = DictField(default=dict)
+
+    status = StringField(
+        required=True,
+        choices=['pending', 'running', 'completed', 'failed'],
+        default='pending'
+    )
+
+    # progress
+    total = IntField(default=0)
+    processed = IntField(default=0)
+    notified = IntField(default=0)
+    emails_queued = IntField(default=0)
+    # updated by the email sender threads once the channel answered
+    emails_sent = IntField(default=0)
+    emails_failed = IntField(default=0)
+    last_user = ObjectIdField()
+
+    # which worker is running it, and when it last made progress
+    claimed_by = StringField()
+    heartbeat_at = DateTimeField()
+    last_error = StringField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+
+    def progress(self):
+        """0-100"""
+        if self.status == 'completed':
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(min(self.processed / self.total, 1) * 100, 1)
+
+    def to_json(self):
+        return {
+            'id': str(self.id),
+            'hackathon_id': str(raw_ref(self, 'hackathon')),
+            'event': self.event,
+            'title': self.title,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'notified': self.notified,
+            'emails_queued': self.emails_queued,
+            'emails_sent': self.emails_sent,
+            'emails_failed': self.emails_failed,
+            'progress': self.progress(),
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
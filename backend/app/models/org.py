@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from mongoengine import (
     Document, 
@@ -8,9 +9,12 @@ from mongoengine import (
     ReferenceField,
     DateTimeField,
     BooleanField,
-    IntField
+    IntField,
+    DictField
 )
 from .user import User  # Assuming User model exists
+from ..utils.cache import SharedVersion
+from ..utils.dereference import ref_id, raw_ref, raw_refs
 
 class Organization(Document):
     
@@ -20,10 +24,27 @@ class Organization(Document):
             'name',
             'email',
             'is_verified',
-            'created_at'
+            'created_at',
+            # keyset pagination for GET /api/orgs/
+            ('created_at', 'id'),
+            ('is_verified', 'created_at', 'id')
         ]
     }
     
+    # Keys accepted by ?fields= on listings
+    JSON_FIELDS = [
+        'id', 'name', 'slug', 'description', 'logo_url', 'email', 'phone',
+        'website', 'address', 'city', 'state', 'country', 'postal_code',
+        'social_links', 'is_verified', 'is_active', 'hackathons_count',
+        'created_at', 'updated_at'
+    ]
+    
+    # ?view=summary
+    SUMMARY_FIELDS = [
+        'id', 'name', 'slug', 'logo_url', 'city', 'country',
+        'is_verified', 'hackathons_count'
+    ]
+    
     # ===== BASIC INFORMATION =====
     name = StringField(
         required=True, 
@@ -75,13 +96,10 @@ class Organization(Document):
     postal_code = StringField(max_length=20)
     
    
-    social_links = {
-        'twitter': URLField(),
-        'linkedin': URLField(),
-        'github': URLField(),
-        'facebook': URLField(),
-        'instagram': URLField()
-    }
+    social_links = DictField(
+        default=dict,
+        help_text="Social profiles, e.g. {'twitter': url, 'github': url}"
+    )
     
     
     owner = ReferenceField(
@@ -131,61 +149,151 @@ class Organization(Document):
     )
     
     
+    # bumped by every write below; cached org responses (routes/orgs.py) check it
+    cache_version = SharedVersion('organizations', ttl=int(os.getenv('ORG_CACHE_VERSION_TTL', 5)))
+    
     def save(self, *args, **kwargs):
         """Override save to update the 'updated_at' timestamp"""
         self.updated_at = datetime.utcnow()
-        return super(Organization, self).save(*args, **kwargs)
+        result = super(Organization, self).save(*args, **kwargs)
+        Organization.cache_version.bump()
+        return result
+    
+    def delete(self, *args, **kwargs):
+        super(Organization, self).delete(*args, **kwargs)
+        Organization.cache_version.bump()
+    
+    def _changed(self, updated):
+        """Bump the cache version when a guarded update matched"""
+        if updated:
+            Organization.cache_version.bump()
+        return updated == 1
     
     def add_admin(self, user):
-        """Add a user as admin if not already an admin"""
-        if user not in self.admins:
-            self.admins.append(user)
-            self.save()
-            return True
-        return False
+        """
+        Add a user as admin if not already an admin
+        Single atomic $addToSet - the $ne guard makes the matched count tell us
+        whether anything actually changed
+        """
+        updated = Organization.objects(id=self.id, admins__ne=user.id).update_one(
+            add_to_set__admins=user.id,
+            set__updated_at=datetime.utcnow()
+        )
+        return self._changed(updated)
     
     def remove_admin(self, user):
-        """Remove a user from admins"""
-        if user in self.admins:
-            self.admins.remove(user)
-            self.save()
-            return True
-        return False
+        """Remove a user from admins (atomic $pull)"""
+        updated = Organization.objects(id=self.id, admins=user.id).update_one(
+            pull__admins=user.id,
+            set__updated_at=datetime.utcnow()
+        )
+        return self._changed(updated)
     
     def add_member(self, user):
-        """Add a user as member"""
-        if user not in self.members and user not in self.admins:
-            self.members.append(user)
-            self.save()
-            return True
-        return False
+        """Add a user as member (skipped if already a member or admin)"""
+        updated = Organization.objects(
+            id=self.id,
+            members__ne=user.id,
+            admins__ne=user.id
+        ).update_one(
+            add_to_set__members=user.id,
+            set__updated_at=datetime.utcnow()
+        )
+        return self._changed(updated)
     
     def remove_member(self, user):
-        """Remove a user from members"""
-        if user in self.members:
-            self.members.remove(user)
-            self.save()
-            return True
-        return False
+        """Remove a user from members (atomic $pull)"""
+        updated = Organization.objects(id=self.id, members=user.id).update_one(
+            pull__members=user.id,
+            set__updated_at=datetime.utcnow()
+        )
+        return self._changed(updated)
+    
+    def add_members_bulk(self, user_ids, role='member'):
+        """
+        Add many users in one round trip
+        Runs as a single update with an aggregation pipeline so the check against
+        the existing lists happens on the server - no read-modify-write race.
+        Users who are already admins are never added as plain members.
+        Returns the list of ids that were actually added.
+        """
+        field = 'admins' if role == 'admin' else 'members'
+        
+        # dedupe but keep the caller's order
+        user_ids = list(dict.fromkeys(user_ids))
+        
+        # only ids not already present (members also skip admins)
+        existing = ['$' + field] if field == 'admins' else ['$members', '$admins']
+        new_ids = {
+            '$filter': {
+                'input': user_ids,
+                'cond': {
+                    '$not': {
+                        '$in': ['$$this', {'$concatArrays': [
+                            {'$ifNull': [e, []]} for e in existing
+                        ]}]
+                    }
+                }
+            }
+        }
+        
+        before = Organization._get_collection().find_one_and_update(
+            {'_id': self.id},
+            [{'$set': {
+                field: {'$concatArrays': [{'$ifNull': ['$' + field, []]}, new_ids]},
+                'updated_at': datetime.utcnow()
+            }}],
+            projection={'admins': 1, 'members': 1}
+        )
+        
+        if before is None:
+            return []
+        
+        # work out what changed from the pre-image
+        present = set(before.get(field, []))
+        if field == 'members':
+            present.update(before.get('admins', []))
+        added = [uid for uid in user_ids if uid not in present]
+        self._changed(len(added))
+        return added
+    
+    # The checks below compare ids from the raw references, so they work with
+    # a User or a lightweight Principal and never load the referenced users
     
     def is_owner(self, user):
         """Check if user is the owner"""
-        return self.owner == user
+        return raw_ref(self, 'owner') == ref_id(user)
     
     def is_admin(self, user):
         """Check if user is an admin or owner"""
-        return user == self.owner or user in self.admins
+        user_id = ref_id(user)
+        return user_id == raw_ref(self, 'owner') or user_id in raw_refs(self, 'admins')
     
     def is_member(self, user):
         """Check if user is a member, admin, or owner"""
-        return user == self.owner or user in self.admins or user in self.members
+        return self.is_admin(user) or ref_id(user) in raw_refs(self, 'members')
     
     def __str__(self):
         """String representation"""
         return f"Organization: {self.name}"
     
-    def to_json(self):
-        """Convert to JSON-friendly dictionary"""
+    @classmethod
+    def projection_for(cls, fields):
+        """Database fields to pass to .only() so `fields` can be serialized"""
+        return [key for key in fields if key != 'id']
+    
+    def to_json(self, fields=None):
+        """
+        Convert to JSON-friendly dictionary
+        fields: only build these keys (see JSON_FIELDS / SUMMARY_FIELDS)
+        """
+        if fields is not None:
+            data = {}
+            for key in fields:
+                value = str(self.id) if key == 'id' else getattr(self, key)
+                data[key] = value.isoformat() if isinstance(value, datetime) else value
+            return data
+        
         return {
             'id': str(self.id),
             'name': self.name,
@@ -0,0 +1,105 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    ReferenceField,
+    DateTimeField
+)
+from pymongo.errors import BulkWriteError
+
+
+class Registration(Document):
+    """
+    One user's registration for one hackathon
+
+    Lives in its own collection instead of the old Hackathon.participants /
+    pending_participants arrays, so a hackathon document stays small no matter
+    how many people sign up. Hackathon.registration_count is kept in sync with
+    atomic $inc updates by the Hackathon model methods.
+    """
+
+    meta = {
+        'collection': 'registrations',
+        'indexes': [
+            {'fields': ['hackathon', 'user'], 'unique': True},
+            # also serves "participants in user-id order" for streaming fan-outs
+            ('hackathon', 'status', 'user'),
+            'user'
+        ]
+    }
+
+    # string refs so this module doesn't need to import hackathon.py
+    hackathon = ReferenceField('Hackathon', required=True)
+    user = ReferenceField('User', required=True)
+
+    status = StringField(
+        required=True,
+        choices=['pending', 'approved'],
+        default='approved',
+        help_text="pending = waiting for organizer approval"
+    )
+
+    registered_at = DateTimeField(default=datetime.utcnow)
+    approved_at = DateTimeField()
+
+    @classmethod
+    def user_ids(cls, hackathon_id, status='approved'):
+        """Ids of registered users without dereferencing a single User"""
+        docs = cls.objects(hackathon=hackathon_id, status=status).only('user').as_pymongo()
+        return [d['user'] for d in docs]
+
+    @classmethod
+    def user_ids_by_hackathon(cls, hackathon_ids):
+        """
+        Registered user ids for a whole page of hackathons in one query
+        Returns {hackathon_id: {'approved': [...], 'pending': [...]}}
+        """
+        result = {hid: {'approved': [], 'pending': []} for hid in hackathon_ids}
+        docs = cls.objects(hackathon__in=list(hackathon_ids)).only(
+            'hackathon', 'user', 'status'
+        ).as_pymongo()
+        for d in docs:
+            result[d['hackathon']][d['status']].append(d['user'])
+        return result
+
+    @classmethod
+    def migrate_embedded(cls, hackathon):
+        """
+        Move a hackathon's legacy participants/pending_participants arrays into
+        the registrations collection. Safe to re-run: existing rows are skipped.
+        """
+        from .hackathon import Hackathon
+
+        raw = Hackathon.objects(id=hackathon.id).only(
+            'participants', 'pending_participants'
+        ).as_pymongo().first() or {}
+
+        rows = [
+            {'hackathon': hackathon.id, 'user': uid, 'status': 'approved',
+             'registered_at': datetime.utcnow()}
+            for uid in raw.get('participants', [])
+        ] + [
+            {'hackathon': hackathon.id, 'user': uid, 'status': 'pending',
+             'registered_at': datetime.utcnow()}
+            for uid in raw.get('pending_participants', [])
+        ]
+
+        if rows:
+            try:
+                cls._get_collection().insert_many(rows, ordered=False)
+            except BulkWriteError as e:
+                # duplicates from an earlier run are fine; anything else must not
+                # get past here, the legacy arrays are dropped below
+                if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                    raise
+
+        approved = cls.objects(hackathon=hackathon.id, status='approved').count()
+        Hackathon.objects(id=hackathon.id).update_one(
+            set__registration_count=approved,
+            unset__participants=True,
+            unset__pending_participants=True
+        )
+        return approved
+
+    def __str__(self):
+        return f"Registration: {self.user} -> {self.hackathon} ({self.status})"
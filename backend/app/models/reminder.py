@@ -0,0 +1,77 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    ReferenceField,
+    DateTimeField,
+    IntField
+)
+from ..utils.dereference import raw_ref
+
+
+class Reminder(Document):
+    """
+    One reminder for one user, due at `send_at`
+
+    Rows are created ahead of time for every registered participant (see
+    services/notification_service.py) and moved through
+    pending -> sending -> sent by the dispatcher. A row is only ever claimed
+    by flipping pending -> sending with an atomic update, so two dispatchers
+    (or one restarted dispatcher) can't send the same reminder twice.
+    """
+
+    meta = {
+        'collection': 'reminders',
+        'indexes': [
+            # the dispatcher's only query: due pending reminders in send_at order
+            ('status', 'send_at'),
+            {'fields': ['dedupe_key'], 'unique': True},
+            ('hackathon', 'status'),
+            ('user', 'status', 'send_at')
+        ]
+    }
+
+    user = ReferenceField('User', required=True)
+    hackathon = ReferenceField('Hackathon')
+
+    kind = StringField(
+        required=True,
+        choices=['registration_deadline', 'start', 'submission_deadline', 'schedule', 'custom']
+    )
+    channel = StringField(default='email', help_text="Name of a registered delivery channel")
+
+    subject = StringField(required=True, max_length=300)
+    body = StringField(max_length=5000)
+
+    send_at = DateTimeField(required=True)
+    status = StringField(
+        required=True,
+        choices=['pending', 'sending', 'sent', 'failed', 'cancelled'],
+        default='pending'
+    )
+
+    # hackathon:kind:ref:user:send_at - re-scheduling the same reminder is a no-op
+    dedupe_key = StringField(required=True)
+    # last sync run that (re)scheduled this row - older pending rows are stale
+    sync_id = StringField()
+
+    claimed_by = StringField()
+    claimed_at = DateTimeField()
+    attempts = IntField(default=0)
+    last_error = StringField()
+    sent_at = DateTimeField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    def to_json(self):
+        return {
+            'id': str(self.id),
+            'hackathon_id': str(raw_ref(self, 'hackathon')) if raw_ref(self, 'hackathon') else None,
+            'kind': self.kind,
+            'channel': self.channel,
+            'subject': self.subject,
+            'body': self.body,
+            'send_at': self.send_at.isoformat() if self.send_at else None,
+            'status': self.status,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -0,0 +1,53 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    DateTimeField,
+    IntField,
+    ListField,
+    DictField
+)
+
+
+class ResumeAnalysis(Document):
+    """
+    Cached result of analyzing one resume file
+
+    Keyed by the SHA-256 of the file's bytes plus the analyzer version, so a
+    re-upload of the same file (or the same file uploaded by someone else)
+    skips text extraction and matching entirely. Bumping ANALYZER_VERSION in
+    services/ai_resume_service.py makes old entries miss.
+    """
+
+    meta = {
+        'collection': 'resume_analyses',
+        'indexes': [
+            {'fields': ['content_hash', 'analyzer_version'], 'unique': True},
+            'created_at'
+        ]
+    }
+
+    content_hash = StringField(required=True)
+    analyzer_version = IntField(required=True)
+
+    file_type = StringField(choices=['pdf', 'docx', 'text'])
+    text_length = IntField(default=0)
+
+    skills = ListField(StringField(), default=list)
+    # plain dicts shaped like User.Education / User.Experience (dates as strings)
+    education = ListField(DictField(), default=list)
+    experience = ListField(DictField(), default=list)
+    error = StringField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    def to_json(self):
+        return {
+            'content_hash': self.content_hash,
+            'file_type': self.file_type,
+            'skills': self.skills,
+            'education': self.education,
+            'experience': self.experience,
+            'error': self.error,
+            'analyzed_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,28 @@
+"""
+Model signals that mongoengine doesn't provide
+
+mongoengine only fires pre/post save and delete. Several model methods write
+with atomic updates instead of save(), so listeners (leaderboard, analytics,
+...) subscribe to these instead.
+"""
+from blinker import Namespace
+
+_signals = Namespace()
+
+# User._commit_changes wrote an atomic update
+# kwargs: document (the synced User), fields (set of top-level fields touched)
+user_changes_committed = _signals.signal('user_changes_committed')
+
+# a registration was created, approved or removed (Hackathon.register_participant,
+# approve_participant, unregister_participant)
+# kwargs: hackathon_id, user_id, status ('pending' / 'approved' / None = removed)
+registration_changed = _signals.signal('registration_changed')
+
+# buffered hackathon views were written (services/view_counter.py)
+# kwargs: counts ({hackathon_id: views added})
+views_flushed = _signals.signal('views_flushed')
+
+# the status scheduler moved hackathons forward with a bulk update, which
+# bypasses post_save (services/status_scheduler.py)
+# kwargs: transitions ([(hackathon_id, old status, new status)])
+status_transitioned = _signals.signal('status_transitioned')
@@ -0,0 +1,50 @@
+from datetime import datetime
+from mongoengine import (
+    Document,
+    StringField,
+    ReferenceField,
+    ListField,
+    DateTimeField
+)
+
+
+class Team(Document):
+    """
+    A team inside one hackathon
+
+    Members also carry the team id in their hackathon participation record
+    (User.HackathonParticipation.team_id).
+    """
+
+    meta = {
+        'collection': 'teams',
+        'indexes': [
+            {'fields': ['hackathon', 'name'], 'unique': True},
+            'members'
+        ]
+    }
+
+    # string refs so this module doesn't need to import hackathon.py / user.py
+    hackathon = ReferenceField('Hackathon', required=True)
+    name = StringField(required=True, max_length=100)
+    leader = ReferenceField('User')
+    members = ListField(ReferenceField('User'), default=list)
+    project_name = StringField(max_length=200)
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    def to_json(self):
+        # ids straight from the stored document, without loading the references
+        doc = self.to_mongo()
+        return {
+            'id': str(self.id),
+            'hackathon_id': str(doc['hackathon']),
+            'name': self.name,
+            'leader_id': str(doc['leader']) if doc.get('leader') else None,
+            'member_ids': [str(m) for m in doc.get('members', [])],
+            'project_name': self.project_name,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __str__(self):
+        return f"Team: {self.name}"
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from datetime import datetime
 from mongoengine import (
     Document,
@@ -14,8 +15,10 @@ from mongoengine import (
     FileField,
     DictField
 )
-from werkzeug.security import generate_password_hash, check_password_hash
+from pymongo import ReturnDocument
 import secrets
+from ..utils.password_hasher import password_hasher, HasherBusy
+from .signals import user_changes_committed
 
 
 # EMBEDDED DOCUMENTS
@@ -201,7 +204,11 @@ class User(Document):
             'username',  # and username
             'is_active',
             'role',
-            'created_at'
+            'created_at',
+            # per-process caches (leaderboards, teammate matcher) catch up on recent saves
+            'updated_at',
+            # personal calendar feeds are looked up by their secret token
+            {'fields': ['calendar_token'], 'unique': True, 'sparse': True}
         ]
     }
     
@@ -331,6 +338,9 @@ class User(Document):
     show_email = BooleanField(default=False)  # show email on public profile?
     show_resume = BooleanField(default=True)
     
+    # secret part of the personal calendar (ICS) feed URL - rotate to revoke
+    calendar_token = StringField()
+    
     # USER ROLE & STATUS
     
     role = StringField(
@@ -381,12 +391,36 @@ class User(Document):
         return super(User, self).save(*args, **kwargs)
     
     def set_password(self, password):
-        """Hash and set password - never store plain text!"""
-        self.password_hash = generate_password_hash(password)
+        """
+        Hash and set password - never store plain text!
+        bcrypt runs in a bounded worker pool (utils/password_hasher.py) and can
+        raise HasherBusy when the pool is saturated
+        """
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """
+        Verify password against hash
+        On success, old werkzeug hashes (or a different bcrypt cost) are
+        transparently upgraded to the configured algorithm/cost. The upgrade
+        is best effort: with the hasher pool saturated it waits for the next
+        login instead of failing this one.
+        """
+        if not password_hasher.verify(password, self.password_hash):
+            return False
+        
+        if password_hasher.needs_rehash(self.password_hash):
+            try:
+                new_hash = password_hasher.hash(password)
+            except HasherBusy:
+                return True
+            # only if nobody changed the password in the meantime
+            User.objects(id=self.id, password_hash=self.password_hash).update_one(
+                set__password_hash=new_hash
+            )
+            self._data['password_hash'] = new_hash
+        
+        return True
     
     def generate_verification_token(self):
         """Create a token for email verification"""
@@ -411,6 +445,12 @@ class User(Document):
         self.save()
         return self.reset_token
     
+    def generate_calendar_token(self):
+        """New calendar feed token (the old feed URL stops working)"""
+        self.calendar_token = secrets.token_urlsafe(32)
+        User.objects(id=self.id).update_one(set__calendar_token=self.calendar_token)
+        return self.calendar_token
+    
     def reset_password(self, token, new_password):
         """Reset password with valid token"""
         if not self.reset_token or not self.reset_token_expires:
@@ -429,17 +469,165 @@ class User(Document):
         self.save()
         return True, "Password reset successful"
     
+    # UNIT OF WORK
+    # add_xp, award_badge, add_education/experience/project and the hackathon
+    # counters don't call save() - each one records its change, and the changes
+    # are written as ONE atomic update (instead of a full-document save per
+    # call). Outside a batch every call is its own small update; inside
+    #
+    #     with user.batch():
+    #         user.add_xp(50)
+    #         user.award_badge(...)
+    #
+    # everything goes out together when the block ends.
+    
+    _pending_changes = None
+    
+    @contextmanager
+    def batch(self):
+        """Collect changes and commit them as a single update"""
+        if self._pending_changes is not None:
+            # nested batch - the outer one commits
+            yield self
+            return
+        
+        self._pending_changes = {'inc': {}, 'push': {}}
+        try:
+            yield self
+            changes = self._pending_changes
+        finally:
+            self._pending_changes = None
+        
+        self._commit_changes(changes)
+    
+    def _record_changes(self, inc=None, push=None):
+        """
+        Apply a change locally and queue it for the database
+        Outside a batch returns what _commit_changes did, inside one None.
+        """
+        inc = inc or {}
+        push = push or {}
+        
+        # keep the in-memory user up to date so later checks see the new values
+        for field, amount in inc.items():
+            setattr(self, field, (getattr(self, field) or 0) + amount)
+        for field, docs in push.items():
+            getattr(self, field).extend(docs)
+        if 'xp' in inc:
+            self.level = (self.xp // 100) + 1
+        
+        pending = self._pending_changes
+        if pending is None:
+            return self._commit_changes({'inc': inc, 'push': push})
+        
+        for field, amount in inc.items():
+            pending['inc'][field] = pending['inc'].get(field, 0) + amount
+        for field, docs in push.items():
+            pending['push'].setdefault(field, []).extend(docs)
+    
+    def _commit_changes(self, changes):
+        """
+        Write queued $inc / $push changes in one update, level computed by MongoDB
+        Returns the names of the badges the update really added.
+        """
+        if not changes['inc'] and not changes['push']:
+            return set()
+        
+        if self.id is None:
+            # not in the database yet - a normal insert covers everything
+            self.save()
+            return {badge.name for badge in changes['push'].get('badges', [])}
+        
+        # aggregation-pipeline update: lets us $inc, $push and $set in one go
+        # and derive level from the new xp on the server
+        stage = {'updated_at': datetime.utcnow()}
+        
+        for field, amount in changes['inc'].items():
+            stage[field] = {'$add': [{'$ifNull': ['$' + field, 0]}, amount]}
+        
+        for field, docs in changes['push'].items():
+            parts = [{'$ifNull': ['$' + field, []]}]
+            for doc in docs:
+                raw = doc.to_mongo().to_dict() if isinstance(doc, EmbeddedDocument) else doc
+                value = {'$literal': [raw]}
+                if field == 'badges':
+                    # never give the same badge twice, even under concurrent awards
+                    # ($literal: a name starting with '$' would be read as a field path)
+                    value = {'$cond': [
+                        {'$in': [{'$literal': doc.name}, {'$ifNull': ['$badges.name', []]}]},
+                        [],
+                        value
+                    ]}
+                elif field == 'skills':
+                    value = {'$cond': [
+                        {'$in': [{'$literal': doc}, {'$ifNull': ['$skills', []]}]},
+                        [],
+                        value
+                    ]}
+                parts.append(value)
+            stage[field] = {'$concatArrays': parts}
+        
+        pipeline = [
+            {'$set': stage},
+            {'$set': {'level': {'$add': [{'$floor': {'$divide': ['$xp', 100]}}, 1]}}}
+        ]
+        
+        touched = set(stage) | {'level'}
+        # the document as it was: the update is atomic, so this shows exactly
+        # which guarded pushes went through, and the new values follow from it
+        before = User._get_collection().find_one_and_update(
+            {'_id': self.id},
+            pipeline,
+            projection={field: 1 for field in touched | {'xp'}},
+            return_document=ReturnDocument.BEFORE
+        )
+        
+        awarded = set()
+        if before is not None:
+            after = {'updated_at': stage['updated_at']}
+            for field, amount in changes['inc'].items():
+                after[field] = (before.get(field) or 0) + amount
+            for field, docs in changes['push'].items():
+                values = list(before.get(field) or [])
+                present = {v.get('name') for v in values} if field == 'badges' else set(values)
+                for doc in docs:
+                    if field == 'badges':
+                        if doc.name in present:
+                            continue
+                        awarded.add(doc.name)
+                    elif field == 'skills' and doc in present:
+                        continue
+                    values.append(doc.to_mongo().to_dict() if isinstance(doc, EmbeddedDocument) else doc)
+                after[field] = values
+            after['level'] = (after.get('xp', before.get('xp')) or 0) // 100 + 1
+            
+            # sync with what the database now has
+            for field in touched:
+                setattr(self, field, self._fields[field].to_python(after.get(field)))
+        
+        # forget these as "changed"
+        self._changed_fields = [
+            f for f in self._changed_fields if f.split('.')[0] not in touched
+        ]
+        
+        user_changes_committed.send(User, document=self, fields=touched)
+        return awarded
+    
     def add_xp(self, amount, reason=""):
         """Add XP and return if leveled up"""
         old_level = self.level
-        self.xp += amount
-        self.save()  # this will auto-calculate new level
+        self._record_changes(inc={'xp': amount})
         
         leveled_up = self.level > old_level
         return leveled_up, self.level
     
     def award_badge(self, name, description, icon="🏆", category="achievement", metadata=None):
-        """Give user a badge - yay achievements!"""
+        """
+        Give user a badge - yay achievements!
+        (True, badge) only when the database really added it: a concurrent award
+        makes the guarded update skip it and this returns False. Inside a batch()
+        the badge is only queued, the guard decides when the batch commits.
+        """
         # check if they already have this badge
         existing = [b for b in self.badges if b.name == name]
         if existing:
@@ -452,14 +640,16 @@ class User(Document):
             category=category,
             metadata=metadata or {}
         )
+        badge.validate()
         
-        self.badges.append(badge)
-        self.save()
+        awarded = self._record_changes(push={'badges': [badge]})
+        if awarded is not None and name not in awarded:
+            return False, "Badge already earned"
         return True, badge
     
     def add_hackathon_participation(self, hackathon_id, hackathon_name, role='participant', 
                                    team_id=None, project_name=None, award=None):
-        """Record hackathon participation"""
+        """Record hackathon participation (one database write for all of it)"""
         participation = HackathonParticipation(
             hackathon_id=hackathon_id,
             hackathon_name=hackathon_name,
@@ -468,33 +658,27 @@ class User(Document):
             project_name=project_name,
             award=award
         )
+        participation.validate()
         
-        self.hackathon_participation.append(participation)
-        
-        # update counters
-        if role == 'participant':
-            self.hackathons_participated += 1
-            # award some XP for participating
-            self.add_xp(50, f"Participated in {hackathon_name}")
-        
-        if award:
-            self.hackathons_won += 1
-            # more XP for winning!
-            self.add_xp(200, f"Won award in {hackathon_name}")
-        
-        if role == 'organizer':
-            self.hackathons_organized += 1
-        
-        self.save()
-        
-        # maybe award a badge for first hackathon?
-        if self.hackathons_participated == 1:
-            self.award_badge(
-                "First Hackathon",
-                "Participated in your first hackathon!",
-                "🚀",
-                "participation"
-            )
+        with self.batch():
+            self._record_changes(push={'hackathon_participation': [participation]})
+            
+            # update counters
+            if role == 'participant':
+                self._record_changes(inc={'hackathons_participated': 1})
+                # award some XP for participating
+                self.add_xp(50, f"Participated in {hackathon_name}")
+            
+            if award:
+                self._record_changes(inc={'hackathons_won': 1})
+                # more XP for winning!
+                self.add_xp(200, f"Won award in {hackathon_name}")
+            
+            if role == 'organizer':
+                self._record_changes(inc={'hackathons_organized': 1})
+            
+            # badges ("First Hackathon", "5 Wins", ...) are awarded by the rules in
+            # services/badge_service.py once this update is committed
     
     def add_education(self, institution, degree, **kwargs):
         """Add education entry"""
@@ -503,8 +687,8 @@ class User(Document):
             degree=degree,
             **kwargs
         )
-        self.education.append(edu)
-        self.save()
+        edu.validate()
+        self._record_changes(push={'education': [edu]})
         return edu
     
     def add_experience(self, company, position, start_date, **kwargs):
@@ -515,8 +699,8 @@ class User(Document):
             start_date=start_date,
             **kwargs
         )
-        self.experience.append(exp)
-        self.save()
+        exp.validate()
+        self._record_changes(push={'experience': [exp]})
         return exp
     
     def add_project(self, name, description, **kwargs):
@@ -526,10 +710,22 @@ class User(Document):
             description=description,
             **kwargs
         )
-        self.projects.append(project)
-        self.save()
+        project.validate()
+        self._record_changes(push={'projects': [project]})
         return project
     
+    def add_skills(self, skills):
+        """Add skills the user doesn't list yet (case-insensitive); returns the added ones"""
+        known = {s.lower() for s in self.skills}
+        new = []
+        for skill in skills:
+            if skill and skill.lower() not in known:
+                known.add(skill.lower())
+                new.append(skill)
+        if new:
+            self._record_changes(push={'skills': new})
+        return new
+    
     @staticmethod
     def generate_referral_code():
         """Generate unique 8-character referral code"""
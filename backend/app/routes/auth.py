@@ -0,0 +1,94 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import create_access_token
+from mongoengine.errors import NotUniqueError, ValidationError
+from ..models.user import User
+from ..utils.password_hasher import HasherBusy
+
+auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+# only what login needs - not the whole profile
+LOGIN_FIELDS = ['password_hash', 'is_active', 'is_banned']
+
+
+def busy_response():
+    """503 when the password hashing pool is saturated"""
+    response = jsonify({'error': 'Too many login attempts right now, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+#REGISTER
+@auth_bp.route('/register', methods=['POST'])
+def register():
+    """Create an account and return an access token"""
+    try:
+        data = request.get_json() or {}
+
+        for field in ['email', 'username', 'password']:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+
+        if len(data['password']) < 8:
+            return jsonify({'error': 'Password must be at least 8 characters'}), 400
+
+        user = User(
+            email=data['email'].lower(),
+            username=data['username'],
+            first_name=data.get('first_name'),
+            last_name=data.get('last_name')
+        )
+        user.set_password(data['password'])
+        user.save()
+
+        return jsonify({
+            'message': 'Account created successfully',
+            'access_token': create_access_token(identity=str(user.id)),
+            'user': user.to_json(include_private=True)
+        }), 201
+
+    except HasherBusy:
+        return busy_response()
+
+    except NotUniqueError:
+        return jsonify({'error': 'Email or username already in use'}), 409
+
+    except ValidationError as e:
+        return jsonify({'error': f'Validation error: {str(e)}'}), 400
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#LOGIN
+@auth_bp.route('/login', methods=['POST'])
+def login():
+    """Check email + password and return an access token"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('email') or not data.get('password'):
+            return jsonify({'error': 'Email and password are required'}), 400
+
+        user = User.objects(email=data['email'].lower()).only(*LOGIN_FIELDS).first()
+
+        # check_password also upgrades old hashes on success
+        if not user or not user.check_password(data['password']):
+            return jsonify({'error': 'Invalid email or password'}), 401
+
+        if not user.is_active or user.is_banned:
+            return jsonify({'error': 'Your account is inactive or banned'}), 403
+
+        # atomic update - saving the partially loaded user would clobber other fields
+        now = datetime.utcnow()
+        User.objects(id=user.id).update_one(set__last_login=now, set__last_active=now)
+
+        return jsonify({
+            'message': 'Logged in successfully',
+            'access_token': create_access_token(identity=str(user.id))
+        }), 200
+
+    except HasherBusy:
+        return busy_response()
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, request, jsonify, url_for, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models.calendar import CalendarEvent
+from ..models.user import User
+from ..services.calendar_service import calendar_store, MAX_RANGE_DAYS
+from ..utils.pagination import parse_limit
+
+calendar_bp = Blueprint('calendar', __name__, url_prefix='/api/calendar')
+
+EVENT_KINDS = CalendarEvent.kind.choices
+
+
+def parse_time(value, default):
+    """ISO 8601 query arg -> naive UTC datetime"""
+    if not value:
+        return default
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def feed_url(token):
+    return url_for('calendar.user_feed', token=token, _external=True)
+
+
+def ics_response(body, etag):
+    response = Response(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    # calendar apps poll, let them keep a copy for a few minutes
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+#GET EVENTS IN RANGE
+@calendar_bp.route('/events', methods=['GET'])
+def get_events():
+    """
+    Everything happening between ?start= and ?end= (ISO dates, default: next 31 days)
+    ?kind=schedule,submission_deadline&hackathon_id=<id>,<id>
+    """
+    try:
+        try:
+            start = parse_time(request.args.get('start'), datetime.utcnow())
+            end = parse_time(request.args.get('end'), start + timedelta(days=31))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if end <= start:
+            return jsonify({'error': 'end must be after start'}), 400
+        if end - start > timedelta(days=MAX_RANGE_DAYS):
+            return jsonify({'error': f'Range can be at most {MAX_RANGE_DAYS} days'}), 400
+
+        kinds = [k.strip() for k in request.args.get('kind', '').split(',') if k.strip()]
+        unknown = [k for k in kinds if k not in EVENT_KINDS]
+        if unknown:
+            return jsonify({'error': f"Unknown event kinds: {', '.join(unknown)}"}), 400
+
+        try:
+            hackathon_ids = [
+                ObjectId(h.strip()) for h in request.args.get('hackathon_id', '').split(',') if h.strip()
+            ]
+        except InvalidId:
+            return jsonify({'error': 'Invalid hackathon id'}), 400
+
+        limit = parse_limit(request.args, 500, 2000)
+        events = calendar_store.between(start, end, kinds=kinds, hackathon_ids=hackathon_ids, limit=limit)
+
+        return jsonify({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'count': len(events),
+            'events': [e.to_json() for e in events]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#GET MY FEED URL
+@calendar_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_feed_url():
+    """Personal ICS feed URL to subscribe to in Google Calendar / Outlook / Apple Calendar"""
+    try:
+        user = User.objects.only('calendar_token').get(id=get_jwt_identity())
+        token = user.calendar_token or user.generate_calendar_token()
+        return jsonify({'url': feed_url(token)}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#ROTATE MY FEED URL
+@calendar_bp.route('/feed/rotate', methods=['POST'])
+@jwt_required()
+def rotate_feed_url():
+    """New feed URL, the old one stops working (e.g. after it was shared by accident)"""
+    try:
+        user = User.objects.only('calendar_token').get(id=get_jwt_identity())
+        return jsonify({'url': feed_url(user.generate_calendar_token())}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#PERSONAL ICS FEED
+@calendar_bp.route('/feeds/<token>.ics', methods=['GET'])
+def user_feed(token):
+    """
+    iCalendar feed of the hackathons the token's owner is registered for
+    No JWT (calendar apps can't send one), the token in the URL is the secret.
+    Conditional: an unchanged feed is answered with 304 before anything is rendered.
+    """
+    try:
+        user = User.objects(calendar_token=token).only('id', 'username').first()
+        if user is None:
+            return jsonify({'error': 'Feed not found'}), 404
+
+        versions = calendar_store.feed_versions(user.id)
+        etag = calendar_store.feed_etag(user.id, versions)
+
+        if etag in request.if_none_match:
+            response = ics_response('', etag)
+            response.status_code = 304
+            return response
+
+        body = calendar_store.render_feed(versions, name=f'ThonHub ({user.username})')
+        return ics_response(body, etag)
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
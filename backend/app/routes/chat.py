@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models.chat import ChatBucket
+from ..models.user import User
+from ..services.chat_broker import chat_broker
+from ..utils.cache import TTLCache
+from ..utils.pagination import parse_limit
+
+chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
+
+# (user id, team id) -> bool, so live chat doesn't query users on every message
+membership_cache = TTLCache(maxsize=10000, ttl=60)
+
+# seconds between SSE keep-alive comments
+HEARTBEAT_INTERVAL = 15
+# ms a client waits before reconnecting when this process has no free stream slot
+BUSY_RETRY_MS = 5000
+
+
+class StreamSlots:
+    """
+    Counts the SSE streams open in this process
+    Each stream holds a worker thread for as long as the client stays
+    connected, so with gthread workers (gunicorn.conf.py) they are capped
+    at CHAT_MAX_STREAMS per process to leave threads for the API. The
+    stream server (gunicorn_stream.conf.py, gevent) allows thousands.
+    """
+
+    def __init__(self):
+        self._open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, limit):
+        with self._lock:
+            if limit and self._open >= limit:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._open -= 1
+
+
+stream_slots = StreamSlots()
+
+
+def is_team_member(user_id, team_id):
+    """Team membership comes from the users' hackathon participation records"""
+    key = (str(user_id), team_id)
+    member = membership_cache.get(key)
+    if member is None:
+        member = User.objects(
+            id=user_id, hackathon_participation__team_id=team_id
+        ).only('id').first() is not None
+        membership_cache.set(key, member)
+    return member
+
+
+def parse_message_id(value):
+    if not value:
+        return None
+    try:
+        return ObjectId(value)
+    except InvalidId:
+        raise ValueError('Invalid message id')
+
+
+def sse_event(message):
+    return f"id: {message['id']}\nevent: message\ndata: {json.dumps(message)}\n\n"
+
+
+#GET CHAT HISTORY
+@chat_bp.route('/<team_id>', methods=['GET'])
+@jwt_required()
+def get_messages(team_id):
+    """
+    Latest messages of a team chat, oldest first
+    Scroll back with ?before=<next_before>
+    """
+    try:
+        if not is_team_member(get_jwt_identity(), team_id):
+            return jsonify({'error': 'You are not a member of this team'}), 403
+
+        limit = parse_limit(request.args, 50, 200)
+        try:
+            before = parse_message_id(request.args.get('before'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        messages = ChatBucket.history(team_id, limit=limit, before=before)
+
+        return jsonify({
+            'count': len(messages),
+            'messages': [m.to_json() for m in messages],
+            'next_before': str(messages[0].id) if len(messages) == limit else None
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#SEND MESSAGE
+@chat_bp.route('', methods=['POST'])
+@jwt_required()
+def send_message():
+    """Post a message to a team chat ({"team_id": ..., "text": ...})"""
+    try:
+        data = request.get_json() or {}
+        team_id = data.get('team_id')
+        text = (data.get('text') or '').strip()
+
+        if not team_id or not text:
+            return jsonify({'error': 'team_id and text are required'}), 400
+
+        user_id = get_jwt_identity()
+        if not is_team_member(user_id, team_id):
+            return jsonify({'error': 'You are not a member of this team'}), 403
+
+        user = User.objects.only('username').get(id=user_id)
+        message = ChatBucket.append(team_id, text, sender=user.id, sender_name=user.username)
+
+        payload = message.to_json()
+        chat_broker.publish(team_id, payload)
+
+        return jsonify({'message': payload}), 201
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#LIVE CHAT STREAM
+@chat_bp.route('/<team_id>/stream', methods=['GET'])
+@jwt_required()
+def stream_messages(team_id):
+    """
+    Server-Sent Events stream of new messages
+    Browsers send Last-Event-ID when they reconnect; anything missed since
+    then is replayed from storage before live messages. Streams end after
+    CHAT_STREAM_MAX_SECONDS and the browser reconnects, so a slot is never
+    held for good.
+    """
+    if not is_team_member(get_jwt_identity(), team_id):
+        return jsonify({'error': 'You are not a member of this team'}), 403
+
+    try:
+        last_id = parse_message_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+    if not stream_slots.acquire(current_app.config['CHAT_MAX_STREAMS']):
+        # EventSource gives up on an error status, but reconnects after
+        # `retry` when a 200 stream ends - by then a slot may be free
+        return Response(f"retry: {BUSY_RETRY_MS}\n\n", mimetype='text/event-stream', headers=headers)
+
+    max_seconds = current_app.config['CHAT_STREAM_MAX_SECONDS']
+
+    # subscribe before replaying so nothing slips through in between
+    subscription = chat_broker.subscribe(team_id)
+
+    def events():
+        try:
+            opened = time.monotonic()
+            yield "retry: 3000\n\n"
+            sent = set()
+            if last_id:
+                for message in ChatBucket.history(team_id, limit=500, after=last_id):
+                    payload = message.to_json()
+                    sent.add(payload['id'])
+                    yield sse_event(payload)
+
+            last_beat = time.monotonic()
+            while time.monotonic() - opened < max_seconds:
+                payload = subscription.get(timeout=HEARTBEAT_INTERVAL)
+                if payload is not None and payload['id'] not in sent:
+                    yield sse_event(payload)
+                if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+                    last_beat = time.monotonic()
+                    yield ": keep-alive\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+    # runs even when the client leaves before the generator starts
+    response.call_on_close(subscription.close)
+    response.call_on_close(stream_slots.release)
+    return response
@@ -0,0 +1,203 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from mongoengine.errors import DoesNotExist, ValidationError
+from ..models.hackathon import Hackathon
+from ..utils.fieldsets import parse_fieldset, apply_fieldset
+from ..utils.pagination import keyset_page, parse_limit, InvalidCursor
+from ..utils.dereference import fetch_many
+from ..services.search_service import search_index
+from ..services.export_service import parse_export_fields, participant_rows, stream_csv, stream_ndjson
+from ..services.analytics_service import hackathon_dashboard, empty_dashboard
+from ..models.analytics import HackathonStats
+from ..utils.auth_utils import principal_required, get_current_principal
+
+hackathons_bp = Blueprint('hackathons', __name__, url_prefix='/api/hackathons')
+
+
+#LIST HACKATHONS
+@hackathons_bp.route('/', methods=['GET'])
+def get_hackathons():
+    """
+    List published hackathons
+    Filters: mode, status, country, featured
+    Defaults to the summary view - pass ?view=detail or ?fields=... for more
+    Ordered by start date, paginate with ?cursor=<next_cursor>
+    """
+    try:
+        limit = parse_limit(request.args, 20, 100)
+        cursor = request.args.get('cursor')
+
+        try:
+            fields = parse_fieldset(request.args, Hackathon, default_view='summary')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Build query
+        query = {'is_published': True}
+        for key in ['mode', 'status', 'country']:
+            if request.args.get(key):
+                query[key] = request.args[key]
+
+        if request.args.get('featured') is not None:
+            query['is_featured'] = request.args['featured'].lower() == 'true'
+
+        hackathons = apply_fieldset(Hackathon.objects(**query), Hackathon, fields, extra=['start_date'])
+
+        try:
+            hackathons, next_cursor = keyset_page(hackathons, 'start_date', limit, cursor)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+        hackathons_list = Hackathon.to_json_many(hackathons, fields=fields)
+
+        return jsonify({
+            'count': len(hackathons_list),
+            'hackathons': hackathons_list,
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#SEARCH HACKATHONS
+@hackathons_bp.route('/search', methods=['GET'])
+def search_hackathons():
+    """
+    Ranked keyword search (BM25) for the search bar
+    ?q=climate ai&mode=online&status=registration_open&country=India
+    """
+    try:
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'Search query (q) is required'}), 400
+
+        limit = parse_limit(request.args, 20, 100)
+
+        try:
+            fields = parse_fieldset(request.args, Hackathon, default_view='summary')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        search_index.ensure_built()
+        filters = {name: request.args.get(name) for name in ('mode', 'status', 'country')}
+        results = search_index.search(q, limit=limit, **filters)
+
+        # load the hits in one query, then put them back in ranked order
+        projection = Hackathon.projection_for(fields or Hackathon.JSON_FIELDS)
+        found = fetch_many(Hackathon, [hid for hid, _ in results], projection)
+
+        # hits deleted through another worker (catch_up only sees saves):
+        # drop them from this worker's index and fill the page again
+        missing = [hid for hid, _ in results if hid not in found]
+        if missing:
+            for hid in missing:
+                search_index.remove(hid)
+            results = search_index.search(q, limit=limit, **filters)
+            found.update(fetch_many(Hackathon, [hid for hid, _ in results if hid not in found], projection))
+
+        hits = [(found[hid], score) for hid, score in results if hid in found]
+
+        hackathons_list = Hackathon.to_json_many([h for h, _ in hits], fields=fields)
+        for data, (_, score) in zip(hackathons_list, hits):
+            data['score'] = round(score, 4)
+
+        return jsonify({
+            'count': len(hackathons_list),
+            'hackathons': hackathons_list
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#GET SINGLE HACKATHON
+@hackathons_bp.route('/<hackathon_id>', methods=['GET'])
+def get_hackathon(hackathon_id):
+    """Get full details of a hackathon (counts as a view)"""
+    try:
+        hackathon = Hackathon.objects.get(id=hackathon_id, is_published=True)
+        hackathon.increment_views()
+        return jsonify(hackathon.to_json()), 200
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Hackathon not found'}), 404
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#HACKATHON ANALYTICS
+@hackathons_bp.route('/<hackathon_id>/analytics', methods=['GET'])
+@principal_required
+def get_hackathon_analytics(hackathon_id):
+    """
+    Dashboard numbers for one hackathon (organizers only)
+    Read from the materialized hackathon_stats rollup, never aggregated here
+    """
+    try:
+        hackathon = Hackathon.objects.only(
+            'created_by', 'organizers', 'organization'
+        ).get(id=hackathon_id)
+
+        if not hackathon.is_organizer(get_current_principal()):
+            return jsonify({'error': 'Only organizers can view analytics'}), 403
+
+        stats = HackathonStats.objects(hackathon=hackathon.id).first()
+        payload = hackathon_dashboard(stats) if stats else empty_dashboard(hackathon.id)
+        return jsonify({'analytics': payload}), 200
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Hackathon not found'}), 404
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#EXPORT PARTICIPANTS
+@hackathons_bp.route('/<hackathon_id>/participants/export', methods=['GET'])
+@principal_required
+def export_participants(hackathon_id):
+    """
+    Stream approved participants as CSV or NDJSON (organizers only)
+    ?format=csv|ndjson&fields=username,email,skills,country,hackathons_won,badges
+    ?skills=python,react&badges=First Win - only participants with any of these
+    """
+    try:
+        hackathon = Hackathon.objects.only(
+            'slug', 'created_by', 'organizers', 'organization'
+        ).get(id=hackathon_id)
+
+        if not hackathon.is_organizer(get_current_principal()):
+            return jsonify({'error': 'Only organizers can export participants'}), 403
+
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+        try:
+            fields = parse_export_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        skills = [s.strip() for s in request.args.get('skills', '').split(',') if s.strip()]
+        badges = [b.strip() for b in request.args.get('badges', '').split(',') if b.strip()]
+
+        batches = participant_rows(hackathon.id, fields, skills=skills, badges=badges)
+        if export_format == 'csv':
+            body, mimetype = stream_csv(batches, fields), 'text/csv'
+        else:
+            body, mimetype = stream_ndjson(batches), 'application/x-ndjson'
+
+        filename = f"{hackathon.slug or hackathon.id}-participants-{datetime.utcnow():%Y%m%d}.{export_format}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Hackathon not found'}), 404
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
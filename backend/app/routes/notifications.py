@@ -0,0 +1,166 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from mongoengine.errors import DoesNotExist, ValidationError
+from ..models.hackathon import Hackathon
+from ..models.notification import Notification, FanoutJob
+from ..models.reminder import Reminder
+from ..services.fanout_service import fanout_runner
+from ..utils.auth_utils import principal_required, get_current_principal
+from ..utils.dereference import raw_ref
+from ..utils.pagination import parse_limit
+
+notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
+
+
+#MY NOTIFICATIONS
+@notifications_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_notifications():
+    """
+    Current user's in-app notifications, newest first
+    ?unread=true, page with ?before=<next_before>
+    """
+    try:
+        limit = parse_limit(request.args, 20, 100)
+
+        query = {'user': get_jwt_identity()}
+        if request.args.get('unread', '').lower() == 'true':
+            query['is_read'] = False
+        if request.args.get('before'):
+            try:
+                query['id__lt'] = ObjectId(request.args['before'])
+            except InvalidId:
+                return jsonify({'error': 'Invalid cursor'}), 400
+
+        notifications = list(Notification.objects(**query).order_by('-id').limit(limit + 1))
+        next_before = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_before = str(notifications[-1].id)
+
+        return jsonify({
+            'count': len(notifications),
+            'unread': Notification.objects(user=get_jwt_identity(), is_read=False).count(),
+            'notifications': [n.to_json() for n in notifications],
+            'next_before': next_before
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#MARK NOTIFICATIONS READ
+@notifications_bp.route('/read', methods=['POST'])
+@jwt_required()
+def mark_read():
+    """Mark some ({"ids": [...]}) or all of your notifications as read"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        query = {'user': get_jwt_identity(), 'is_read': False}
+        if data.get('ids'):
+            try:
+                query['id__in'] = [ObjectId(i) for i in data['ids']]
+            except (InvalidId, TypeError):
+                return jsonify({'error': 'Invalid notification id'}), 400
+
+        updated = Notification.objects(**query).update(set__is_read=True)
+
+        return jsonify({'message': 'Notifications marked as read', 'updated': updated}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#FAN-OUT PROGRESS
+@notifications_bp.route('/fanouts/<job_id>', methods=['GET'])
+@principal_required
+def get_fanout(job_id):
+    """Progress of a hackathon update being sent to all participants (organizers only)"""
+    try:
+        job = FanoutJob.objects.get(id=job_id)
+        hackathon = Hackathon.objects.only('created_by', 'organizers', 'organization').get(id=raw_ref(job, 'hackathon'))
+
+        if not hackathon.is_organizer(get_current_principal()):
+            return jsonify({'error': 'You do not have permission to view this job'}), 403
+
+        return jsonify({'job': job.to_json()}), 200
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Job not found'}), 404
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#RESUME FAN-OUT
+@notifications_bp.route('/fanouts/<job_id>/resume', methods=['POST'])
+@principal_required
+def resume_fanout(job_id):
+    """Continue a failed or stalled fan-out from its last checkpoint"""
+    try:
+        job = FanoutJob.objects.get(id=job_id)
+        hackathon = Hackathon.objects.only('created_by', 'organizers', 'organization').get(id=raw_ref(job, 'hackathon'))
+
+        if not hackathon.is_organizer(get_current_principal()):
+            return jsonify({'error': 'You do not have permission to resume this job'}), 403
+
+        if job.status == 'completed':
+            return jsonify({'error': 'Job already completed'}), 400
+
+        fanout_runner.submit(job.id)
+        return jsonify({'message': 'Fan-out resumed', 'job': job.to_json()}), 202
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Job not found'}), 404
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#MY UPCOMING REMINDERS
+@notifications_bp.route('/reminders', methods=['GET'])
+@jwt_required()
+def get_reminders():
+    """Pending reminders for the current user, soonest first"""
+    try:
+        limit = parse_limit(request.args, 50, 200)
+
+        query = {'user': get_jwt_identity(), 'status': 'pending'}
+        if request.args.get('hackathon_id'):
+            query['hackathon'] = request.args['hackathon_id']
+
+        reminders = list(Reminder.objects(**query).order_by('send_at').limit(limit))
+
+        return jsonify({
+            'count': len(reminders),
+            'reminders': [r.to_json() for r in reminders]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#CANCEL REMINDER
+@notifications_bp.route('/reminders/<reminder_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_reminder(reminder_id):
+    """Stop one of your own reminders from being sent"""
+    try:
+        try:
+            reminder_id = ObjectId(reminder_id)
+        except InvalidId:
+            return jsonify({'error': 'Reminder not found'}), 404
+
+        # only while it's still pending - once claimed by the dispatcher it's on its way
+        cancelled = Reminder.objects(
+            id=reminder_id, user=get_jwt_identity(), status='pending'
+        ).update_one(set__status='cancelled')
+
+        if not cancelled:
+            return jsonify({'error': 'Reminder not found or already sent'}), 404
+
+        return jsonify({'message': 'Reminder cancelled'}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -1,12 +1,41 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from mongoengine import signals
 from mongoengine.errors import NotUniqueError, ValidationError, DoesNotExist
 from ..models.org import Organization
 from ..models.user import User
+from ..utils.dereference import raw_ref, raw_refs, fetch_many
+from ..utils.fieldsets import parse_fieldset, apply_fieldset
+from ..utils.pagination import keyset_page, parse_limit, InvalidCursor
+from ..utils.cache import TTLCache, cached_response, make_etag
+from ..utils.auth_utils import principal_required, get_current_principal
+from ..models.analytics import HackathonStats
+from ..services.analytics_service import organization_dashboard
+from bson import ObjectId
+from bson.errors import InvalidId
+import os
 import re
 
 orgs_bp = Blueprint('orgs', __name__, url_prefix='/api/orgs')
 
+# cap for POST /<org_id>/members with a list of user ids
+MAX_BULK_MEMBERS = 500
+
+# cached responses of the public read endpoints (list, by id, by slug)
+org_cache = TTLCache(
+    maxsize=int(os.getenv('ORG_CACHE_SIZE', 2048)),
+    ttl=int(os.getenv('ORG_CACHE_TTL', 60))
+)
+
+
+def invalidate_org_cache(sender, document, **kwargs):
+    """Any org change can affect every listing page, so drop the whole cache
+    (only this worker's - the others notice through Organization.cache_version)"""
+    org_cache.clear()
+
+
+signals.post_save.connect(invalidate_org_cache, sender=Organization)
+signals.post_delete.connect(invalidate_org_cache, sender=Organization)
+
 def create_slug(name):
     """Create a URL-friendly slug from organization name"""
     slug = name.lower()
@@ -17,13 +46,12 @@ def create_slug(name):
 
 #CREATE ORGANIZATION
 @orgs_bp.route('/', methods=['POST'])
-@jwt_required()  # User must be logged in
+@principal_required  # User must be logged in (and not banned)
 def create_organization():
     """Create a new organization"""
     try:
-        # Get current user from JWT token
-        current_user_id = get_jwt_identity()
-        current_user = User.objects.get(id=current_user_id)
+        # Get current user from JWT token (id + role only, see auth_utils)
+        current_user = get_current_principal()
         
         # Get data from request
         data = request.get_json()
@@ -52,7 +80,7 @@ def create_organization():
             state=data.get('state', ''),
             country=data.get('country', ''),
             postal_code=data.get('postal_code', ''),
-            owner=current_user,  # Set current user as owner
+            owner=current_user.id,  # Set current user as owner
             admins=[],  # Empty initially
             members=[]  # Empty initially
         )
@@ -81,29 +109,49 @@ def create_organization():
 
 #GET ALL ORGANIZATIONS
 @orgs_bp.route('/', methods=['GET'])
+@cached_response(org_cache, version=Organization.cache_version)
 def get_all_organizations():
-    
+    """
+    List organizations, oldest first
+    Paginate with ?cursor=<next_cursor from the previous page>
+    """
     try:
         # Get query parameters
         is_verified = request.args.get('is_verified')
-        limit = int(request.args.get('limit', 50))
-        skip = int(request.args.get('skip', 0))
+        limit = parse_limit(request.args, 50, 100)
+        cursor = request.args.get('cursor')
+        
+        # ?view=summary|detail or ?fields=a,b,c
+        try:
+            fields = parse_fieldset(request.args, Organization)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Build query
         query = {}
         if is_verified is not None:
             query['is_verified'] = is_verified.lower() == 'true'
         
-        # Get organizations from database
-        orgs = Organization.objects(**query).skip(skip).limit(limit)
+        # Get organizations from database - keyset page on (created_at, _id)
+        orgs = apply_fieldset(
+            Organization.objects(**query), Organization, fields, extra=['created_at', 'updated_at']
+        )
+        
+        try:
+            orgs, next_cursor = keyset_page(orgs, 'created_at', limit, cursor)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
         
         # Convert to JSON
-        orgs_list = [org.to_json() for org in orgs]
+        orgs_list = [org.to_json(fields=fields) for org in orgs]
         
-        return jsonify({
+        response = jsonify({
             'count': len(orgs_list),
-            'organizations': orgs_list
-        }), 200
+            'organizations': orgs_list,
+            'next_cursor': next_cursor
+        })
+        response.set_etag(make_etag(*[(org.id, org.updated_at) for org in orgs], fields, next_cursor))
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -111,11 +159,14 @@ def get_all_organizations():
 
 #GET SINGLE ORGANIZATION
 @orgs_bp.route('/<org_id>', methods=['GET'])
+@cached_response(org_cache, version=Organization.cache_version)
 def get_organization(org_id):
     """Get a single organization by ID"""
     try:
         org = Organization.objects.get(id=org_id)
-        return jsonify(org.to_json()), 200
+        response = jsonify(org.to_json())
+        response.set_etag(make_etag(org.id, org.updated_at))
+        return response, 200
         
     except DoesNotExist:
         return jsonify({'error': 'Organization not found'}), 404
@@ -126,11 +177,14 @@ def get_organization(org_id):
 
 #GET ORGANIZATION BY SLUG
 @orgs_bp.route('/slug/<slug>', methods=['GET'])
+@cached_response(org_cache, version=Organization.cache_version)
 def get_organization_by_slug(slug):
     """Get organization by slug (URL-friendly name)"""
     try:
         org = Organization.objects.get(slug=slug)
-        return jsonify(org.to_json()), 200
+        response = jsonify(org.to_json())
+        response.set_etag(make_etag(org.id, org.updated_at))
+        return response, 200
         
     except DoesNotExist:
         return jsonify({'error': 'Organization not found'}), 404
@@ -141,7 +195,7 @@ def get_organization_by_slug(slug):
 
 #UPDATE ORGANIZATION
 @orgs_bp.route('/<org_id>', methods=['PUT', 'PATCH'])
-@jwt_required()
+@principal_required
 def update_organization(org_id):
     """
     Update organization details
@@ -149,8 +203,7 @@ def update_organization(org_id):
     """
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        current_user = User.objects.get(id=current_user_id)
+        current_user = get_current_principal()
         
         # Get organization
         org = Organization.objects.get(id=org_id)
@@ -218,9 +271,33 @@ def update_organization(org_id):
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
 
+#ORGANIZATION ANALYTICS
+@orgs_bp.route('/<org_id>/analytics', methods=['GET'])
+@principal_required
+def get_organization_analytics(org_id):
+    """
+    Dashboard numbers summed over all hackathons of an organization
+    Only owner and admins; reads the per-hackathon rollups only
+    """
+    try:
+        org = Organization.objects.only('owner', 'admins').get(id=org_id)
+
+        if not org.is_admin(get_current_principal()):
+            return jsonify({'error': 'You do not have permission to view this organization\'s analytics'}), 403
+
+        stats = HackathonStats.objects(organization=org.id)
+        return jsonify({'analytics': organization_dashboard(stats)}), 200
+
+    except (DoesNotExist, ValidationError):
+        return jsonify({'error': 'Organization not found'}), 404
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
 #DELETE ORGANIZATION
 @orgs_bp.route('/<org_id>', methods=['DELETE'])
-@jwt_required()
+@principal_required
 def delete_organization(org_id):
     """
     Delete organization
@@ -228,8 +305,7 @@ def delete_organization(org_id):
     """
     try:
         # Get current user
-        current_user_id = get_jwt_identity()
-        current_user = User.objects.get(id=current_user_id)
+        current_user = get_current_principal()
         
         # Get organization
         org = Organization.objects.get(id=org_id)
@@ -252,12 +328,11 @@ def delete_organization(org_id):
 
 #member management routes
 @orgs_bp.route('/<org_id>/members', methods=['POST'])
-@jwt_required()
+@principal_required
 def add_member(org_id):
     """Add a member to organization"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.objects.get(id=current_user_id)
+        current_user = get_current_principal()
         
         org = Organization.objects.get(id=org_id)
         
@@ -266,9 +341,14 @@ def add_member(org_id):
             return jsonify({'error': 'You do not have permission to add members'}), 403
         
         data = request.get_json()
-        user_to_add = User.objects.get(id=data['user_id'])
         role = data.get('role', 'member')
         
+        # bulk variant - {"user_ids": [...], "role": "member"}
+        if 'user_ids' in data:
+            return add_members_bulk(org, data['user_ids'], role)
+        
+        user_to_add = User.objects.only('id').get(id=data['user_id'])
+        
         if role == 'admin':
             success = org.add_admin(user_to_add)
         else:
@@ -285,13 +365,39 @@ def add_member(org_id):
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
 
+def add_members_bulk(org, user_ids, role):
+    """Add a batch of users to an organization in a single update"""
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({'error': 'user_ids must be a non-empty list'}), 400
+    
+    if len(user_ids) > MAX_BULK_MEMBERS:
+        return jsonify({'error': f'At most {MAX_BULK_MEMBERS} users can be added at once'}), 400
+    
+    try:
+        requested = list(dict.fromkeys(ObjectId(uid) for uid in user_ids))
+    except (InvalidId, TypeError):
+        return jsonify({'error': 'user_ids contains an invalid id'}), 400
+    
+    # one query to check which users exist
+    found = set(User.objects(id__in=requested).scalar('id'))
+    
+    added = org.add_members_bulk([uid for uid in requested if uid in found], role)
+    added_set = set(added)
+    
+    return jsonify({
+        'message': f'{len(added)} user(s) added as {role}',
+        'added': [str(uid) for uid in added],
+        'already_present': [str(uid) for uid in requested if uid in found and uid not in added_set],
+        'not_found': [str(uid) for uid in requested if uid not in found]
+    }), 200
+
+
 @orgs_bp.route('/<org_id>/members/<user_id>', methods=['DELETE'])
-@jwt_required()
+@principal_required
 def remove_member(org_id, user_id):
     """Remove a member from organization"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.objects.get(id=current_user_id)
+        current_user = get_current_principal()
         
         org = Organization.objects.get(id=org_id)
         
@@ -299,7 +405,7 @@ def remove_member(org_id, user_id):
         if not org.is_admin(current_user):
             return jsonify({'error': 'You do not have permission to remove members'}), 403
         
-        user_to_remove = User.objects.get(id=user_id)
+        user_to_remove = User.objects.only('id').get(id=user_id)
         
         # Try removing from both admin and member lists
         removed_admin = org.remove_admin(user_to_remove)
@@ -321,24 +427,33 @@ def remove_member(org_id, user_id):
 def get_members(org_id):
     """Get all members and admins of an organization"""
     try:
-        org = Organization.objects.get(id=org_id)
+        # only the reference lists - users are loaded below in one query
+        org = Organization.objects.only('owner', 'admins', 'members').get(id=org_id)
+        
+        owner_id = raw_ref(org, 'owner')
+        admin_ids = raw_refs(org, 'admins')
+        member_ids = raw_refs(org, 'members')
+        
+        users = fetch_many(
+            User,
+            [owner_id] + admin_ids + member_ids,
+            ['username', 'first_name', 'last_name']
+        )
+        
+        def user_summary(user_id):
+            user = users.get(user_id)
+            return {
+                'id': str(user_id),
+                'name': user.get_full_name() if user else 'N/A'
+            }
         
         return jsonify({
-            'owner': {
-                'id': str(org.owner.id),
-                'name': org.owner.name if hasattr(org.owner, 'name') else 'N/A'
-            },
-            'admins': [
-                {'id': str(admin.id), 'name': admin.name if hasattr(admin, 'name') else 'N/A'} 
-                for admin in org.admins
-            ],
-            'members': [
-                {'id': str(member.id), 'name': member.name if hasattr(member, 'name') else 'N/A'} 
-                for member in org.members
-            ]
+            'owner': user_summary(owner_id),
+            'admins': [user_summary(uid) for uid in admin_ids],
+            'members': [user_summary(uid) for uid in member_ids]
         }), 200
         
     except DoesNotExist:
         return jsonify({'error': 'Organization not found'}), 404
     except Exception as e:
-        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -0,0 +1,245 @@
+from bson import ObjectId
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from mongoengine.errors import DoesNotExist
+from ..models.user import User
+from ..services.teammate_service import teammate_matcher
+from ..services.ai_resume_service import (
+    resume_analyzer, download_resume, suggestions_for, apply_to_user, AnalyzerUnavailable
+)
+from ..services.badge_service import badge_engine
+from ..services.leaderboard_service import leaderboard, GLOBAL, country_scope, hackathon_scope
+from ..utils.dereference import fetch_many
+from ..utils.pagination import parse_limit
+
+users_bp = Blueprint('users', __name__, url_prefix='/api')
+
+# what we show for each suggested teammate
+TEAMMATE_FIELDS = [
+    'username', 'first_name', 'last_name', 'avatar_url', 'tagline', 'country',
+    'timezone', 'years_of_experience', 'skills', 'interests'
+]
+
+# what we show for each leaderboard entry
+LEADERBOARD_USER_FIELDS = ['username', 'first_name', 'last_name', 'avatar_url', 'country', 'level']
+
+
+def parse_scope(value):
+    """?scope=global | country:<name> | hackathon:<id>"""
+    if not value or value == GLOBAL:
+        return GLOBAL
+    kind, _, key = value.partition(':')
+    if kind == 'country' and key.strip():
+        return country_scope(key)
+    if kind == 'hackathon' and key.strip():
+        return hackathon_scope(key.strip())
+    raise ValueError(f"Invalid scope '{value}'")
+
+
+def leaderboard_entries(rows):
+    """(rank, user_id, xp) rows -> JSON, with one query for the users"""
+    users = fetch_many(User, [uid for _, uid, _ in rows], LEADERBOARD_USER_FIELDS)
+    entries = []
+    for rank, user_id, xp in rows:
+        user = users.get(user_id)
+        if not user:
+            continue
+        entries.append({
+            'rank': rank,
+            'id': str(user.id),
+            'username': user.username,
+            'full_name': user.get_full_name(),
+            'avatar_url': user.avatar_url,
+            'country': user.country,
+            'level': user.level,
+            'xp': xp
+        })
+    return entries
+
+
+#TEAMMATE FINDER
+@users_bp.route('/teammates', methods=['GET'])
+@jwt_required()
+def find_teammates():
+    """
+    Ranked teammate suggestions for the current user
+    ?skills=python,ml - skills the team is looking for (on top of what you're learning)
+    """
+    try:
+        current_user = User.objects.only(
+            'skills', 'interests', 'learning', 'years_of_experience', 'timezone'
+        ).get(id=get_jwt_identity())
+
+        limit = parse_limit(request.args, 20, 100)
+        needed = [s for s in request.args.get('skills', '').split(',') if s.strip()]
+
+        teammate_matcher.ensure_built()
+        matches = teammate_matcher.match_user(current_user, needed=needed, limit=limit)
+
+        users = fetch_many(User, [uid for uid, _, _ in matches], TEAMMATE_FIELDS)
+
+        teammates = []
+        for user_id, score, components in matches:
+            user = users.get(user_id)
+            if not user:
+                continue
+            teammates.append({
+                'id': str(user.id),
+                'username': user.username,
+                'full_name': user.get_full_name(),
+                'avatar_url': user.avatar_url,
+                'tagline': user.tagline,
+                'country': user.country,
+                'timezone': user.timezone,
+                'years_of_experience': user.years_of_experience,
+                'skills': user.skills,
+                'interests': user.interests,
+                'score': round(score, 4),
+                'score_breakdown': components
+            })
+
+        return jsonify({
+            'count': len(teammates),
+            'teammates': teammates
+        }), 200
+
+    except DoesNotExist:
+        return jsonify({'error': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#LEADERBOARD
+@users_bp.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    Top users by XP
+    ?scope=global|country:<name>|hackathon:<id>&limit=100&offset=0
+    Every scope ranks by global XP - hackathon:<id> is that hackathon's
+    participants ranked by their overall XP
+    """
+    try:
+        try:
+            scope = parse_scope(request.args.get('scope'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        limit = parse_limit(request.args, 100, 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+
+        leaderboard.ensure_built()
+        entries = leaderboard_entries(leaderboard.top(scope, limit=limit, offset=offset))
+
+        return jsonify({
+            'scope': scope,
+            'ranked_by': 'global_xp',
+            'total': leaderboard.size(scope),
+            'offset': offset,
+            'entries': entries
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#MY LEADERBOARD RANK
+@users_bp.route('/leaderboard/me', methods=['GET'])
+@jwt_required()
+def get_my_rank():
+    """
+    Current user's rank plus the users just above and below
+    ?scope=...&radius=5
+    """
+    try:
+        try:
+            scope = parse_scope(request.args.get('scope'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        radius = max(0, min(int(request.args.get('radius', 5)), 25))
+        user_id = ObjectId(get_jwt_identity())
+
+        leaderboard.ensure_built()
+        rank = leaderboard.rank(user_id, scope)
+        if rank is None:
+            return jsonify({'error': 'You are not on this leaderboard'}), 404
+
+        return jsonify({
+            'scope': scope,
+            'ranked_by': 'global_xp',
+            'rank': rank,
+            'total': leaderboard.size(scope),
+            'neighbors': leaderboard_entries(leaderboard.around(user_id, scope, radius=radius))
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#BADGES
+@users_bp.route('/badges', methods=['GET'])
+def get_badges():
+    """All badges that can be earned and what it takes to get them"""
+    try:
+        badges = [{
+            'name': rule.name,
+            'description': rule.description,
+            'icon': rule.icon,
+            'category': rule.category,
+            'requirements': rule.minimums,
+            'skills_any': rule.skills_any
+        } for rule in badge_engine.rules]
+
+        return jsonify({'count': len(badges), 'badges': badges}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+
+#ANALYZE RESUME
+@users_bp.route('/users/me/resume/analyze', methods=['POST'])
+@jwt_required()
+def analyze_resume():
+    """
+    Pull skills / education / experience out of a resume
+    Upload a PDF or DOCX as `resume` (multipart), or send nothing to use the
+    stored resume_url. ?apply=true adds the suggestions to the profile.
+    """
+    try:
+        user = User.objects.only(
+            'resume_url', 'skills', 'education', 'experience', 'xp', 'level', 'badges'
+        ).get(id=get_jwt_identity())
+
+        upload = request.files.get('resume')
+        if upload:
+            data = upload.read()
+        elif user.resume_url:
+            data = download_resume(user.resume_url)
+        else:
+            return jsonify({'error': 'Upload a resume or set resume_url first'}), 400
+
+        analysis = resume_analyzer.analyze(data)
+        if analysis.error:
+            return jsonify({'error': analysis.error}), 422
+
+        if request.args.get('apply', '').lower() == 'true':
+            suggestions = apply_to_user(user, analysis)
+        else:
+            suggestions = suggestions_for(user, analysis)
+
+        return jsonify({
+            'analysis': analysis.to_json(),
+            'suggestions': suggestions,
+            'applied': request.args.get('apply', '').lower() == 'true'
+        }), 200
+
+    except DoesNotExist:
+        return jsonify({'error': 'User not found'}), 404
+    except AnalyzerUnavailable as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -0,0 +1,36 @@
+"""
+Services whose signal handlers keep stored data in sync with the models
+
+Each module connects its handlers when it is imported. These write to the
+database (rollups, reminders, fan-out jobs, calendar rows, badges), so every
+process that writes models imports them through init(): create_app(),
+whatever ENABLED_BLUEPRINTS says, and the main() of every service CLI -
+otherwise a process serving only some blueprints, or a script, would
+silently skip them (e.g. no badges for xp given by a backfill).
+
+Services that only keep per-process caches for their own routes (search,
+leaderboard, teammates) stay with the blueprints that use them: their
+handlers do nothing in a process that never built the cache.
+"""
+import importlib
+import sys
+
+SIGNAL_HANDLER_MODULES = [
+    'analytics_service',
+    'badge_service',
+    'calendar_service',
+    'fanout_service',
+    'notification_service',
+]
+
+
+def init():
+    """Import the services above so their handlers are connected"""
+    main = getattr(sys.modules.get('__main__'), '__spec__', None)
+    for name in SIGNAL_HANDLER_MODULES:
+        module = f'{__name__}.{name}'
+        # `python -m app.services.x` runs x as __main__, handlers included -
+        # importing it again would connect a second copy of them
+        if main is not None and main.name == module:
+            continue
+        importlib.import_module(module)
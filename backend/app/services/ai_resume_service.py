@@ -0,0 +1,597 @@
+"""
+Resume analysis: text extraction, skill matching and profile suggestions
+
+Pipeline for one file:
+
+    bytes --sha256--> cached ResumeAnalysis?  --yes--> done
+                          | no
+                          v
+        process pool: extract text (PDF via pypdf, DOCX via its XML)
+                      -> skills with an Aho-Corasick matcher over the
+                         skill vocabulary (one pass over the text, however
+                         many skills we know)
+                      -> education / experience lines by pattern
+                          |
+                          v
+                 store ResumeAnalysis (content hash + ANALYZER_VERSION)
+
+Parsing is CPU-bound and runs in a process pool (RESUME_WORKERS, default:
+number of CPUs) so it never blocks request threads. Because results are
+cached by content hash, re-uploads and duplicate files cost one indexed read.
+
+Only what analyze_bytes returns is cached - including "could not read this
+file", which is a property of the bytes. A timeout or a dead pool worker says
+nothing about the file, so nothing is stored and the next run retries it.
+
+Stored resume links are only fetched over https from the upload storage
+(RESUME_URL_HOSTS) and never from private addresses, see check_resume_url().
+
+Results are suggestions: apply_to_user() adds the skills the user doesn't
+list yet and fills in education / experience only when those are empty.
+
+Re-analyze every stored resume (e.g. after growing the vocabulary):
+
+    cd backend
+    python -m app.services.ai_resume_service --all [--apply]
+"""
+import argparse
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import re
+import socket
+import threading
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from xml.etree import ElementTree
+
+import requests
+from urllib.parse import urlsplit
+from mongoengine import connect
+from mongoengine.errors import NotUniqueError
+from pymongo.errors import BulkWriteError
+
+from ..models.resume import ResumeAnalysis
+from ..models.user import User
+from .teammate_service import ALIASES, normalize_term
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# bump when the vocabulary or the parsing changes - old cache entries then miss
+ANALYZER_VERSION = 1
+
+MAX_RESUME_BYTES = int(os.getenv('RESUME_MAX_BYTES', 5 * 1024 * 1024))
+# hosts resume_url may point at (comma separated, ".example.com" = any subdomain);
+# empty = stored resume links are never fetched, only uploads are analyzed
+RESUME_URL_HOSTS = [h.strip().lower() for h in os.getenv('RESUME_URL_HOSTS', '').split(',') if h.strip()]
+MAX_PDF_PAGES = 10
+
+SKILL_VOCABULARY = [
+    'Python', 'JavaScript', 'TypeScript', 'Java', 'C++', 'C#', 'Go', 'Rust', 'Kotlin',
+    'Swift', 'Ruby', 'PHP', 'Scala', 'Dart', 'SQL', 'HTML', 'CSS', 'Bash',
+    'React', 'Next.js', 'Vue', 'Angular', 'Svelte', 'Node.js', 'Express', 'Django',
+    'Flask', 'FastAPI', 'Spring Boot', 'Flutter', 'React Native', 'Tailwind CSS',
+    'TensorFlow', 'PyTorch', 'Keras', 'scikit-learn', 'Pandas', 'NumPy', 'OpenCV',
+    'Machine Learning', 'Deep Learning', 'NLP', 'Computer Vision', 'Artificial Intelligence',
+    'Data Science', 'Data Analysis', 'LangChain', 'LLM',
+    'MongoDB', 'PostgreSQL', 'MySQL', 'SQLite', 'Redis', 'Firebase', 'GraphQL', 'REST',
+    'Docker', 'Kubernetes', 'AWS', 'GCP', 'Azure', 'Terraform', 'CI/CD', 'Git', 'Linux',
+    'Solidity', 'Blockchain', 'Web3', 'Figma', 'UI/UX', 'Unity', 'Arduino', 'IoT',
+    'Raspberry Pi', 'Android', 'iOS',
+]
+
+# everyday words that would match far too often in free text ("go to", "express interest")
+AMBIGUOUS_PATTERNS = {'go', 'express', 'rest'}
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick automaton: finds every vocabulary term in one pass
+
+    Matches must sit on word boundaries, so 'java' doesn't fire inside
+    'javascript' and 'sql' doesn't fire inside 'postgresql'.
+    """
+
+    def __init__(self, terms):
+        """terms: {lowercase pattern: skill name to report}"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for pattern, skill in terms.items():
+            state = 0
+            for ch in pattern:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._out[state].append((len(pattern), skill))
+
+        # failure links, breadth first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Counter of skill -> occurrences"""
+        text = text.lower()
+        end = len(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = Counter()
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            after_ok = i + 1 == end or not text[i + 1].isalnum()
+            if not after_ok:
+                continue
+            for length, skill in out[state]:
+                start = i - length + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    found[skill] += 1
+        return found
+
+
+def build_vocabulary():
+    """{pattern: display name} from SKILL_VOCABULARY plus the teammate finder's aliases"""
+    display = {normalize_term(name): name for name in SKILL_VOCABULARY}
+    terms = {}
+    for name in SKILL_VOCABULARY:
+        terms[name.lower()] = name
+    for alias, canonical in ALIASES.items():
+        if canonical in display:
+            terms[alias] = display[canonical]
+    return {p: s for p, s in terms.items() if p not in AMBIGUOUS_PATTERNS}
+
+
+_matcher = None
+
+
+def get_matcher():
+    # built once per process (workers build their own after the fork)
+    global _matcher
+    if _matcher is None:
+        _matcher = SkillMatcher(build_vocabulary())
+    return _matcher
+
+
+# ===== TEXT EXTRACTION =====
+
+def detect_file_type(data):
+    if data[:5] == b'%PDF-':
+        return 'pdf'
+    if data[:2] == b'PK':
+        return 'docx'
+    return 'text'
+
+
+def extract_pdf_text(data):
+    from pypdf import PdfReader  # only needed in the worker processes
+
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join((page.extract_text() or '') for page in reader.pages[:MAX_PDF_PAGES])
+
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def extract_docx_text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as docx:
+        root = ElementTree.fromstring(docx.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in root.iter(_W + 'p'):
+        paragraphs.append(''.join(node.text or '' for node in paragraph.iter(_W + 't')))
+    return '\n'.join(paragraphs)
+
+
+def extract_text(data, file_type):
+    if file_type == 'pdf':
+        return extract_pdf_text(data)
+    if file_type == 'docx':
+        return extract_docx_text(data)
+    return data.decode('utf-8', errors='ignore')
+
+
+# ===== SECTION PARSING =====
+
+YEAR_RANGE_RE = re.compile(
+    r"((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now)", re.I
+)
+DEGREE_RE = re.compile(
+    r"\b(b\.?\s?tech|b\.?\s?sc|b\.\s?e\.?|bca|bachelor(?:'s)?(?: of [a-z ]+)?|m\.?\s?tech|m\.?\s?sc|"
+    r"mca|master(?:'s)?(?: of [a-z ]+)?|mba|ph\.?\s?d|diploma)\b", re.I
+)
+INSTITUTION_RE = re.compile(r"\b(university|institute|college|school|academy|iit|nit|iiit)\b", re.I)
+POSITION_RE = re.compile(
+    r"\b(intern|engineer|developer|analyst|designer|scientist|researcher|consultant|"
+    r"manager|lead|architect|founder)\b", re.I
+)
+COMPANY_SPLIT_RE = re.compile(r"\s+(?:at|@)\s+|\s+[|–—-]\s+|,\s+")
+
+
+def _years(line):
+    match = YEAR_RANGE_RE.search(line)
+    if not match:
+        return None, None, False
+    start, end = match.groups()
+    current = not end.isdigit()
+    return int(start), (None if current else int(end)), current
+
+
+def parse_education(lines):
+    entries = []
+    for i, line in enumerate(lines):
+        if not INSTITUTION_RE.search(line):
+            continue
+        nearby = ' '.join(lines[max(i - 1, 0):i + 2])
+        degree = DEGREE_RE.search(nearby)
+        start, end, current = _years(nearby)
+        institution = YEAR_RANGE_RE.sub('', line).strip(' ,|-–—')
+        entries.append({
+            'institution': institution[:200],
+            'degree': degree.group(0)[:100] if degree else None,
+            'start_year': start,
+            'end_year': end,
+            'is_current': current
+        })
+    return entries[:5]
+
+
+def parse_experience(lines):
+    entries = []
+    for i, line in enumerate(lines):
+        if INSTITUTION_RE.search(line) or not POSITION_RE.search(line) or len(line) > 120:
+            continue
+        start, end, current = _years(' '.join(lines[i:i + 2]))
+        if start is None:
+            continue  # without dates this is more likely a sentence than a job title
+        parts = [p for p in COMPANY_SPLIT_RE.split(YEAR_RANGE_RE.sub('', line).strip(' ,|-–—')) if p]
+        position = next((p for p in parts if POSITION_RE.search(p)), parts[0] if parts else line)
+        company = next((p for p in parts if p is not position), None)
+        entries.append({
+            'position': position.strip()[:100],
+            'company': company.strip()[:200] if company else None,
+            'start_year': start,
+            'end_year': end,
+            'is_current': current
+        })
+    return entries[:10]
+
+
+def analyze_bytes(data):
+    """
+    Full analysis of one file - runs in a worker process
+    Returns a plain dict (picklable) of ResumeAnalysis fields.
+    """
+    file_type = detect_file_type(data)
+    try:
+        text = extract_text(data, file_type)
+    except Exception as e:
+        return {'file_type': file_type, 'error': f"Could not read {file_type}: {e}"}
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    skills = get_matcher().find(text)
+
+    return {
+        'file_type': file_type,
+        'text_length': len(text),
+        'skills': [skill for skill, _ in skills.most_common()],
+        'education': parse_education(lines),
+        'experience': parse_experience(lines)
+    }
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# ===== ANALYZER =====
+
+class AnalyzerUnavailable(Exception):
+    """The pool timed out or lost a worker - says nothing about the file, retry later"""
+
+
+class ResumeAnalyzer:
+    """Process pool + content-hash cache in front of analyze_bytes"""
+
+    def __init__(self, workers=None, timeout=None):
+        self.workers = workers or int(os.getenv('RESUME_WORKERS', os.cpu_count() or 2))
+        self.timeout = timeout or float(os.getenv('RESUME_TIMEOUT', 60))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # created lazily and per process - pools don't survive a fork
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _discard_executor(self, executor):
+        # a worker died (OOM, segfault in a parser) - start a fresh pool next time
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def cached(hashes):
+        """{content_hash: ResumeAnalysis} for the hashes we've already analyzed"""
+        return {
+            a.content_hash: a
+            for a in ResumeAnalysis.objects(content_hash__in=list(hashes), analyzer_version=ANALYZER_VERSION)
+        }
+
+    def analyze(self, data):
+        """
+        ResumeAnalysis for a file's bytes, from cache when possible
+        Raises AnalyzerUnavailable when the pool is too busy or crashed.
+        """
+        if len(data) > MAX_RESUME_BYTES:
+            raise ValueError(f"Resume is larger than {MAX_RESUME_BYTES // (1024 * 1024)} MB")
+
+        digest = content_hash(data)
+        hit = self.cached([digest]).get(digest)
+        if hit:
+            return hit
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(analyze_bytes, data)
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise AnalyzerUnavailable("Resume analysis is busy, please retry shortly")
+        except BrokenProcessPool as e:
+            logger.warning("Resume analysis of %s failed: %r", digest, e)
+            self._discard_executor(executor)
+            raise AnalyzerUnavailable("Resume analysis crashed, please retry shortly")
+
+        analysis = ResumeAnalysis(content_hash=digest, analyzer_version=ANALYZER_VERSION, **result)
+        try:
+            analysis.save()
+        except NotUniqueError:
+            # someone uploaded the same file at the same time
+            return self.cached([digest])[digest]
+        return analysis
+
+    def analyze_many(self, files):
+        """
+        Batch version: {key: ResumeAnalysis} for {key: bytes}
+        One cache query for the whole batch, misses parsed in parallel,
+        new results written with one insert_many. Keys whose file couldn't
+        be analyzed this time (too large, timeout, pool failure) map to None.
+        """
+        digests = {key: content_hash(data) for key, data in files.items()}
+        hits = self.cached(set(digests.values()))
+
+        executor = self._get_executor()
+        pending = {}
+        for key, data in files.items():
+            digest = digests[key]
+            if digest not in hits and digest not in pending and len(data) <= MAX_RESUME_BYTES:
+                try:
+                    pending[digest] = executor.submit(analyze_bytes, data)
+                except BrokenProcessPool:
+                    # died mid-batch - what's already queued fails below, the rest waits for the next run
+                    self._discard_executor(executor)
+                    break
+
+        new = []
+        for digest, future in pending.items():
+            try:
+                result = future.result(timeout=self.timeout)
+            except BrokenProcessPool as e:
+                logger.warning("Resume analysis of %s failed: %r", digest, e)
+                self._discard_executor(executor)
+                continue
+            except Exception as e:
+                # not a property of the file - don't cache it, retry on the next run
+                logger.warning("Resume analysis of %s failed: %r", digest, e)
+                continue
+            new.append(ResumeAnalysis(content_hash=digest, analyzer_version=ANALYZER_VERSION, **result))
+
+        if new:
+            try:
+                ResumeAnalysis._get_collection().insert_many(
+                    [a.to_mongo().to_dict() for a in new], ordered=False
+                )
+            except BulkWriteError as e:
+                # duplicates from a concurrent run are fine, anything else isn't
+                if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                    raise
+            hits.update({a.content_hash: a for a in new})
+
+        return {key: hits.get(digest) for key, digest in digests.items()}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# shared per-process analyzer
+resume_analyzer = ResumeAnalyzer()
+
+
+def _allowed_host(host):
+    return any(
+        host == allowed or (allowed.startswith('.') and host.endswith(allowed))
+        for allowed in RESUME_URL_HOSTS
+    )
+
+
+def check_resume_url(url):
+    """
+    Refuse resume links we shouldn't fetch from the server: anything but https
+    to a RESUME_URL_HOSTS host, or a host resolving to a private / loopback /
+    link-local address. Raises ValueError.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if parts.scheme != 'https' or not host:
+        raise ValueError("Resume links must be https")
+    if not _allowed_host(host):
+        raise ValueError("Resume links must point at the upload storage, upload the file instead")
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError("Resume link host could not be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        ip = getattr(ip, 'ipv4_mapped', None) or ip
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("Resume link points at a private address")
+
+
+def download_resume(url, timeout=15):
+    """Fetch a resume from the upload storage, refusing anything over MAX_RESUME_BYTES"""
+    check_resume_url(url)
+    # no redirects: the target would skip the host and address checks
+    with requests.get(url, stream=True, timeout=timeout, allow_redirects=False) as response:
+        if response.is_redirect:
+            raise ValueError("Resume link redirects elsewhere")
+        response.raise_for_status()
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_RESUME_BYTES:
+                raise ValueError("Resume file is too large")
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+# ===== PROFILE SUGGESTIONS =====
+
+def _date(year):
+    return datetime(year, 1, 1) if year else None
+
+
+def suggestions_for(user, analysis):
+    """What the analysis would add to this user's profile"""
+    known = {normalize_term(s) for s in user.skills}
+    return {
+        'skills': [s for s in analysis.skills if normalize_term(s) not in known],
+        'education': analysis.education if not user.education else [],
+        'experience': [e for e in analysis.experience if e.get('start_year')] if not user.experience else []
+    }
+
+
+def apply_to_user(user, analysis):
+    """Add new skills and fill in empty education / experience - one update"""
+    suggestions = suggestions_for(user, analysis)
+
+    with user.batch():
+        user.add_skills(suggestions['skills'])
+        for entry in suggestions['education']:
+            user.add_education(
+                entry['institution'],
+                entry.get('degree'),
+                start_date=_date(entry.get('start_year')),
+                end_date=_date(entry.get('end_year')),
+                is_current=entry.get('is_current', False)
+            )
+        for entry in suggestions['experience']:
+            user.add_experience(
+                entry.get('company') or 'Unknown',
+                entry['position'],
+                _date(entry['start_year']),
+                end_date=_date(entry.get('end_year')),
+                is_current=entry.get('is_current', False)
+            )
+    return suggestions
+
+
+# ===== BATCH MODE =====
+
+def reanalyze_all(apply=False, batch_size=None):
+    """
+    Analyze every user's stored resume_url
+    Downloads a batch, analyzes it with analyze_many (cache first, pool for
+    the rest), optionally applies suggestions. Returns counters.
+    """
+    batch_size = batch_size or resume_analyzer.workers * 4
+    stats = Counter()
+    fields = ['resume_url', 'skills', 'education', 'experience']
+    users = User.objects(resume_url__ne=None).only(*fields).batch_size(batch_size)
+
+    def run(batch):
+        files = {}
+        for user in batch:
+            try:
+                files[user.id] = download_resume(user.resume_url)
+            except Exception as e:
+                logger.warning("Could not download resume of %s: %s", user.id, e)
+                stats['download_failed'] += 1
+        results = resume_analyzer.analyze_many(files)
+        for user in batch:
+            if user.id not in files:
+                continue
+            analysis = results.get(user.id)
+            if analysis is None:
+                stats['not_analyzed'] += 1
+                continue
+            stats['analyzed'] += 1
+            if analysis.error:
+                stats['failed'] += 1
+            elif apply:
+                if any(apply_to_user(user, analysis).values()):
+                    stats['updated'] += 1
+
+    batch = []
+    for user in users:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            run(batch)
+            batch = []
+    if batch:
+        run(batch)
+    return dict(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze stored resumes")
+    parser.add_argument('--all', action='store_true', help="re-analyze every user's resume_url")
+    parser.add_argument('--apply', action='store_true', help="add suggested skills/education/experience")
+    parser.add_argument('--file', help="analyze one local file and print the result")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            print(analyze_bytes(f.read()))
+        return
+
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+    if args.all:
+        print(reanalyze_all(apply=args.apply))
+    resume_analyzer.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Materialized analytics for the organizer dashboards
+
+The dashboards read one HackathonStats document per hackathon instead of
+aggregating registrations / users on every load. The documents are kept
+current incrementally:
+
+    registration_changed (approved)  -> $inc totals, day, country and skills
+    registration_changed (None)      -> $inc -1 on totals, country and skills
+    views_flushed (view counter)     -> one bulk_write of $inc views / views_by_day
+
+Counts drift a little over time (a participant edits their skills or country
+after registering, a process dies between the write and the signal), so the
+rebuild job recomputes everything from the source collections with aggregation
+pipelines:
+
+    python -m app.services.analytics_service --rebuild [--hackathon <id>]
+
+Team sizes are only produced by the rebuild - team membership lives on the
+users' hackathon participation records and changes without an event we can
+hook into. Views per day can't be rebuilt (there is no raw view log), so the
+rebuild leaves views_by_day alone.
+"""
+import argparse
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine import connect
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from ..models.analytics import HackathonStats, encode_key, decode_key
+from ..models.hackathon import Hackathon
+from ..models.registration import Registration
+from ..models.signals import registration_changed, views_flushed
+from ..models.user import User
+from ..utils.cache import TTLCache
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# how many entries the dashboards show for country / skill distributions
+TOP_N = 20
+
+
+def _day(when):
+    return when.strftime('%Y-%m-%d')
+
+
+def _skill_keys(skills):
+    return {encode_key(s.strip().lower()) for s in skills or [] if s and s.strip()}
+
+
+class AnalyticsMaterializer:
+    """Keeps HackathonStats documents up to date"""
+
+    def __init__(self):
+        # hackathon id -> organization id, the owning org never changes
+        self._orgs = TTLCache(maxsize=10000, ttl=3600)
+
+    def _collection(self):
+        return HackathonStats._get_collection()
+
+    def _organization_of(self, hackathon_id):
+        org = self._orgs.get(hackathon_id)
+        if org is None:
+            doc = Hackathon._get_collection().find_one({'_id': hackathon_id}, {'organization': 1}) or {}
+            org = doc.get('organization')
+            self._orgs.set(hackathon_id, org)
+        return org
+
+    def _upsert(self, hackathon_id, inc):
+        update = {
+            '$inc': inc,
+            '$set': {'updated_at': datetime.utcnow()},
+            '$setOnInsert': {'organization': self._organization_of(hackathon_id)}
+        }
+        try:
+            self._collection().update_one({'hackathon': hackathon_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # two first writes for the same hackathon raced, the other one inserted
+            self._collection().update_one({'hackathon': hackathon_id}, update)
+
+    # INCREMENTAL UPDATES
+
+    def record_registration(self, hackathon_id, user_id, delta=1, when=None):
+        """Count an approved registration (delta=1) or take one back (delta=-1)"""
+        user = User._get_collection().find_one({'_id': user_id}, {'country': 1, 'skills': 1}) or {}
+
+        inc = {'registrations': delta}
+        if delta > 0:
+            # per day is "sign-ups on that day", leaving doesn't undo a sign-up
+            inc[f'registrations_by_day.{_day(when or datetime.utcnow())}'] = delta
+        if user.get('country'):
+            inc[f"countries.{encode_key(user['country'])}"] = delta
+        for key in _skill_keys(user.get('skills')):
+            inc[f'skills.{key}'] = delta
+
+        self._upsert(hackathon_id, inc)
+
+    def record_views(self, counts, when=None):
+        """{hackathon id: views} from one view counter flush"""
+        day = _day(when or datetime.utcnow())
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {'hackathon': hackathon_id},
+                {
+                    '$inc': {'views': amount, f'views_by_day.{day}': amount},
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {'organization': self._organization_of(hackathon_id)}
+                },
+                upsert=True
+            )
+            for hackathon_id, amount in counts.items() if amount
+        ]
+        if ops:
+            self._collection().bulk_write(ops, ordered=False)
+
+    # FULL REBUILD
+
+    def rebuild(self, hackathon_ids=None):
+        """Recompute the stats of some or all hackathons, returns how many were written"""
+        match = {'status': 'approved'}
+        hackathon_query = {}
+        if hackathon_ids is not None:
+            hackathon_ids = list(hackathon_ids)
+            match['hackathon'] = {'$in': hackathon_ids}
+            hackathon_query['_id'] = {'$in': hackathon_ids}
+
+        stats = defaultdict(lambda: {
+            'registrations': 0,
+            'registrations_by_day': {},
+            'countries': {},
+            'skills': {},
+            'team_sizes': {}
+        })
+        registrations = Registration._get_collection()
+
+        by_day = registrations.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'h': '$hackathon',
+                    'd': {'$dateToString': {
+                        'format': '%Y-%m-%d',
+                        'date': {'$ifNull': ['$approved_at', '$registered_at']}
+                    }}
+                },
+                'n': {'$sum': 1}
+            }}
+        ], allowDiskUse=True)
+        for row in by_day:
+            entry = stats[row['_id']['h']]
+            entry['registrations'] += row['n']
+            if row['_id'].get('d'):
+                entry['registrations_by_day'][row['_id']['d']] = row['n']
+
+        with_users = [
+            {'$match': match},
+            {'$project': {'hackathon': 1, 'user': 1}},
+            {'$lookup': {'from': User._get_collection_name(), 'localField': 'user',
+                         'foreignField': '_id', 'as': 'u'}},
+            {'$unwind': '$u'}
+        ]
+
+        countries = registrations.aggregate(with_users + [
+            {'$match': {'u.country': {'$nin': [None, '']}}},
+            {'$group': {'_id': {'h': '$hackathon', 'c': '$u.country'}, 'n': {'$sum': 1}}}
+        ], allowDiskUse=True)
+        for row in countries:
+            stats[row['_id']['h']]['countries'][encode_key(row['_id']['c'])] = row['n']
+
+        skills = registrations.aggregate(with_users + [
+            {'$unwind': '$u.skills'},
+            {'$project': {'hackathon': 1, 'user': 1, 's': {'$toLower': {'$trim': {'input': '$u.skills'}}}}},
+            {'$match': {'s': {'$ne': ''}}},
+            # same as the incremental path: a skill counts once per participant
+            {'$group': {'_id': {'h': '$hackathon', 'u': '$user', 's': '$s'}}},
+            {'$group': {'_id': {'h': '$_id.h', 's': '$_id.s'}, 'n': {'$sum': 1}}}
+        ], allowDiskUse=True)
+        for row in skills:
+            stats[row['_id']['h']]['skills'][encode_key(row['_id']['s'])] = row['n']
+
+        participation = {'hackathon_participation.team_id': {'$nin': [None, '']}}
+        if hackathon_ids is not None:
+            participation['hackathon_participation.hackathon_id'] = {'$in': [str(h) for h in hackathon_ids]}
+        team_sizes = User._get_collection().aggregate([
+            {'$match': participation},
+            {'$unwind': '$hackathon_participation'},
+            {'$match': participation},
+            {'$group': {
+                '_id': {'h': '$hackathon_participation.hackathon_id', 't': '$hackathon_participation.team_id'},
+                'n': {'$sum': 1}
+            }},
+            {'$group': {'_id': {'h': '$_id.h', 'size': '$n'}, 'teams': {'$sum': 1}}}
+        ], allowDiskUse=True)
+        for row in team_sizes:
+            try:
+                hackathon_id = ObjectId(row['_id']['h'])
+            except (InvalidId, TypeError):
+                continue
+            stats[hackathon_id]['team_sizes'][str(row['_id']['size'])] = row['teams']
+
+        now = datetime.utcnow()
+        ops = []
+        written = 0
+        for doc in Hackathon._get_collection().find(hackathon_query, {'organization': 1, 'view_count': 1}):
+            entry = stats[doc['_id']]
+            written += 1
+            ops.append(UpdateOne(
+                {'hackathon': doc['_id']},
+                {'$set': {
+                    **entry,
+                    'organization': doc.get('organization'),
+                    'views': doc.get('view_count') or 0,
+                    'rebuilt_at': now,
+                    'updated_at': now
+                }},
+                upsert=True
+            ))
+            if len(ops) >= 1000:
+                self._collection().bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            self._collection().bulk_write(ops, ordered=False)
+
+        # stats of hackathons that no longer exist
+        if hackathon_ids is None:
+            existing = Hackathon._get_collection().distinct('_id')
+            self._collection().delete_many({'hackathon': {'$nin': existing}})
+
+        return written
+
+
+def _top(counts, label, limit=TOP_N):
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [{label: decode_key(key), 'count': n} for key, n in ranked[:limit] if n > 0]
+
+
+def _conversion(registrations, views):
+    return round(registrations / views, 4) if views else None
+
+
+def hackathon_dashboard(stats):
+    """Dashboard payload for one HackathonStats document"""
+    return {
+        'hackathon_id': str(stats.hackathon.id) if hasattr(stats.hackathon, 'id') else str(stats.hackathon),
+        'registrations': stats.registrations,
+        'views': stats.views,
+        'conversion': _conversion(stats.registrations, stats.views),
+        'registrations_per_day': [
+            {'date': day, 'count': n} for day, n in sorted(stats.registrations_by_day.items())
+        ],
+        'views_per_day': [
+            {'date': day, 'count': n} for day, n in sorted(stats.views_by_day.items())
+        ],
+        'countries': _top(stats.countries, 'country'),
+        'skills': _top(stats.skills, 'skill'),
+        'team_sizes': [
+            {'size': int(size), 'teams': n}
+            for size, n in sorted(stats.team_sizes.items(), key=lambda item: int(item[0]))
+        ],
+        'updated_at': stats.updated_at.isoformat() if stats.updated_at else None,
+        'rebuilt_at': stats.rebuilt_at.isoformat() if stats.rebuilt_at else None
+    }
+
+
+def empty_dashboard(hackathon_id):
+    """What a hackathon with no stats document yet looks like"""
+    return hackathon_dashboard(HackathonStats(hackathon=hackathon_id))
+
+
+def organization_dashboard(stats_list):
+    """Sum the per-hackathon rollups of one organization"""
+    totals = {'registrations_by_day': defaultdict(int), 'views_by_day': defaultdict(int),
+              'countries': defaultdict(int), 'skills': defaultdict(int), 'team_sizes': defaultdict(int)}
+    registrations = views = 0
+    hackathons = []
+
+    for stats in stats_list:
+        registrations += stats.registrations
+        views += stats.views
+        for field, summed in totals.items():
+            for key, n in (getattr(stats, field) or {}).items():
+                summed[key] += n
+        hackathons.append({
+            'hackathon_id': str(stats.hackathon.id) if hasattr(stats.hackathon, 'id') else str(stats.hackathon),
+            'registrations': stats.registrations,
+            'views': stats.views,
+            'conversion': _conversion(stats.registrations, stats.views)
+        })
+
+    hackathons.sort(key=lambda h: -h['registrations'])
+    return {
+        'registrations': registrations,
+        'views': views,
+        'conversion': _conversion(registrations, views),
+        'registrations_per_day': [
+            {'date': day, 'count': n} for day, n in sorted(totals['registrations_by_day'].items())
+        ],
+        'views_per_day': [
+            {'date': day, 'count': n} for day, n in sorted(totals['views_by_day'].items())
+        ],
+        'countries': _top(totals['countries'], 'country'),
+        'skills': _top(totals['skills'], 'skill'),
+        'team_sizes': [
+            {'size': int(size), 'teams': n}
+            for size, n in sorted(totals['team_sizes'].items(), key=lambda item: int(item[0]))
+        ],
+        'hackathons': hackathons
+    }
+
+
+# shared instance, the signal handlers below write through it
+analytics = AnalyticsMaterializer()
+
+
+def _on_registration_changed(sender, hackathon_id, user_id, status, **kwargs):
+    try:
+        if status == 'approved':
+            analytics.record_registration(hackathon_id, user_id, 1)
+        elif status is None:
+            # unregister only ever removes approved registrations
+            analytics.record_registration(hackathon_id, user_id, -1)
+    except Exception:
+        # the rebuild job repairs whatever an error here leaves out
+        logger.exception("Failed to update analytics for hackathon %s", hackathon_id)
+
+
+def _on_views_flushed(sender, counts, **kwargs):
+    try:
+        analytics.record_views(counts)
+    except Exception:
+        logger.exception("Failed to update view analytics for %d hackathons", len(counts))
+
+
+registration_changed.connect(_on_registration_changed)
+views_flushed.connect(_on_views_flushed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the materialized hackathon analytics")
+    parser.add_argument('--rebuild', action='store_true', help="recompute stats from the source collections")
+    parser.add_argument('--hackathon', action='append', help="only this hackathon id (repeatable)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    ids = [ObjectId(h) for h in args.hackathon] if args.hackathon else None
+    print(f"rebuilt stats for {analytics.rebuild(ids)} hackathons")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Declarative badge rules, evaluated per user or in bulk
+
+A BadgeRule is just data: the badge to give and the thresholds a user has to
+reach (xp, hackathons_won, hackathons_participated, number of projects /
+skills, or knowing some skill). The same rule is used two ways:
+
+- as a MongoDB filter, so a backfill only looks at users who qualify and
+  don't have the badge yet (aggregation $match + $project, one cursor), and
+  awards go out as bulk_write batches of guarded $push updates
+- as a Python check on a single user, run after their stats change
+
+Adding a badge = adding a rule to BADGE_RULES and running
+
+    cd backend
+    python -m app.services.badge_service --rule "Serial Hacker"
+"""
+import argparse
+import logging
+import os
+from datetime import datetime
+
+from mongoengine import connect, signals
+from pymongo import UpdateOne
+
+from ..models.user import User, Badge
+from ..models.signals import user_changes_committed
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# integer counters on User
+COUNTER_FIELDS = ['xp', 'hackathons_won', 'hackathons_participated']
+# list fields where the threshold is on the number of entries
+LIST_FIELDS = ['projects', 'skills']
+
+
+class BadgeRule:
+    """A badge plus the minimum stats needed to earn it"""
+
+    def __init__(self, name, description, icon="🏆", category="achievement",
+                 skills_any=None, **minimums):
+        unknown = set(minimums) - set(COUNTER_FIELDS) - set(LIST_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown badge rule fields: {', '.join(sorted(unknown))}")
+
+        self.name = name
+        self.description = description
+        self.icon = icon
+        self.category = category
+        self.minimums = minimums
+        self.skills_any = list(skills_any or [])
+
+    @property
+    def fields(self):
+        """User fields this rule looks at"""
+        fields = set(self.minimums)
+        if self.skills_any:
+            fields.add('skills')
+        return fields
+
+    def query(self):
+        """MongoDB filter for users who qualify but don't have the badge"""
+        query = {'badges.name': {'$ne': self.name}}
+        for field, minimum in self.minimums.items():
+            if field in LIST_FIELDS:
+                # "has at least n entries" without $size - can use an index on the field
+                query[f'{field}.{minimum - 1}'] = {'$exists': True}
+            else:
+                query[field] = {'$gte': minimum}
+        if self.skills_any:
+            query['skills'] = {'$in': self.skills_any}
+        return query
+
+    def matches(self, stats):
+        """Python version of query() for one user's stats (see user_stats)"""
+        if self.name in stats['badge_names']:
+            return False
+        for field, minimum in self.minimums.items():
+            if (stats.get(field) or 0) < minimum:
+                return False
+        if self.skills_any and not set(self.skills_any) & set(stats['skill_names']):
+            return False
+        return True
+
+    def badge_doc(self, metadata=None):
+        badge = Badge(
+            name=self.name,
+            description=self.description,
+            icon=self.icon,
+            category=self.category,
+            earned_at=datetime.utcnow(),
+            metadata=metadata or {'rule': self.name}
+        )
+        badge.validate()
+        return badge.to_mongo().to_dict()
+
+
+BADGE_RULES = [
+    BadgeRule("First Hackathon", "Participated in your first hackathon!", "🚀", "participation",
+              hackathons_participated=1),
+    BadgeRule("Serial Hacker", "Participated in 5 hackathons", "🔁", "participation",
+              hackathons_participated=5),
+    BadgeRule("Hackathon Veteran", "Participated in 20 hackathons", "🎖️", "participation",
+              hackathons_participated=20),
+    BadgeRule("First Win", "Won an award at a hackathon", "🥇", "achievement",
+              hackathons_won=1),
+    BadgeRule("5 Wins", "Won awards at 5 hackathons", "🏆", "achievement",
+              hackathons_won=5),
+    BadgeRule("Builder", "Added 3 projects to your profile", "🛠️", "achievement",
+              projects=3),
+    BadgeRule("Polyglot", "Lists 10 or more skills", "🧠", "skill",
+              skills=10),
+    BadgeRule("Rising Star", "Reached 1,000 XP", "⭐", "special",
+              xp=1000),
+    BadgeRule("Legend", "Reached 10,000 XP", "🌟", "special",
+              xp=10000),
+]
+
+
+def user_stats(doc):
+    """Stats the rules look at, from a projected user document (see _pipeline)"""
+    return {
+        'xp': doc.get('xp', 0),
+        'hackathons_won': doc.get('hackathons_won', 0),
+        'hackathons_participated': doc.get('hackathons_participated', 0),
+        'projects': doc.get('projects', 0),
+        'skills': len(doc.get('skills') or []),
+        'skill_names': doc.get('skills') or [],
+        'badge_names': set(doc.get('badge_names') or [])
+    }
+
+
+class BadgeEngine:
+    """Evaluates BADGE_RULES for one user or for the whole users collection"""
+
+    def __init__(self, rules=None, batch_size=1000):
+        self.rules = list(BADGE_RULES if rules is None else rules)
+        self.batch_size = batch_size
+
+    def get_rules(self, names=None):
+        if not names:
+            return self.rules
+        by_name = {rule.name: rule for rule in self.rules}
+        missing = [n for n in names if n not in by_name]
+        if missing:
+            raise ValueError(f"Unknown badge rules: {', '.join(missing)}")
+        return [by_name[n] for n in names]
+
+    @property
+    def fields(self):
+        return set().union(*(rule.fields for rule in self.rules))
+
+    # ===== ONE USER =====
+
+    def evaluate_user(self, user):
+        """
+        Award every badge `user` now qualifies for; returns the new badge names
+        One guarded update per badge (usually there's only one), so a badge a
+        concurrent award got to first isn't reported as new.
+        """
+        stats = user_stats({
+            'xp': user.xp,
+            'hackathons_won': user.hackathons_won,
+            'hackathons_participated': user.hackathons_participated,
+            'projects': len(user.projects),
+            'skills': user.skills,
+            'badge_names': [b.name for b in user.badges]
+        })
+
+        awarded = []
+        for rule in self.rules:
+            if not rule.matches(stats):
+                continue
+            added, _ = user.award_badge(rule.name, rule.description, rule.icon, rule.category,
+                                        {'rule': rule.name})
+            if added:
+                awarded.append(rule.name)
+        return awarded
+
+    # ===== BULK =====
+
+    def _pipeline(self, rules):
+        return [
+            {'$match': {'is_active': True, '$or': [rule.query() for rule in rules]}},
+            {'$project': {
+                'xp': 1,
+                'hackathons_won': 1,
+                'hackathons_participated': 1,
+                'skills': 1,
+                'projects': {'$size': {'$ifNull': ['$projects', []]}},
+                'badge_names': {'$ifNull': ['$badges.name', []]}
+            }}
+        ]
+
+    def backfill(self, rule_names=None, dry_run=False):
+        """
+        Award badges to everyone who qualifies, in bulk
+        Returns {badge name: users awarded} - counted from what the guarded
+        updates actually modified (a dry run counts the candidates)
+        """
+        rules = self.get_rules(rule_names)
+        collection = User._get_collection()
+        awarded = {rule.name: 0 for rule in rules}
+        # one batch per badge, so each bulk result tells how many got that badge
+        ops = {rule.name: [] for rule in rules}
+
+        def flush(name):
+            batch = ops[name]
+            if batch and dry_run:
+                awarded[name] += len(batch)
+            elif batch:
+                awarded[name] += collection.bulk_write(batch, ordered=False).modified_count
+            batch.clear()
+
+        cursor = collection.aggregate(self._pipeline(rules), batchSize=self.batch_size)
+        for doc in cursor:
+            earned = [rule for rule in rules if rule.matches(user_stats(doc))]
+            if not earned:
+                continue
+
+            for rule in earned:
+                ops[rule.name].append(UpdateOne(
+                    # guard: a concurrent award of the same badge makes this a no-op
+                    {'_id': doc['_id'], 'badges.name': {'$ne': rule.name}},
+                    {'$push': {'badges': rule.badge_doc()},
+                     '$set': {'updated_at': datetime.utcnow()}}
+                ))
+                if len(ops[rule.name]) >= self.batch_size:
+                    flush(rule.name)
+        for rule in rules:
+            flush(rule.name)
+
+        logger.info("Badge backfill%s: %s", " (dry run)" if dry_run else "", awarded)
+        return awarded
+
+
+# shared per-process engine
+badge_engine = BadgeEngine()
+
+
+def _on_user_committed(sender, document, fields, **kwargs):
+    if fields & badge_engine.fields:
+        badge_engine.evaluate_user(document)
+
+
+def _on_user_saved(sender, document, created=False, **kwargs):
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if not created and changed & badge_engine.fields:
+        badge_engine.evaluate_user(document)
+
+
+user_changes_committed.connect(_on_user_committed, sender=User)
+signals.post_save.connect(_on_user_saved, sender=User)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Award badges to every user who qualifies")
+    parser.add_argument('--rule', action='append', dest='rules',
+                        help="only these badges (repeatable, default: all rules)")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    engine = BadgeEngine(batch_size=args.batch_size)
+    for name, count in engine.backfill(args.rules, dry_run=args.dry_run).items():
+        print(f"{name:<24} {count}")
+
+
+if __name__ == '__main__':
+    main()
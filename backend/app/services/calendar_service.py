@@ -0,0 +1,313 @@
+"""
+Calendar events and personal iCalendar feeds
+
+Every dated thing of a published hackathon is flattened into a CalendarEvent
+row, rewritten from the Hackathon post_save signal when one of its dates,
+its schedule or its visibility changes:
+
+    hackathon saved -> hackathon_events() -> bulk upsert by uid (new sync_id)
+                    -> delete the rows the sync didn't write
+
+Range queries ("everything between A and B") are then a scan of the
+(start, end) index. An event overlaps [A, B) when start < B and end >= A;
+`end >= A` alone isn't selective, so the scan starts at A minus the longest
+event duration, which keeps it to the window plus the longest event. That
+bound is read from the -duration index on every query (one covered
+find_one), so a longer event synced by another worker is never missed.
+
+Personal ICS feeds (registered hackathons only) are assembled from per
+hackathon VEVENT blocks. A block is rendered once and reused until that
+hackathon's rows change. The feed's ETag comes from the rows' versions alone,
+so a calendar app polling an unchanged feed gets a 304 without anything
+being rendered.
+
+    python -m app.services.calendar_service --rebuild
+"""
+import argparse
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from mongoengine import connect, signals
+from pymongo import UpdateOne
+
+from ..models.calendar import CalendarEvent
+from ..models.hackathon import Hackathon
+from ..models.registration import Registration
+from ..utils.cache import TTLCache, make_etag
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# a save touching any of these rewrites the hackathon's calendar rows
+CALENDAR_FIELDS = {
+    'name', 'slug', 'start_date', 'end_date', 'registration_deadline',
+    'submission_deadline', 'result_date', 'schedule', 'is_published', 'status',
+    'mode', 'venue_name', 'city', 'country', 'event_url'
+}
+
+# longest range GET /api/calendar/events answers in one request
+MAX_RANGE_DAYS = 92
+
+PRODID = '-//ThonHub//Hackathon Calendar//EN'
+
+
+def _location(hackathon):
+    if hackathon.mode == 'online':
+        return hackathon.event_url
+    return ', '.join(p for p in (hackathon.venue_name, hackathon.city, hackathon.country) if p) or None
+
+
+def hackathon_events(hackathon):
+    """The calendar rows of one hackathon as dicts (none unless it's public)"""
+    if not hackathon.is_published or hackathon.status in ('draft', 'cancelled'):
+        return []
+
+    hid = str(hackathon.id)
+    name = hackathon.name
+    location = _location(hackathon)
+    rows = []
+
+    def add(uid, kind, title, start, end=None, **extra):
+        if not start:
+            return
+        end = max(end or start, start)
+        rows.append({
+            'uid': uid,
+            'hackathon': hackathon.id,
+            'hackathon_name': name,
+            'hackathon_slug': hackathon.slug,
+            'kind': kind,
+            'title': title,
+            'description': extra.get('description'),
+            'location': extra.get('location', location),
+            'event_type': extra.get('event_type'),
+            'start': start,
+            'end': end,
+            'duration': int((end - start).total_seconds())
+        })
+
+    add(f'{hid}-hackathon', 'hackathon', name, hackathon.start_date, hackathon.end_date,
+        description=hackathon.tagline)
+    add(f'{hid}-registration_deadline', 'registration_deadline',
+        f'{name}: registration closes', hackathon.registration_deadline)
+    add(f'{hid}-submission_deadline', 'submission_deadline',
+        f'{name}: submissions due', hackathon.submission_deadline)
+    add(f'{hid}-results', 'results', f'{name}: results', hackathon.result_date)
+
+    for n, item in enumerate(hackathon.schedule or []):
+        add(f'{hid}-schedule-{n}', 'schedule', f'{name}: {item.title}', item.start_time, item.end_time,
+            description=item.description, location=item.location or location,
+            event_type=item.event_type)
+
+    return rows
+
+
+class CalendarStore:
+    """Writes CalendarEvent rows and answers range / feed queries"""
+
+    def __init__(self):
+        # hackathon id -> (version, rendered VEVENT text)
+        self._blocks = TTLCache(maxsize=int(os.getenv('CALENDAR_BLOCK_CACHE_SIZE', 5000)), ttl=3600)
+
+    def _collection(self):
+        return CalendarEvent._get_collection()
+
+    # MAINTENANCE
+
+    def sync(self, hackathon):
+        """Rewrite one hackathon's rows, returns how many it has now"""
+        rows = hackathon_events(hackathon)
+        sync_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+
+        if rows:
+            self._collection().bulk_write([
+                UpdateOne(
+                    {'uid': row['uid']},
+                    {'$set': {**row, 'sync_id': sync_id, 'updated_at': now}},
+                    upsert=True
+                )
+                for row in rows
+            ], ordered=False)
+        self._collection().delete_many({'hackathon': hackathon.id, 'sync_id': {'$ne': sync_id}})
+
+        self._blocks.delete(hackathon.id)
+        return len(rows)
+
+    def remove(self, hackathon_id):
+        self._collection().delete_many({'hackathon': hackathon_id})
+        self._blocks.delete(hackathon_id)
+
+    def rebuild(self, batch_size=500):
+        """Sync every hackathon (backfill / repair), returns the number of rows written"""
+        total = 0
+        hackathons = Hackathon.objects.only(*(CALENDAR_FIELDS | {'id', 'tagline'})).batch_size(batch_size)
+        for hackathon in hackathons:
+            total += self.sync(hackathon)
+        self._collection().delete_many({'hackathon': {'$nin': Hackathon._get_collection().distinct('_id')}})
+        return total
+
+    # RANGE QUERIES
+
+    def longest_duration(self):
+        """The longest event in seconds - first entry of the -duration index"""
+        doc = self._collection().find_one({}, {'duration': 1, '_id': 0}, sort=[('duration', -1)])
+        return (doc or {}).get('duration') or 0
+
+    def between(self, start, end, kinds=None, hackathon_ids=None, limit=1000):
+        """Events overlapping [start, end), in start order"""
+        lower = start - timedelta(seconds=self.longest_duration())
+        query = CalendarEvent.objects(start__lt=end, start__gte=lower, end__gte=start)
+        if kinds:
+            query = query.filter(kind__in=list(kinds))
+        if hackathon_ids:
+            query = query.filter(hackathon__in=list(hackathon_ids))
+        return list(query.order_by('start').limit(limit))
+
+    # PERSONAL FEEDS
+
+    def feed_versions(self, user_id):
+        """[(hackathon id, version)] of the hackathons a user's feed contains"""
+        hackathon_ids = [
+            r['hackathon'] for r in Registration._get_collection().find(
+                {'user': user_id, 'status': 'approved'}, {'hackathon': 1, '_id': 0}
+            )
+        ]
+        if not hackathon_ids:
+            return []
+
+        versions = self._collection().aggregate([
+            {'$match': {'hackathon': {'$in': hackathon_ids}}},
+            {'$group': {'_id': '$hackathon', 'synced': {'$max': '$updated_at'}, 'n': {'$sum': 1}}}
+        ])
+        return sorted((row['_id'], f"{row['synced'].isoformat()}/{row['n']}") for row in versions)
+
+    def feed_etag(self, user_id, versions):
+        return make_etag('ics', user_id, *(f'{h}:{v}' for h, v in versions))
+
+    def render_feed(self, versions, name='ThonHub'):
+        """The whole VCALENDAR text, re-rendering only blocks whose version changed"""
+        blocks = {}
+        missing = []
+        for hackathon_id, version in versions:
+            entry = self._blocks.get(hackathon_id)
+            if entry is not None and entry[0] == version:
+                blocks[hackathon_id] = entry[1]
+            else:
+                missing.append(hackathon_id)
+
+        if missing:
+            stamp = _ics_time(datetime.utcnow())
+            rows = defaultdict(list)
+            for row in self._collection().find({'hackathon': {'$in': missing}}).sort('start', 1):
+                rows[row['hackathon']].append(row)
+            current = dict(versions)
+            for hackathon_id in missing:
+                text = ''.join(vevent(row, stamp) for row in rows[hackathon_id])
+                self._blocks.set(hackathon_id, (current[hackathon_id], text))
+                blocks[hackathon_id] = text
+
+        header = _lines(
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            f'PRODID:{PRODID}',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f'X-WR-CALNAME:{_escape(name)}',
+            'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        )
+        return header + ''.join(blocks[h] for h, _ in versions) + _lines('END:VCALENDAR')
+
+
+# ===== ICS FORMATTING (RFC 5545) =====
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Lines longer than 75 octets continue on the next line after a space"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _lines(*lines):
+    return ''.join(_fold(line) for line in lines)
+
+
+def _ics_time(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(row, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{row['uid']}@thonhub",
+        f'DTSTAMP:{stamp}',
+        f"DTSTART:{_ics_time(row['start'])}",
+        f"DTEND:{_ics_time(row['end'])}",
+        f"SUMMARY:{_escape(row['title'])}",
+    ]
+    if row.get('description'):
+        lines.append(f"DESCRIPTION:{_escape(row['description'])}")
+    if row.get('location'):
+        lines.append(f"LOCATION:{_escape(row['location'])}")
+    lines.append(f"CATEGORIES:{row['kind'].upper().replace('_', '-')}")
+    lines.append('END:VEVENT')
+    return _lines(*lines)
+
+
+# shared per-process store
+calendar_store = CalendarStore()
+
+
+def _on_hackathon_saved(sender, document, created=False, **kwargs):
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if created or changed & CALENDAR_FIELDS:
+        calendar_store.sync(document)
+
+
+def _on_hackathon_deleted(sender, document, **kwargs):
+    calendar_store.remove(document.id)
+
+
+signals.post_save.connect(_on_hackathon_saved, sender=Hackathon)
+signals.post_delete.connect(_on_hackathon_deleted, sender=Hackathon)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the flattened hackathon calendar")
+    parser.add_argument('--rebuild', action='store_true', help="rewrite the rows of every hackathon")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    print(f"wrote {calendar_store.rebuild()} calendar events")
+
+
+if __name__ == '__main__':
+    main()
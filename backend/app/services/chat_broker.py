@@ -0,0 +1,135 @@
+"""
+Pub/sub for live chat
+
+Routes publish every new message to the team's channel and the SSE stream of
+each connected client subscribes to it. The default InProcessBroker only
+reaches clients connected to the same worker process, which is enough for
+development and a single worker. With several gunicorn workers set
+CHAT_BROKER_URL=redis://localhost:6379/0 to fan messages out through Redis
+(needs the `redis` package).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A client's view of one or more channels; get() blocks until a message arrives"""
+
+    def __init__(self, broker, channel, maxsize=100):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # a client that stopped reading shouldn't block everybody else
+            logger.warning("Dropping chat message for slow subscriber on %s", self.channel)
+
+    def get(self, timeout=None):
+        """Next message, or None after `timeout` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Channels live in this process only"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        """Hand `message` (a JSON-able dict) to every subscriber of `channel`"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Same interface, but publish() goes through Redis
+    One listener thread per process relays Redis messages to the local
+    subscribers, so each worker holds a single Redis connection for reading.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # optional - only needed when CHAT_BROKER_URL is set
+
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._thread = None
+        self._pid = None
+        self._prefix = 'chat:'
+
+    def _ensure_listening(self):
+        # per process - a pubsub connection shouldn't be shared across a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.psubscribe(self._prefix + '*')
+            self._thread = threading.Thread(target=self._listen, name='chat-broker', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        for item in self._pubsub.listen():
+            channel = item['channel'].decode()[len(self._prefix):]
+            try:
+                message = json.loads(item['data'])
+            except (TypeError, ValueError):
+                continue
+            super().publish(channel, message)
+
+    def subscribe(self, channel):
+        self._ensure_listening()
+        return super().subscribe(channel)
+
+    def publish(self, channel, message):
+        return self._redis.publish(self._prefix + channel, json.dumps(message))
+
+
+def create_broker(url=None):
+    url = url or os.getenv('CHAT_BROKER_URL')
+    if url and url.startswith('redis://'):
+        return RedisBroker(url)
+    return InProcessBroker()
+
+
+# shared per-process broker
+chat_broker = create_broker()
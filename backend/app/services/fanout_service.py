@@ -0,0 +1,583 @@
+"""
+Streaming fan-out of hackathon updates to every participant
+
+When an organizer changes a published hackathon's schedule, status or
+dates, a FanoutJob is created and run in the background:
+
+- recipients are streamed from the registrations collection in user-id
+  order (index hackathon+status+user), FANOUT_BATCH_SIZE at a time
+- each batch loads just the users' notification fields with one $in query,
+  writes the in-app notifications with one insert_many, and puts emails for
+  users with email_notifications on into a bounded queue that a couple of
+  sender threads drain through the 'email' channel
+- after each batch the job checkpoints last_user and its counters, so an
+  interrupted 50k-recipient job resumes after the last finished batch.
+  Notifications are unique per (job, user), so re-running a half-written
+  batch doesn't duplicate in-app notifications.
+- each notification that should be emailed is written with
+  email_status='pending' and only marked sent once the channel took it.
+  It is claimed by the process whose email queue holds it, and that
+  process renews email_queued_at every FANOUT_EMAIL_RENEW_INTERVAL seconds
+  while anything is queued, however long the queue is. Only emails of a
+  process that stopped renewing (it died) are still pending `stale_after`
+  later; resend_pending_emails() claims and queues those again, so delivery
+  is at least once. After FANOUT_EMAIL_ATTEMPTS tries an email is marked
+  failed instead.
+
+Jobs that stopped (worker killed, deploy) and unsent emails are picked up
+by a watcher thread every FANOUT_RESUME_INTERVAL seconds, started in any
+process that runs fan-out jobs. It also runs on its own:
+
+    cd backend
+    python -m app.services.fanout_service --watch
+    python -m app.services.fanout_service --resume    # once
+"""
+import argparse
+import atexit
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from mongoengine import connect, signals
+from mongoengine.queryset.visitor import Q
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..models.hackathon import Hackathon
+from ..models.notification import Notification, FanoutJob
+from ..models.registration import Registration
+from ..models.signals import status_transitioned
+from ..models.user import User
+from ..utils.dereference import raw_ref
+from .notification_service import get_channel
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# hackathon fields participants get notified about, and the event they map to
+FANOUT_FIELDS = {
+    'schedule': 'schedule_changed',
+    'status': 'status_changed',
+    'registration_deadline': 'dates_changed',
+    'start_date': 'dates_changed',
+    'end_date': 'dates_changed',
+    'submission_deadline': 'dates_changed',
+    'result_date': 'dates_changed',
+}
+
+# what an email needs from the user document
+RECIPIENT_FIELDS = {'email': 1, 'username': 1, 'first_name': 1, 'last_name': 1, 'email_notifications': 1}
+
+DATE_LABELS = {
+    'registration_deadline': 'Registration deadline',
+    'start_date': 'Starts',
+    'end_date': 'Ends',
+    'submission_deadline': 'Submission deadline',
+    'result_date': 'Results',
+}
+
+
+class EmailQueue:
+    """
+    Bounded in-process email queue
+    put() blocks while the queue is full, so a big fan-out is paced by how
+    fast mail actually goes out instead of buffering 50k messages in memory.
+    Messages are keyed by notification id; once the channel answers, the
+    notification's email_status and the job's counters are updated. A batch
+    whose send() raised is released and retried by the resend sweep.
+
+    The notifications it holds are claimed with owner() (host:pid:random);
+    while anything is queued they are renewed every `renew_interval`
+    seconds, which has to stay well below FanoutRunner.stale_after.
+    """
+
+    def __init__(self, maxsize=None, workers=None, batch_size=100, renew_interval=None):
+        self.maxsize = maxsize or int(os.getenv('FANOUT_EMAIL_QUEUE', 5000))
+        self.workers = workers or int(os.getenv('FANOUT_EMAIL_WORKERS', 2))
+        self.batch_size = batch_size
+        self.renew_interval = renew_interval or float(os.getenv('FANOUT_EMAIL_RENEW_INTERVAL', 60))
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._owner = None
+
+    def owner(self):
+        """Claim value for notifications this process is going to queue"""
+        self._ensure_started()
+        return self._owner
+
+    def put(self, message):
+        self._ensure_started()
+        self._queue.put(message)
+
+    def renew(self):
+        """Keep this process's claims fresh so the resend sweep leaves them alone"""
+        return Notification._get_collection().update_many(
+            # exact owner, or owner/<sweep> for re-queued ones (anchored regex uses the index)
+            {'email_claim': {'$regex': f'^{re.escape(self._owner)}'}, 'email_status': 'pending'},
+            {'$set': {'email_queued_at': datetime.utcnow()}}
+        ).modified_count
+
+    def join(self):
+        """Wait until everything queued so far has been handed to the channel"""
+        self._queue.join()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # per process - threads don't survive a gunicorn fork
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._threads = [
+                threading.Thread(target=self._run, name=f'fanout-email-{i}', daemon=True)
+                for i in range(self.workers)
+            ] + [threading.Thread(target=self._renew, name='fanout-email-renew', daemon=True)]
+            for thread in self._threads:
+                thread.start()
+
+    def _renew(self):
+        while not threading.Event().wait(self.renew_interval):
+            # unfinished_tasks: queued plus the batches being sent right now
+            if self._queue.unfinished_tasks:
+                try:
+                    self.renew()
+                except Exception:
+                    logger.exception("Renewing fan-out email claims failed")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                failed = get_channel('email').send(batch)
+                if failed:
+                    logger.warning("%d fan-out emails failed", len(failed))
+                self._record(batch, failed)
+            except Exception:
+                logger.exception("Fan-out email batch of %d failed", len(batch))
+                self._release(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _release(batch):
+        """Stop renewing a batch whose send raised - it goes stale and is retried"""
+        try:
+            Notification._get_collection().update_many(
+                {'_id': {'$in': [message['id'] for message in batch]}, 'email_status': 'pending'},
+                {'$unset': {'email_claim': ''}}
+            )
+        except Exception:
+            logger.exception("Releasing %d fan-out emails failed", len(batch))
+
+    @staticmethod
+    def _record(batch, failed):
+        """Mark the batch's notifications sent/failed and count them on their jobs"""
+        now = datetime.utcnow()
+        ops, per_job = [], {}
+        for message in batch:
+            query = {'_id': message['id'], 'email_status': 'pending'}
+            counts = per_job.setdefault(message['job'], [0, 0])
+            if message['id'] in failed:
+                ops.append(UpdateOne(query, {'$set': {'email_status': 'failed', 'email_error': str(failed[message['id']])},
+                                             '$unset': {'email_claim': ''}}))
+                counts[1] += 1
+            else:
+                ops.append(UpdateOne(query, {'$set': {'email_status': 'sent', 'email_sent_at': now},
+                                             '$unset': {'email_claim': ''}}))
+                counts[0] += 1
+        Notification._get_collection().bulk_write(ops, ordered=False)
+        for job_id, (sent, failures) in per_job.items():
+            FanoutJob.objects(id=job_id).update_one(inc__emails_sent=sent, inc__emails_failed=failures)
+
+
+class FanoutRunner:
+    """Creates fan-out jobs and runs them in background threads"""
+
+    def __init__(self, batch_size=None, workers=2, stale_after=timedelta(minutes=5), emails=None,
+                 poll_interval=None, max_email_attempts=None):
+        self.batch_size = batch_size or int(os.getenv('FANOUT_BATCH_SIZE', 1000))
+        self.workers = workers
+        self.stale_after = stale_after
+        self.max_email_attempts = max_email_attempts or int(os.getenv('FANOUT_EMAIL_ATTEMPTS', 5))
+        self.emails = emails or EmailQueue()
+        self.poll_interval = poll_interval or float(os.getenv('FANOUT_RESUME_INTERVAL', 60))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    # ===== JOBS =====
+
+    def create_job(self, hackathon, event, title, message, changes=None, start=True):
+        """Queue a fan-out to every approved participant of `hackathon`"""
+        job = FanoutJob(
+            hackathon=hackathon.id,
+            event=event,
+            title=title,
+            message=message,
+            changes=changes or {},
+            total=Registration.objects(hackathon=hackathon.id, status='approved').count()
+        )
+        job.save()
+        if start:
+            self.submit(job.id)
+        return job
+
+    def submit(self, job_id):
+        self.start()
+        return self._get_executor().submit(self.run, job_id)
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fanout')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _claim(self, job_id, token):
+        """Take the job unless another worker is actively running it"""
+        stale = datetime.utcnow() - self.stale_after
+        return FanoutJob.objects(
+            Q(id=job_id) & (
+                Q(status__in=['pending', 'failed']) |
+                Q(status='running', heartbeat_at__lt=stale)
+            )
+        ).update_one(
+            set__status='running',
+            set__claimed_by=token,
+            set__heartbeat_at=datetime.utcnow(),
+            unset__last_error=True
+        ) == 1
+
+    def run(self, job_id):
+        """Run (or resume) a job to completion; returns the finished job or None"""
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if not self._claim(job_id, token):
+            return None
+
+        job = FanoutJob.objects.get(id=job_id)
+        try:
+            query = {'hackathon': raw_ref(job, 'hackathon'), 'status': 'approved'}
+            if job.last_user:
+                query['user'] = {'$gt': job.last_user}
+
+            recipients = Registration._get_collection().find(
+                query, {'user': 1, '_id': 0}
+            ).sort('user', 1).batch_size(self.batch_size)
+
+            batch = []
+            for row in recipients:
+                batch.append(row['user'])
+                if len(batch) >= self.batch_size:
+                    if not self._process_batch(job, batch, token):
+                        return None
+                    batch = []
+            if batch and not self._process_batch(job, batch, token):
+                return None
+
+            FanoutJob.objects(id=job.id, claimed_by=token).update_one(
+                set__status='completed', set__finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            logger.exception("Fan-out job %s failed", job.id)
+            FanoutJob.objects(id=job.id, claimed_by=token).update_one(
+                set__status='failed', set__last_error=str(e)
+            )
+        return FanoutJob.objects(id=job.id).first()
+
+    def _process_batch(self, job, user_ids, token):
+        """Notify one batch, then checkpoint; False if we lost the job to another worker"""
+        now = datetime.utcnow()
+        users = list(User._get_collection().find(
+            {'_id': {'$in': user_ids}, 'is_active': True, 'is_banned': {'$ne': True}},
+            RECIPIENT_FIELDS
+        ))
+
+        docs = []
+        for user in users:
+            doc = {
+                'user': user['_id'],
+                'hackathon': raw_ref(job, 'hackathon'),
+                'job': job.id,
+                'type': 'hackathon_update',
+                'title': job.title,
+                'message': job.message,
+                'data': {'event': job.event, 'changes': job.changes},
+                'is_read': False,
+                'created_at': now
+            }
+            if user.get('email_notifications', True):
+                doc['email_status'] = 'pending'
+                doc['email_queued_at'] = now
+                doc['email_claim'] = self.emails.owner()
+                doc['email_attempts'] = 1
+            docs.append(doc)
+
+        already_notified = set()
+        if docs:
+            try:
+                Notification._get_collection().insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if any(err.get('code') != 11000 for err in errors):
+                    raise
+                # written by an earlier, interrupted run of this job - if
+                # their emails never went out, the resend sweep finds them
+                already_notified = {docs[err['index']]['user'] for err in errors}
+
+        users_by_id = {user['_id']: user for user in users}
+        emailed = 0
+        for doc in docs:
+            if doc['user'] in already_notified or 'email_status' not in doc:
+                continue
+            # insert_many set _id on each doc
+            self.emails.put(email_message(doc, users_by_id[doc['user']]))
+            emailed += 1
+
+        checkpointed = FanoutJob.objects(id=job.id, claimed_by=token).update_one(
+            set__last_user=user_ids[-1],
+            set__heartbeat_at=datetime.utcnow(),
+            inc__processed=len(user_ids),
+            inc__notified=len(docs) - len(already_notified),
+            inc__emails_queued=emailed
+        )
+        return checkpointed == 1
+
+    def resume_stalled(self):
+        """Restart jobs that are pending, failed, or whose worker stopped heartbeating"""
+        stale = datetime.utcnow() - self.stale_after
+        jobs = FanoutJob.objects(
+            Q(status__in=['pending', 'failed']) | Q(status='running', heartbeat_at__lt=stale)
+        ).only('id')
+        return [self.submit(job.id) for job in jobs]
+
+    def resend_pending_emails(self):
+        """
+        Queue again the emails whose claim wasn't renewed for `stale_after` -
+        the process holding them stopped (or their send raised). Claimed with
+        a token so two watchers never queue the same notification; emails
+        out of attempts are marked failed instead. Returns how many were queued.
+        """
+        now = datetime.utcnow()
+        stale = {'email_status': 'pending', 'email_queued_at': {'$lt': now - self.stale_after}}
+        collection = Notification._get_collection()
+
+        exhausted = list(collection.find(
+            {**stale, 'email_attempts': {'$gte': self.max_email_attempts}}, {'job': 1}
+        ))
+        if exhausted:
+            collection.update_many(
+                {'_id': {'$in': [row['_id'] for row in exhausted]}, 'email_status': 'pending'},
+                {'$set': {'email_status': 'failed',
+                          'email_error': f"not sent after {self.max_email_attempts} attempts"},
+                 '$unset': {'email_claim': ''}}
+            )
+            per_job = {}
+            for row in exhausted:
+                per_job[row['job']] = per_job.get(row['job'], 0) + 1
+            for job_id, failures in per_job.items():
+                FanoutJob.objects(id=job_id).update_one(inc__emails_failed=failures)
+            logger.warning("Gave up on %d fan-out emails", len(exhausted))
+
+        # owner/<sweep>: renewed with this process's other claims, found apart from them
+        token = f"{self.emails.owner()}/{uuid.uuid4().hex[:8]}"
+        collection.update_many(
+            {**stale, 'email_attempts': {'$not': {'$gte': self.max_email_attempts}}},
+            {'$set': {'email_queued_at': now, 'email_claim': token}, '$inc': {'email_attempts': 1}}
+        )
+        rows = collection.find(
+            {'email_claim': token, 'email_status': 'pending'},
+            {'user': 1, 'job': 1, 'title': 1, 'message': 1}
+        ).batch_size(self.batch_size)
+
+        queued = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                queued += self._resend(batch)
+                batch = []
+        if batch:
+            queued += self._resend(batch)
+        if queued:
+            logger.info("Re-queued %d unsent fan-out emails", queued)
+        return queued
+
+    def _resend(self, rows):
+        users = {user['_id']: user for user in User._get_collection().find(
+            {'_id': {'$in': [row['user'] for row in rows]}, 'is_active': True, 'is_banned': {'$ne': True}},
+            RECIPIENT_FIELDS
+        )}
+        skipped = []
+        for row in rows:
+            user = users.get(row['user'])
+            if not user or not user.get('email_notifications', True):
+                skipped.append(row['_id'])
+                continue
+            self.emails.put(email_message(row, user))
+        if skipped:
+            Notification._get_collection().update_many(
+                {'_id': {'$in': skipped}, 'email_status': 'pending'},
+                {'$set': {'email_status': 'skipped'}}
+            )
+        return len(rows) - len(skipped)
+
+    # ----- background watcher -----
+
+    def start(self):
+        # lazily and per process, like the schedulers - threads don't survive a fork
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='fanout-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.resume_stalled()
+                self.resend_pending_emails()
+            except Exception:
+                logger.exception("Fan-out watcher failed")
+
+    def shutdown(self):
+        self.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.emails.join()
+
+
+# shared per-process runner
+fanout_runner = FanoutRunner()
+
+atexit.register(fanout_runner.shutdown)
+
+
+def email_message(notification, user):
+    """Email for a fan-out notification row (user: raw document with the name fields)"""
+    name = ' '.join(filter(None, [user.get('first_name'), user.get('last_name')])) or user.get('username')
+    return {
+        'id': notification['_id'],
+        'job': notification['job'],
+        'to': user['email'],
+        'name': name,
+        'subject': notification['title'],
+        'body': notification.get('message')
+    }
+
+
+def describe_changes(hackathon, fields):
+    """(event, title, message, changes) for the fields an organizer just changed"""
+    changes = {}
+    lines = []
+
+    if 'status' in fields:
+        changes['status'] = hackathon.status
+        lines.append(f"{hackathon.name} is now {hackathon.status.replace('_', ' ')}.")
+
+    dates = [f for f in DATE_LABELS if f in fields]
+    for field in dates:
+        value = getattr(hackathon, field)
+        changes[field] = value.isoformat() if value else None
+        lines.append(f"{DATE_LABELS[field]}: {value.strftime('%Y-%m-%d %H:%M') + ' UTC' if value else 'TBA'}")
+
+    if 'schedule' in fields:
+        changes['schedule'] = True
+        lines.append(f"The schedule for {hackathon.name} was updated.")
+
+    if 'status' in fields:
+        event, title = 'status_changed', f"{hackathon.name}: status update"
+    elif dates:
+        event, title = 'dates_changed', f"{hackathon.name}: dates changed"
+    else:
+        event, title = 'schedule_changed', f"{hackathon.name}: schedule updated"
+
+    return event, title, '\n'.join(lines), changes
+
+
+def _on_hackathon_saved(sender, document, created=False, **kwargs):
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    fields = changed & set(FANOUT_FIELDS)
+    # nobody to tell about a brand new or just-published hackathon
+    if created or not fields or not document.is_published or 'is_published' in changed:
+        return
+    fanout_runner.create_job(document, *describe_changes(document, fields))
+
+
+def _on_status_transitioned(sender, transitions, **kwargs):
+    # the same notice participants get when an organizer changes the status;
+    # nobody is registered before registration opens
+    ids = [hackathon_id for hackathon_id, old, _ in transitions if old != 'published']
+    for hackathon in Hackathon.objects(id__in=ids).only('name', 'status'):
+        fanout_runner.create_job(hackathon, *describe_changes(hackathon, {'status'}))
+
+
+signals.post_save.connect(_on_hackathon_saved, sender=Hackathon)
+status_transitioned.connect(_on_status_transitioned)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or resume hackathon fan-out jobs")
+    parser.add_argument('--resume', action='store_true', help="resume pending/failed/stalled jobs and unsent emails")
+    parser.add_argument('--watch', action='store_true', help="keep resuming every FANOUT_RESUME_INTERVAL seconds")
+    parser.add_argument('--job', help="run one job by id")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    if args.job:
+        job = fanout_runner.run(args.job)
+        print(job.to_json() if job else "job is running elsewhere")
+    elif args.resume:
+        for future in fanout_runner.resume_stalled():
+            job = future.result()
+            if job:
+                print(f"{job.id}: {job.status} {job.processed}/{job.total}")
+        print(f"re-queued {fanout_runner.resend_pending_emails()} unsent emails")
+    elif args.watch:
+        fanout_runner.start()
+        try:
+            while fanout_runner._thread.is_alive():
+                fanout_runner._thread.join(timeout=1)
+        except KeyboardInterrupt:
+            pass
+    fanout_runner.shutdown()
+
+
+if __name__ == '__main__':
+    main()
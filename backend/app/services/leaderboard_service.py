@@ -0,0 +1,267 @@
+"""
+XP leaderboards with O(log n) rank queries
+
+Each board is an order-statistic structure (a SortedList of (-xp, user_id)),
+so "what rank am I", "top 100" and "who is around me" are all O(log n)
+instead of sorting the users collection. There is one global board plus one
+per country and one per hackathon. Every board ranks by the user's global
+xp - a hackathon board is that hackathon's participants (everyone with a
+participation entry) ranked by their overall XP, not by what they earned
+there; we don't keep a per-hackathon score.
+
+MongoDB stays the source of truth: rebuild() loads every active user with a
+single projected scan, and after that the boards are updated incrementally
+from add_xp / participation commits and User.save(). Those hooks only see
+this process's writes, so like the search index the boards also catch up
+on users whose updated_at moved since the last sync (every refresh_interval
+seconds, one indexed query) - xp earned through another worker shows up
+within that window. A deleted user leaves no updated_at behind, so deletes
+made elsewhere (another worker, a script, a raw collection delete) are dropped by
+a full rebuild every rebuild_interval seconds (LEADERBOARD_REBUILD_INTERVAL,
+default 10 minutes). Ties on xp are broken by user id, i.e. whoever joined
+first ranks higher.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from mongoengine import signals
+from sortedcontainers import SortedList
+
+from ..models.user import User
+from ..models.signals import user_changes_committed
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = 'global'
+
+# what we need from each user to place them on the boards
+LEADERBOARD_FIELDS = ['xp', 'country', 'is_active', 'is_banned', 'hackathon_participation']
+
+# projection for the bulk loads
+LEADERBOARD_PROJECTION = ['xp', 'country', 'is_active', 'is_banned', 'hackathon_participation.hackathon_id']
+
+
+def country_scope(country):
+    return f"country:{country.strip().lower()}"
+
+
+def hackathon_scope(hackathon_id):
+    """The hackathon's participants, ranked by global xp"""
+    return f"hackathon:{hackathon_id}"
+
+
+class RankedBoard:
+    """One leaderboard: sorted (-score, user_id) entries + score lookup"""
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})
+        self._entries = SortedList((-score, uid) for uid, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._entries.remove((-old, user_id))
+        self._entries.add((-score, user_id))
+        self._scores[user_id] = score
+
+    def remove(self, user_id):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._entries.remove((-old, user_id))
+
+    def rank(self, user_id):
+        """1-based rank, or None if the user isn't on this board"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._entries.index((-score, user_id)) + 1
+
+    def slice(self, offset, limit):
+        """[(rank, user_id, score), ...] starting at 0-based `offset`"""
+        return [
+            (offset + i + 1, uid, -neg_score)
+            for i, (neg_score, uid) in enumerate(self._entries.islice(offset, offset + limit))
+        ]
+
+
+class Leaderboard:
+    """All boards for the process, kept in step with the users collection"""
+
+    def __init__(self, refresh_interval=30, rebuild_interval=None):
+        # how often a query checks MongoDB for users saved by other workers
+        self.refresh_interval = refresh_interval
+        # how often the boards are reloaded to drop users deleted elsewhere
+        self.rebuild_interval = rebuild_interval or int(os.getenv('LEADERBOARD_REBUILD_INTERVAL', 600))
+        self._lock = threading.RLock()
+        self._boards = {}
+        self._scopes_of = {}    # user id -> set of scopes the user is on
+        self.built = False
+        self.synced_at = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+
+    def rebuild(self):
+        """Rebuild every board from MongoDB in bulk"""
+        started = datetime.utcnow()
+        scores = {}
+        docs = User.objects(is_active=True, is_banned=False).only(
+            *LEADERBOARD_PROJECTION
+        ).as_pymongo().batch_size(5000)
+
+        scopes_of = {}
+        for doc in docs:
+            scopes = self._scopes_for(doc)
+            scopes_of[doc['_id']] = scopes
+            for scope in scopes:
+                scores.setdefault(scope, {})[doc['_id']] = doc.get('xp', 0)
+
+        with self._lock:
+            # SortedList construction from a full iterable is one sort per board
+            self._boards = {scope: RankedBoard(board) for scope, board in scores.items()}
+            self._scopes_of = scopes_of
+            self.built = True
+            self.synced_at = started
+            self._checked_at = self._built_at = time.monotonic()
+
+        logger.info("Leaderboards rebuilt: %d users, %d boards", len(scopes_of), len(self._boards))
+        return len(scopes_of)
+
+    def ensure_built(self):
+        """Build on first use, afterwards pick up changes made by other workers"""
+        if not self.built:
+            self.rebuild()
+        elif time.monotonic() - self._built_at > self.rebuild_interval:
+            with self._lock:
+                # one thread reloads, the others keep serving the current boards
+                stale = time.monotonic() - self._built_at > self.rebuild_interval
+                self._built_at = time.monotonic()
+            if stale:
+                self.rebuild()
+        elif time.monotonic() - self._checked_at > self.refresh_interval:
+            self.catch_up()
+
+    def catch_up(self):
+        """Re-place users saved since the last sync (e.g. by another worker)"""
+        started = datetime.utcnow()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            since = self.synced_at
+            self.synced_at = started
+
+        # inactive / banned users included, so they come off the boards
+        docs = User.objects(updated_at__gte=since).only(*LEADERBOARD_PROJECTION).as_pymongo()
+        count = 0
+        for doc in docs:
+            self.place(doc)
+            count += 1
+        return count
+
+    @staticmethod
+    def _scopes_for(doc):
+        scopes = {GLOBAL}
+        if doc.get('country'):
+            scopes.add(country_scope(doc['country']))
+        for participation in doc.get('hackathon_participation') or []:
+            if participation.get('hackathon_id'):
+                scopes.add(hackathon_scope(participation['hackathon_id']))
+        return scopes
+
+    # ===== UPDATES =====
+
+    def update_user(self, user):
+        """Place / move a User on all the boards they belong to"""
+        self.place({
+            '_id': user.id,
+            'xp': user.xp,
+            'country': user.country,
+            'is_active': user.is_active,
+            'is_banned': user.is_banned,
+            'hackathon_participation': [
+                {'hackathon_id': p.hackathon_id} for p in user.hackathon_participation
+            ]
+        })
+
+    def place(self, doc):
+        """Same for a raw user document (LEADERBOARD_PROJECTION)"""
+        user_id = doc['_id']
+        if not doc.get('is_active', True) or doc.get('is_banned'):
+            self.remove_user(user_id)
+            return
+
+        scopes = self._scopes_for(doc)
+
+        with self._lock:
+            for scope in self._scopes_of.get(user_id, set()) - scopes:
+                self._boards[scope].remove(user_id)
+            for scope in scopes:
+                self._boards.setdefault(scope, RankedBoard()).set(user_id, doc.get('xp') or 0)
+            self._scopes_of[user_id] = scopes
+
+    def remove_user(self, user_id):
+        with self._lock:
+            for scope in self._scopes_of.pop(user_id, set()):
+                self._boards[scope].remove(user_id)
+
+    # ===== QUERIES =====
+
+    def top(self, scope=GLOBAL, limit=100, offset=0):
+        with self._lock:
+            board = self._boards.get(scope)
+            return board.slice(offset, limit) if board else []
+
+    def rank(self, user_id, scope=GLOBAL):
+        with self._lock:
+            board = self._boards.get(scope)
+            return board.rank(user_id) if board else None
+
+    def around(self, user_id, scope=GLOBAL, radius=5):
+        """The user's entry with `radius` neighbours on each side"""
+        with self._lock:
+            board = self._boards.get(scope)
+            rank = board.rank(user_id) if board else None
+            if rank is None:
+                return []
+            offset = max(rank - 1 - radius, 0)
+            return board.slice(offset, rank - offset + radius)
+
+    def size(self, scope=GLOBAL):
+        with self._lock:
+            board = self._boards.get(scope)
+            return len(board) if board else 0
+
+
+# shared per-process leaderboard
+leaderboard = Leaderboard()
+
+
+def _on_user_committed(sender, document, fields, **kwargs):
+    if leaderboard.built and fields & {'xp', 'hackathon_participation'}:
+        leaderboard.update_user(document)
+
+
+def _on_user_saved(sender, document, created=False, **kwargs):
+    if not leaderboard.built:
+        return
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if created or changed & set(LEADERBOARD_FIELDS):
+        leaderboard.update_user(document)
+
+
+def _on_user_deleted(sender, document, **kwargs):
+    leaderboard.remove_user(document.id)
+
+
+user_changes_committed.connect(_on_user_committed, sender=User)
+signals.post_save.connect(_on_user_saved, sender=User)
+signals.post_delete.connect(_on_user_deleted, sender=User)
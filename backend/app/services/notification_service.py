@@ -0,0 +1,584 @@
+"""
+Hackathon reminders: planning, scheduling and delivery
+
+Planning: every approved participant of a published hackathon with
+send_reminders on gets one Reminder row per upcoming moment (registration
+deadline, start, submission deadline, each schedule item). The registration
+one goes to people who are already in: it's the last call to bring teammates
+along. Rows are upserted in bulk by dedupe_key, so re-planning after an edit
+only adds what's new and drops what went stale.
+For a big hackathon that is participants x moments upserts, so an edit only
+queues the re-plan (ReminderSync); it runs on a background thread.
+
+Scheduling: ReminderScheduler keeps the next few minutes of pending reminders
+in a heap ((send_at, id) - loaded with one indexed query on status+send_at)
+and dispatches whatever is due in batches:
+
+    claim    update_many pending -> sending for the whole batch (atomic per
+             row, so another dispatcher can't take the same reminders)
+    deliver  group by channel, one channel call per batch
+    record   one bulk_write: sent / back to pending with backoff / failed
+
+A reminder is never sent twice: only the dispatcher that flipped it to
+'sending' delivers it, and rows a crashed dispatcher left in 'sending' are
+marked failed on recovery rather than sent again (we can't tell whether the
+mail went out).
+
+Channels are pluggable (register_channel). 'email' goes over SMTP when
+SMTP_HOST is set - point it at a local debugging server in development -
+otherwise it and 'file' append NDJSON lines to REMINDER_SINK_PATH.
+
+Settings: REMINDER_BATCH_SIZE, REMINDER_HORIZON (seconds of reminders kept in
+memory), REMINDER_POLL_INTERVAL, REMINDER_MAX_ATTEMPTS, REMINDER_RETRY_DELAY.
+
+Run the dispatcher as its own process:
+
+    cd backend
+    python -m app.services.notification_service
+"""
+import argparse
+import atexit
+import hashlib
+import heapq
+import json
+import logging
+import os
+import smtplib
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from mongoengine import connect, signals
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..models.hackathon import Hackathon
+from ..models.registration import Registration
+from ..models.reminder import Reminder
+from ..models.signals import registration_changed
+from ..models.user import User
+from ..utils.dereference import fetch_many
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+# (kind, how long before the moment) - several entries per kind are fine
+REMINDER_OFFSETS = [
+    ('registration_deadline', timedelta(days=1)),
+    ('start', timedelta(days=1)),
+    ('start', timedelta(hours=1)),
+    ('submission_deadline', timedelta(days=1)),
+    ('submission_deadline', timedelta(hours=1)),
+    ('schedule', timedelta(minutes=15)),
+]
+
+# hackathon fields that change which reminders participants should get
+PLANNING_FIELDS = {
+    'name', 'registration_deadline', 'start_date', 'submission_deadline', 'schedule',
+    'send_reminders', 'is_published'
+}
+
+RECIPIENT_FIELDS = ['email', 'username', 'first_name', 'last_name', 'email_notifications', 'is_active']
+
+
+# ===== CHANNELS =====
+
+class Channel:
+    """
+    A way to deliver reminders
+    send() gets a batch of message dicts (id, to, name, subject, body) and
+    returns {id: error} for the ones that failed.
+    """
+
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class FileChannel(Channel):
+    """Appends each message as one NDJSON line - local stand-in for a real provider"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('REMINDER_SINK_PATH', 'reminders.ndjson')
+        self._lock = threading.Lock()
+
+    def send(self, messages):
+        lines = ''.join(
+            json.dumps({**m, 'id': str(m['id']), 'sent_at': datetime.utcnow().isoformat()}) + '\n'
+            for m in messages
+        )
+        with self._lock, open(self.path, 'a', encoding='utf-8') as sink:
+            sink.write(lines)
+        return {}
+
+
+class SMTPChannel(Channel):
+    """Plain SMTP, one connection per batch"""
+
+    def __init__(self, host=None, port=None, sender=None, timeout=10):
+        self.host = host or os.getenv('SMTP_HOST', 'localhost')
+        self.port = port or int(os.getenv('SMTP_PORT', 25))
+        self.sender = sender or os.getenv('SMTP_SENDER', 'noreply@thonhub.local')
+        self.timeout = timeout
+
+    def send(self, messages):
+        failed = {}
+        try:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except (OSError, smtplib.SMTPException) as e:
+            return {m['id']: f"SMTP connect failed: {e}" for m in messages}
+
+        with smtp:
+            for m in messages:
+                mail = EmailMessage()
+                mail['From'] = self.sender
+                mail['To'] = m['to']
+                mail['Subject'] = m['subject']
+                mail.set_content(m['body'] or m['subject'])
+                try:
+                    smtp.send_message(mail)
+                except smtplib.SMTPException as e:
+                    failed[m['id']] = str(e)
+        return failed
+
+
+CHANNELS = {}
+
+
+def register_channel(name, channel):
+    """Add or replace a delivery channel"""
+    CHANNELS[name] = channel
+
+
+def get_channel(name):
+    return CHANNELS.get(name)
+
+
+register_channel('file', FileChannel())
+register_channel('email', SMTPChannel() if os.getenv('SMTP_HOST') else CHANNELS['file'])
+
+
+# ===== PLANNING =====
+
+def planned_reminders(hackathon, now=None):
+    """(kind, ref, send_at, subject, body) for every future reminder of a hackathon"""
+    now = now or datetime.utcnow()
+    moments = {
+        'registration_deadline': [('registration', hackathon.registration_deadline,
+                                   f"Registration for {hackathon.name} closes soon")],
+        'start': [('start', hackathon.start_date, f"{hackathon.name} starts soon")],
+        'submission_deadline': [('submission', hackathon.submission_deadline,
+                                 f"Submissions for {hackathon.name} close soon")],
+        'schedule': [
+            (hashlib.sha1(f"{item.title}|{item.start_time}".encode()).hexdigest()[:12],
+             item.start_time, f"{item.title} at {hackathon.name} starts soon")
+            for item in hackathon.schedule
+        ]
+    }
+
+    plan = []
+    for kind, offset in REMINDER_OFFSETS:
+        for ref, moment, subject in moments[kind]:
+            if not moment:
+                continue
+            send_at = moment - offset
+            if send_at <= now:
+                continue
+            body = f"{subject} - {moment.strftime('%Y-%m-%d %H:%M')} UTC."
+            plan.append((kind, ref, send_at, subject, body))
+    return plan
+
+
+def _reminder_row(hackathon_id, user_id, kind, ref, send_at, subject, body, sync_id):
+    key = f"{hackathon_id}:{kind}:{ref}:{user_id}:{int(send_at.timestamp())}"
+    return UpdateOne(
+        {'dedupe_key': key},
+        {'$setOnInsert': {
+            'user': user_id,
+            'hackathon': hackathon_id,
+            'kind': kind,
+            'channel': 'email',
+            'subject': subject,
+            'body': body,
+            'send_at': send_at,
+            'status': 'pending',
+            'dedupe_key': key,
+            'attempts': 0,
+            'created_at': datetime.utcnow()
+        }, '$set': {'sync_id': sync_id}},
+        upsert=True
+    )
+
+
+def _write_rows(ops):
+    try:
+        Reminder._get_collection().bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # a concurrent sync inserted the same dedupe_key first - that's fine
+        if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+            raise
+
+
+def sync_hackathon_reminders(hackathon, batch_size=1000):
+    """
+    Bring a hackathon's pending reminders in line with its current dates
+    Streams participants from a cursor; returns how many rows were upserted.
+    """
+    collection = Reminder._get_collection()
+    sync_id = uuid.uuid4().hex
+    written = 0
+
+    if hackathon.send_reminders and hackathon.is_published:
+        plan = planned_reminders(hackathon)
+        ops = []
+        if plan:
+            participants = Registration.objects(
+                hackathon=hackathon.id, status='approved'
+            ).only('user').as_pymongo().batch_size(batch_size)
+            for row in participants:
+                for item in plan:
+                    ops.append(_reminder_row(hackathon.id, row['user'], *item, sync_id))
+                if len(ops) >= batch_size:
+                    _write_rows(ops)
+                    written += len(ops)
+                    ops = []
+        if ops:
+            _write_rows(ops)
+            written += len(ops)
+
+    # anything pending that this run didn't touch is for an old date / item;
+    # deleted rather than cancelled so the same key can be scheduled again later
+    collection.delete_many(
+        {'hackathon': hackathon.id, 'status': 'pending', 'sync_id': {'$ne': sync_id}}
+    )
+    reminder_scheduler.wake()
+    return written
+
+
+class ReminderSync:
+    """
+    Runs sync_hackathon_reminders() off the request path
+    One thread per process. A hackathon queued again before its turn is
+    synced once, from a fresh read, so a burst of edits costs one re-plan.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def submit(self, hackathon_id):
+        with self._lock:
+            # per process - the executor thread doesn't survive a fork
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reminder-sync')
+                self._pid = os.getpid()
+                self._pending.clear()
+            if hackathon_id in self._pending:
+                return None
+            self._pending.add(hackathon_id)
+            return self._executor.submit(self._run, hackathon_id)
+
+    def _run(self, hackathon_id):
+        # before reading, so an edit saved during the sync queues another one
+        with self._lock:
+            self._pending.discard(hackathon_id)
+        try:
+            hackathon = Hackathon.objects(id=hackathon_id).only(*PLANNING_FIELDS).first()
+            if hackathon is not None:
+                return sync_hackathon_reminders(hackathon)
+        except Exception:
+            logger.exception("Reminder sync for hackathon %s failed", hackathon_id)
+        return 0
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# shared per-process sync queue
+reminder_sync = ReminderSync()
+
+atexit.register(reminder_sync.shutdown)
+
+
+def schedule_user_reminders(hackathon, user_id):
+    """Reminders for one newly approved participant"""
+    if not (hackathon.send_reminders and hackathon.is_published):
+        return 0
+    # any sync_id will do - the next full sync re-stamps every participant's rows
+    sync_id = uuid.uuid4().hex
+    ops = [_reminder_row(hackathon.id, user_id, *item, sync_id) for item in planned_reminders(hackathon)]
+    if ops:
+        _write_rows(ops)
+        reminder_scheduler.wake()
+    return len(ops)
+
+
+def drop_user_reminders(hackathon_id, user_id):
+    """Pending reminders of someone who left the hackathon"""
+    return Reminder.objects(hackathon=hackathon_id, user=user_id, status='pending').delete()
+
+
+# ===== DISPATCH =====
+
+class ReminderScheduler:
+    """Heap of upcoming reminders plus a batch dispatcher"""
+
+    def __init__(self, batch_size=None, horizon=None, poll_interval=None,
+                 max_attempts=None, retry_delay=None, max_loaded=200000):
+        self.batch_size = batch_size or int(os.getenv('REMINDER_BATCH_SIZE', 1000))
+        self.horizon = timedelta(seconds=horizon or float(os.getenv('REMINDER_HORIZON', 300)))
+        self.poll_interval = poll_interval or float(os.getenv('REMINDER_POLL_INTERVAL', 1))
+        self.max_attempts = max_attempts or int(os.getenv('REMINDER_MAX_ATTEMPTS', 3))
+        self.retry_delay = timedelta(seconds=retry_delay or float(os.getenv('REMINDER_RETRY_DELAY', 60)))
+        self.max_loaded = max_loaded
+
+        self._heap = []
+        self._queued = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    # ----- heap -----
+
+    def load(self, now=None):
+        """Pull pending reminders due within the horizon into the heap"""
+        now = now or datetime.utcnow()
+        docs = Reminder._get_collection().find(
+            {'status': 'pending', 'send_at': {'$lte': now + self.horizon}},
+            {'send_at': 1}
+        ).sort('send_at', 1).limit(self.max_loaded)
+
+        added = 0
+        with self._lock:
+            for doc in docs:
+                if doc['_id'] in self._queued:
+                    continue
+                heapq.heappush(self._heap, (doc['send_at'], doc['_id']))
+                self._queued.add(doc['_id'])
+                added += 1
+            self._loaded_at = now
+        return added
+
+    def _pop_due(self, now):
+        ids = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(ids) < self.batch_size:
+                _, reminder_id = heapq.heappop(self._heap)
+                self._queued.discard(reminder_id)
+                ids.append(reminder_id)
+        return ids
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    # ----- dispatch -----
+
+    def dispatch_due(self, now=None):
+        """Send every due reminder in the heap, batch by batch; returns how many were sent"""
+        now = now or datetime.utcnow()
+        sent = 0
+        while True:
+            ids = self._pop_due(now)
+            if not ids:
+                return sent
+            sent += self._dispatch_batch(ids, now)
+
+    def _dispatch_batch(self, ids, now):
+        collection = Reminder._get_collection()
+        token = f"{self.worker_id}:{uuid.uuid4().hex}"
+
+        # claim: only rows still pending are ours - cancelled/sent/claimed ones are skipped
+        collection.update_many(
+            {'_id': {'$in': ids}, 'status': 'pending', 'send_at': {'$lte': now}},
+            {'$set': {'status': 'sending', 'claimed_by': token, 'claimed_at': now},
+             '$inc': {'attempts': 1}}
+        )
+        claimed = list(collection.find(
+            {'_id': {'$in': ids}, 'claimed_by': token},
+            {'user': 1, 'channel': 1, 'subject': 1, 'body': 1, 'attempts': 1}
+        ))
+        if not claimed:
+            return 0
+
+        users = fetch_many(User, [r['user'] for r in claimed], RECIPIENT_FIELDS)
+
+        by_channel, skipped = {}, {}
+        for r in claimed:
+            user = users.get(r['user'])
+            if not user or not user.is_active or (r['channel'] == 'email' and not user.email_notifications):
+                skipped[r['_id']] = 'recipient unavailable or opted out'
+                continue
+            by_channel.setdefault(r.get('channel') or 'email', []).append({
+                'id': r['_id'],
+                'to': user.email,
+                'name': user.get_full_name(),
+                'subject': r['subject'],
+                'body': r.get('body')
+            })
+
+        failed = {}
+        for name, messages in by_channel.items():
+            channel = get_channel(name)
+            if channel is None:
+                failed.update({m['id']: f"Unknown channel '{name}'" for m in messages})
+                continue
+            try:
+                failed.update(channel.send(messages))
+            except Exception as e:
+                logger.exception("Reminder channel '%s' failed", name)
+                failed.update({m['id']: str(e) for m in messages})
+
+        ops, retries = [], []
+        for r in claimed:
+            query = {'_id': r['_id'], 'claimed_by': token}
+            if r['_id'] in skipped:
+                ops.append(UpdateOne(query, {'$set': {'status': 'cancelled', 'last_error': skipped[r['_id']]}}))
+            elif r['_id'] in failed:
+                if r['attempts'] < self.max_attempts:
+                    retry_at = now + self.retry_delay * r['attempts']
+                    ops.append(UpdateOne(query, {
+                        '$set': {'status': 'pending', 'send_at': retry_at, 'last_error': failed[r['_id']]},
+                        '$unset': {'claimed_by': '', 'claimed_at': ''}
+                    }))
+                    retries.append((retry_at, r['_id']))
+                else:
+                    ops.append(UpdateOne(query, {'$set': {'status': 'failed', 'last_error': failed[r['_id']]}}))
+            else:
+                ops.append(UpdateOne(query, {'$set': {'status': 'sent', 'sent_at': datetime.utcnow()}}))
+        collection.bulk_write(ops, ordered=False)
+
+        with self._lock:
+            for retry_at, reminder_id in retries:
+                if retry_at <= now + self.horizon:
+                    heapq.heappush(self._heap, (retry_at, reminder_id))
+                    self._queued.add(reminder_id)
+
+        return len(claimed) - len(skipped) - len(failed)
+
+    def recover(self, stale_after=timedelta(minutes=10)):
+        """
+        Rows left in 'sending' by a dispatcher that died mid-batch
+        We can't know if they went out, so they're failed instead of re-sent.
+        """
+        return Reminder._get_collection().update_many(
+            {'status': 'sending', 'claimed_at': {'$lt': datetime.utcnow() - stale_after}},
+            {'$set': {'status': 'failed', 'last_error': 'Dispatcher stopped during delivery'}}
+        ).modified_count
+
+    def run_once(self, now=None):
+        """Load and send everything due right now (for the CLI and cron-style use)"""
+        now = now or datetime.utcnow()
+        self.load(now)
+        return self.dispatch_due(now)
+
+    # ----- background thread -----
+
+    def wake(self):
+        """Reload from the database soon (new or changed reminders)"""
+        self._loaded_at = None
+        self._wake.set()
+
+    def start(self):
+        # lazily and per process, like the view counter - threads don't survive a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        self.recover()
+        while not self._stop.is_set():
+            now = datetime.utcnow()
+            try:
+                if self._loaded_at is None or now - self._loaded_at >= self.horizon / 2:
+                    self.load(now)
+                self.dispatch_due(now)
+            except Exception:
+                logger.exception("Reminder dispatch failed")
+
+            next_due = self.next_due()
+            wait = self.poll_interval
+            if next_due is not None:
+                wait = min(wait, max((next_due - datetime.utcnow()).total_seconds(), 0))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+
+# shared per-process scheduler
+reminder_scheduler = ReminderScheduler()
+
+
+# ===== SIGNALS =====
+
+def _on_hackathon_saved(sender, document, created=False, **kwargs):
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if not created and changed & PLANNING_FIELDS:
+        reminder_sync.submit(document.id)
+
+
+def _on_hackathon_deleted(sender, document, **kwargs):
+    Reminder.objects(hackathon=document.id, status='pending').delete()
+
+
+def _on_registration_changed(sender, hackathon_id, user_id, status, **kwargs):
+    if status == 'approved':
+        hackathon = Hackathon.objects(id=hackathon_id).only(*PLANNING_FIELDS).first()
+        if hackathon:
+            schedule_user_reminders(hackathon, user_id)
+    elif status is None:
+        drop_user_reminders(hackathon_id, user_id)
+
+
+signals.post_save.connect(_on_hackathon_saved, sender=Hackathon)
+signals.post_delete.connect(_on_hackathon_deleted, sender=Hackathon)
+registration_changed.connect(_on_registration_changed, sender=Hackathon)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the reminder dispatcher")
+    parser.add_argument('--once', action='store_true', help="send what's due now and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    if args.once:
+        reminder_scheduler.recover()
+        print(f"sent {reminder_scheduler.run_once()} reminders")
+        return
+
+    reminder_scheduler.start()
+    try:
+        while reminder_scheduler._thread.is_alive():
+            reminder_scheduler._thread.join(timeout=1)
+    except KeyboardInterrupt:
+        reminder_scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
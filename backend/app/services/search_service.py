@@ -0,0 +1,323 @@
+"""
+In-process full-text search for hackathons
+
+A small inverted index with BM25 ranking over the text fields people actually
+search on (name, tagline, theme, description, track names, hashtags). It lives
+in the worker's memory, is built once from the hackathons collection and then
+kept up to date from the Hackathon post_save / post_delete signals. Saves made
+by other workers are picked up by catch_up() (updated_at); their deletes are
+dropped when a search hit no longer loads (routes/hackathons.py).
+
+Layout, to keep memory sane at 100k+ documents:
+- every document gets an integer "slot"
+- each term maps to two flat arrays: the slots containing it and the
+  (field-weighted) term frequency in that slot
+- per-slot data (length, alive flag, filter codes) are flat arrays too
+
+At query time the arrays are viewed as NumPy arrays (no copy) so scoring a
+term with 50k postings is one vectorized expression instead of a Python loop.
+Deletes just flip the alive flag; the postings are compacted once enough
+dead slots pile up.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from mongoengine import signals
+
+from ..models.hackathon import Hackathon
+from ..models.signals import status_transitioned
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with', 'your', 'you', 'we'
+}
+
+# matches in the name count three times as much as matches in the description
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'tagline': 2.0,
+    'theme': 2.0,
+    'tracks': 2.0,
+    'hashtags': 2.0,
+    'description': 1.0
+}
+
+# everything we need to load from MongoDB to index a hackathon
+INDEXED_FIELDS = list(FIELD_WEIGHTS) + ['mode', 'status', 'country', 'is_published', 'updated_at']
+
+# the filters search() understands
+FILTERS = ['mode', 'status', 'country']
+
+
+def tokenize(text):
+    """Lowercase words, keeping things like 'c++' and 'c#' intact"""
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _field_text(doc, field):
+    value = doc.get(field)
+    if field == 'tracks':
+        return ' '.join((t or {}).get('name') or '' for t in value or [])
+    if isinstance(value, list):
+        return ' '.join(v for v in value if v)
+    return value or ''
+
+
+class SearchIndex:
+    """Inverted index + BM25 scoring"""
+
+    def __init__(self, k1=1.2, b=0.75, refresh_interval=30):
+        self.k1 = k1
+        self.b = b
+        # how often a search checks MongoDB for hackathons saved by other workers
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._postings = {}        # term -> (array('i') slots, array('f') tf)
+            self._slot_of = {}         # hackathon id -> slot
+            self._ids = []             # slot -> hackathon id (None once deleted)
+            self._lengths = array('f')
+            self._alive = array('b')
+            self._filters = {name: array('i') for name in FILTERS}
+            self._codes = {name: {} for name in FILTERS}
+            self._total_length = 0.0
+            self._live = 0
+            self._dead = 0
+            self.built = False
+            self.synced_at = None
+            self._checked_at = 0.0
+
+    def __len__(self):
+        return self._live
+
+    # ===== BUILDING =====
+
+    def build(self):
+        """(Re)build the whole index from the hackathons collection"""
+        started = datetime.utcnow()
+        docs = Hackathon.objects(is_published=True).only(*INDEXED_FIELDS).as_pymongo()
+
+        with self._lock:
+            self.reset()
+            for doc in docs.batch_size(1000):
+                self.add(doc)
+            self.built = True
+            self.synced_at = started
+            self._checked_at = time.monotonic()
+
+        logger.info("Search index built with %d hackathons", self._live)
+        return self._live
+
+    def ensure_built(self):
+        """Build on first use, afterwards pick up changes made by other workers"""
+        if not self.built:
+            self.build()
+        elif time.monotonic() - self._checked_at > self.refresh_interval:
+            self.catch_up()
+
+    def catch_up(self):
+        """Re-index hackathons saved since the last sync (e.g. by another worker)"""
+        started = datetime.utcnow()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            since = self.synced_at
+            self.synced_at = started
+
+        docs = Hackathon.objects(updated_at__gte=since).only(*INDEXED_FIELDS).as_pymongo()
+        count = 0
+        for doc in docs:
+            self.index_document(doc)
+            count += 1
+        return count
+
+    # ===== UPDATES =====
+
+    def index_document(self, doc):
+        """Add/replace a raw hackathon document, or drop it if it isn't published"""
+        if doc.get('is_published'):
+            self.add(doc)
+        else:
+            self.remove(doc['_id'])
+
+    def add(self, doc):
+        """Index a raw hackathon document (a dict with the INDEXED_FIELDS)"""
+        tf = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(_field_text(doc, field)):
+                tf[token] += weight
+
+        with self._lock:
+            if doc['_id'] in self._slot_of:
+                self.remove(doc['_id'])
+
+            slot = len(self._ids)
+            self._ids.append(doc['_id'])
+            self._slot_of[doc['_id']] = slot
+
+            length = sum(tf.values())
+            self._lengths.append(length)
+            self._alive.append(1)
+            for name in FILTERS:
+                self._filters[name].append(self._code(name, doc.get(name)))
+
+            for term, weight in tf.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('i'), array('f'))
+                postings[0].append(slot)
+                postings[1].append(weight)
+
+            self._total_length += length
+            self._live += 1
+
+    def remove(self, hackathon_id):
+        """Drop a hackathon from the index (its postings are cleaned up lazily)"""
+        with self._lock:
+            slot = self._slot_of.pop(hackathon_id, None)
+            if slot is None:
+                return False
+
+            self._alive[slot] = 0
+            self._ids[slot] = None
+            self._total_length -= self._lengths[slot]
+            self._live -= 1
+            self._dead += 1
+
+            if self._dead > 1000 and self._dead > self._live:
+                self._compact()
+            return True
+
+    def _code(self, name, value):
+        """Small integer code for a filter value (case-insensitive)"""
+        if value is None:
+            return -1
+        codes = self._codes[name]
+        return codes.setdefault(str(value).lower(), len(codes))
+
+    def _compact(self):
+        """Rewrite postings without the deleted slots"""
+        alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int32) - 1
+
+        postings = {}
+        for term, (slots, weights) in self._postings.items():
+            slots_np = np.frombuffer(slots, dtype=np.int32)
+            keep = alive[slots_np]
+            if keep.any():
+                postings[term] = (
+                    array('i', remap[slots_np[keep]].tobytes()),
+                    array('f', np.frombuffer(weights, dtype=np.float32)[keep].tobytes())
+                )
+
+        self._postings = postings
+        self._ids = [i for i in self._ids if i is not None]
+        self._slot_of = {hid: slot for slot, hid in enumerate(self._ids)}
+        self._lengths = array('f', np.frombuffer(self._lengths, dtype=np.float32)[alive].tobytes())
+        for name in FILTERS:
+            self._filters[name] = array('i', np.frombuffer(self._filters[name], dtype=np.int32)[alive].tobytes())
+        self._alive = array('b', [1]) * len(self._ids)
+        self._dead = 0
+
+    # ===== QUERYING =====
+
+    def search(self, query, limit=20, **filters):
+        """
+        Ranked keyword search
+        filters: mode / status / country (exact, case-insensitive)
+        Returns [(hackathon_id, score), ...] best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._live:
+                return []
+
+            n_slots = len(self._ids)
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)
+            avg_length = self._total_length / self._live
+            scores = np.zeros(n_slots, dtype=np.float32)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots = np.frombuffer(postings[0], dtype=np.int32)
+                tf = np.frombuffer(postings[1], dtype=np.float32)
+
+                # document frequency among live documents only
+                df = int(alive[slots].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+
+                norm = self.k1 * (1 - self.b + self.b * lengths[slots] / avg_length)
+                scores[slots] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            mask = alive & (scores > 0)
+            for name, value in filters.items():
+                if value is None:
+                    continue
+                code = self._codes[name].get(str(value).lower())
+                if code is None:
+                    return []
+                mask &= np.frombuffer(self._filters[name], dtype=np.int32) == code
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > limit:
+                top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            return [(self._ids[slot], float(scores[slot])) for slot in candidates]
+
+
+# shared per-process index
+search_index = SearchIndex()
+
+
+def _on_hackathon_saved(sender, document, **kwargs):
+    # nothing to do until somebody has searched and the index exists
+    if not search_index.built:
+        return
+    # re-read: a document loaded with .only() would be indexed without its other fields
+    doc = Hackathon.objects(id=document.id).only(*INDEXED_FIELDS).as_pymongo().first()
+    if doc is None:
+        search_index.remove(document.id)
+    else:
+        search_index.index_document(doc)
+
+
+def _on_hackathon_deleted(sender, document, **kwargs):
+    search_index.remove(document.id)
+
+
+def _on_status_transitioned(sender, transitions, **kwargs):
+    # bulk status updates skip post_save, re-index the status filter here
+    if search_index.built:
+        ids = [hackathon_id for hackathon_id, _, _ in transitions]
+        for doc in Hackathon.objects(id__in=ids).only(*INDEXED_FIELDS).as_pymongo():
+            search_index.index_document(doc)
+
+
+signals.post_save.connect(_on_hackathon_saved, sender=Hackathon)
+signals.post_delete.connect(_on_hackathon_deleted, sender=Hackathon)
+status_transitioned.connect(_on_status_transitioned)
@@ -0,0 +1,194 @@
+"""
+Moves hackathon statuses forward as their dates pass
+
+Hackathon.save() works out the status a hackathon should have and stores
+`next_transition_at`, the next date at which that changes (see plan_status in
+models/hackathon.py). This scheduler only has to look at hackathons whose
+next_transition_at has passed:
+
+    find next_transition_at <= now (sparse index), BATCH at a time
+      -> plan_status() for each
+      -> one bulk_write; every update is conditional on the status and
+         next_transition_at it read, so two schedulers (or a scheduler and
+         an organizer's save) never apply a transition twice
+      -> status_transitioned with the transitions this run actually made
+
+Listings then filter on the stored, indexed `status` instead of comparing
+dates in Python.
+
+    python -m app.services.status_scheduler [--once] [--backfill]
+"""
+import argparse
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from mongoengine import connect
+from pymongo import UpdateOne
+
+from ..models.hackathon import Hackathon, plan_status, LIFECYCLE_FIELDS, STATUS_LIFECYCLE
+from ..models.signals import status_transitioned
+from . import init as init_services
+
+logger = logging.getLogger(__name__)
+
+
+class StatusScheduler:
+    """Batch status transitions, driven by the next_transition_at index"""
+
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.batch_size = batch_size or int(os.getenv('STATUS_BATCH_SIZE', 500))
+        # longest sleep, so a date moved earlier by another process isn't missed for long
+        self.poll_interval = poll_interval or float(os.getenv('STATUS_POLL_INTERVAL', 60))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _collection(self):
+        return Hackathon._get_collection()
+
+    def next_due(self):
+        """When the earliest pending transition is due (None if nothing is scheduled)"""
+        doc = self._collection().find_one(
+            {'next_transition_at': {'$ne': None}},
+            {'next_transition_at': 1},
+            sort=[('next_transition_at', 1)]
+        )
+        return doc and doc['next_transition_at']
+
+    def advance_batch(self, now, run_id):
+        """Apply up to batch_size due transitions, returns (rows looked at, rows written, transitions)"""
+        projection = {field: 1 for field in LIFECYCLE_FIELDS + ['next_transition_at']}
+        docs = list(
+            self._collection().find({'next_transition_at': {'$lte': now}}, projection)
+            .sort('next_transition_at', 1)
+            .limit(self.batch_size)
+        )
+        if not docs:
+            return 0, 0, []
+
+        ops = []
+        planned = {}
+        for doc in docs:
+            status, next_at = plan_status(doc['status'], doc, now, doc.get('is_published'))
+            update = {'next_transition_at': next_at, 'updated_at': now}
+            if status != doc['status']:
+                update.update(status=status, status_changed_at=now, transition_id=run_id)
+                planned[doc['_id']] = (doc['status'], status)
+            ops.append(UpdateOne(
+                # only if nobody changed it since we read it
+                {'_id': doc['_id'], 'status': doc['status'], 'next_transition_at': doc['next_transition_at']},
+                {'$set': update}
+            ))
+
+        written = self._collection().bulk_write(ops, ordered=False).modified_count
+
+        transitions = []
+        if planned:
+            done = self._collection().find(
+                {'_id': {'$in': list(planned)}, 'transition_id': run_id}, {'_id': 1}
+            )
+            transitions = [(doc['_id'],) + planned[doc['_id']] for doc in done]
+        return len(docs), written, transitions
+
+    def run_once(self, now=None):
+        """Apply everything that is due, returns the transitions made"""
+        now = now or datetime.utcnow()
+        run_id = uuid.uuid4().hex
+        made = []
+
+        while True:
+            seen, written, transitions = self.advance_batch(now, run_id)
+            if transitions:
+                logger.info("Advanced %d hackathon statuses", len(transitions))
+                status_transitioned.send(self, transitions=transitions)
+                made.extend(transitions)
+            # a full batch whose rows all lost the race would be read again, stop instead
+            if seen < self.batch_size or not written:
+                break
+
+        return made
+
+    def backfill(self):
+        """Mark hackathons saved before next_transition_at existed as due now"""
+        stages = ['published'] + [stage for stage, _ in STATUS_LIFECYCLE[:-1]]
+        return self._collection().update_many(
+            {'next_transition_at': None, 'is_published': True, 'status': {'$in': stages}},
+            {'$set': {'next_transition_at': datetime.utcnow()}}
+        ).modified_count
+
+    # ----- background thread -----
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        # lazily and per process, like the view counter - threads don't survive a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='status-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                next_due = self.next_due()
+            except Exception:
+                logger.exception("Status transitions failed")
+                next_due = None
+
+            wait = self.poll_interval
+            if next_due is not None:
+                wait = min(wait, max((next_due - datetime.utcnow()).total_seconds(), 0))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+
+# shared per-process scheduler
+status_scheduler = StatusScheduler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Advance hackathon statuses as their dates pass")
+    parser.add_argument('--once', action='store_true', help="apply what's due now and exit")
+    parser.add_argument('--backfill', action='store_true', help="schedule hackathons created before the scheduler")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/thonhub'))
+    init_services()
+
+    if args.backfill:
+        print(f"scheduled {status_scheduler.backfill()} hackathons")
+
+    if args.once:
+        print(f"made {len(status_scheduler.run_once())} status transitions")
+        return
+
+    status_scheduler.start()
+    try:
+        while status_scheduler._thread.is_alive():
+            status_scheduler._thread.join(timeout=1)
+    except KeyboardInterrupt:
+        status_scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
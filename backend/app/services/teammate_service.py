@@ -0,0 +1,391 @@
+"""
+Teammate matching engine
+
+Every user is encoded as three sparse 0/1 vectors over a shared, normalized
+vocabulary ("React.js", "reactjs" and "react" are one term): skills, interests
+and learning. They are stored column-wise (scipy CSC), which is effectively an
+inverted index: for each term, the rows of the users who have it. Scoring a
+query is then a handful of vectorized operations over the users that share at
+least one relevant term, so top-k over a million users stays in milliseconds.
+
+Score components (weights in WEIGHTS):
+- complement:  how many of the skills I need / want to learn the candidate has
+- novelty:     share of the candidate's skills I don't have yet
+- interests:   cosine similarity of interests
+- experience:  closeness in years_of_experience
+- timezone:    closeness of UTC offsets (wraps around the date line)
+
+Updates from User.save() go to a small per-row overlay that is scored
+separately and folded into the matrices once it grows past `compact_after`.
+The save hook only sees this process's writes, so every `refresh_interval`
+seconds a query also re-encodes users whose updated_at moved since the last
+sync - profile edits made through another worker show up within that window.
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from mongoengine import signals
+from scipy import sparse
+
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+KINDS = ['skills', 'interests', 'learning']
+
+# fields that change a user's vector
+MATCH_FIELDS = KINDS + ['years_of_experience', 'timezone', 'is_active', 'is_banned']
+
+WEIGHTS = {
+    'complement': 0.4,
+    'novelty': 0.1,
+    'interests': 0.3,
+    'experience': 0.1,
+    'timezone': 0.1
+}
+
+# common spellings people type for the same thing
+ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'py': 'python',
+    'golang': 'go',
+    'reactjs': 'react',
+    'node': 'nodejs',
+    'vuejs': 'vue',
+    'nextjs': 'next',
+    'k8s': 'kubernetes',
+    'ml': 'machine learning',
+    'dl': 'deep learning',
+    'ai': 'artificial intelligence',
+    'cpp': 'c++',
+    'csharp': 'c#',
+    'postgres': 'postgresql',
+    'mongo': 'mongodb',
+    'ui ux': 'ui/ux',
+    'ux': 'ui/ux',
+    'ui': 'ui/ux'
+}
+
+_SPACES_RE = re.compile(r'[\s_\-]+')
+
+
+def normalize_term(term):
+    """'React.JS ' -> 'react', 'ML' -> 'machine learning'"""
+    term = _SPACES_RE.sub(' ', (term or '').strip().lower())
+    if term.endswith('.js'):
+        term = term[:-3]
+    return ALIASES.get(term, term)
+
+
+_tz_cache = {}
+
+
+def utc_offset_hours(name):
+    """UTC offset of an IANA timezone name in hours (0 if unknown)"""
+    if name not in _tz_cache:
+        try:
+            offset = datetime.now(ZoneInfo(name)).utcoffset()
+            _tz_cache[name] = offset.total_seconds() / 3600 if offset else 0.0
+        except Exception:
+            _tz_cache[name] = 0.0
+    return _tz_cache[name]
+
+
+class TeammateMatcher:
+    """Sparse skill/interest vectors + batch scoring"""
+
+    def __init__(self, compact_after=2000, refresh_interval=30):
+        self.compact_after = compact_after
+        # how often a query checks MongoDB for users saved by other workers
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.vocab = {}          # normalized term -> column
+            self._row_of = {}        # user id -> row
+            self._ids = []           # row -> user id
+            self._base = {kind: sparse.csc_matrix((0, 0), dtype=np.float32) for kind in KINDS}
+            self._overrides = {}     # row -> {kind: set(columns)} for rows changed since last compaction
+            self._counts = {kind: np.zeros(0, dtype=np.float32) for kind in KINDS}
+            self._experience = np.zeros(0, dtype=np.float32)
+            self._timezone = np.zeros(0, dtype=np.float32)
+            self._active = np.zeros(0, dtype=bool)
+            self.built = False
+            self.synced_at = None
+            self._checked_at = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    # ===== ENCODING =====
+
+    def _columns(self, terms, grow=True):
+        columns = set()
+        for term in terms or []:
+            term = normalize_term(term)
+            if not term:
+                continue
+            if term not in self.vocab:
+                if not grow:
+                    continue
+                self.vocab[term] = len(self.vocab)
+            columns.add(self.vocab[term])
+        return columns
+
+    def _ensure_capacity(self, rows):
+        """Grow the dense per-row arrays (doubling, so appends stay cheap)"""
+        size = len(self._active)
+        if rows <= size:
+            return
+        size = max(rows, size * 2, 1024)
+
+        def grow(a):
+            out = np.zeros(size, dtype=a.dtype)
+            out[:len(a)] = a
+            return out
+
+        self._counts = {kind: grow(a) for kind, a in self._counts.items()}
+        self._experience = grow(self._experience)
+        self._timezone = grow(self._timezone)
+        self._active = grow(self._active)
+
+    def _set_scalars(self, row, doc, columns):
+        for kind in KINDS:
+            self._counts[kind][row] = len(columns[kind])
+        self._experience[row] = doc.get('years_of_experience') or 0
+        self._timezone[row] = utc_offset_hours(doc.get('timezone') or 'UTC')
+        self._active[row] = doc.get('is_active', True) and not doc.get('is_banned', False)
+
+    # ===== BUILDING =====
+
+    def build(self):
+        """Encode every user from MongoDB into fresh matrices"""
+        started = datetime.utcnow()
+        docs = User.objects.only(*MATCH_FIELDS).as_pymongo().batch_size(5000)
+
+        with self._lock:
+            self.reset()
+            coo = {kind: ([], []) for kind in KINDS}
+
+            for doc in docs:
+                row = len(self._ids)
+                self._ids.append(doc['_id'])
+                self._row_of[doc['_id']] = row
+                self._ensure_capacity(row + 1)
+
+                columns = {kind: self._columns(doc.get(kind)) for kind in KINDS}
+                for kind in KINDS:
+                    coo[kind][0].extend([row] * len(columns[kind]))
+                    coo[kind][1].extend(columns[kind])
+                self._set_scalars(row, doc, columns)
+
+            shape = (len(self._ids), len(self.vocab))
+            for kind, (rows, cols) in coo.items():
+                data = np.ones(len(rows), dtype=np.float32)
+                self._base[kind] = sparse.csc_matrix((data, (rows, cols)), shape=shape)
+
+            self.built = True
+            self.synced_at = started
+            self._checked_at = time.monotonic()
+
+        logger.info("Teammate matcher built: %d users, %d terms", len(self._ids), len(self.vocab))
+        return len(self._ids)
+
+    def ensure_built(self):
+        """Build on first use, afterwards pick up changes made by other workers"""
+        if not self.built:
+            self.build()
+        elif time.monotonic() - self._checked_at > self.refresh_interval:
+            self.catch_up()
+
+    def catch_up(self):
+        """Re-encode users saved since the last sync (e.g. by another worker)"""
+        started = datetime.utcnow()
+        with self._lock:
+            self._checked_at = time.monotonic()
+            since = self.synced_at
+            self.synced_at = started
+
+        docs = User.objects(updated_at__gte=since).only(*MATCH_FIELDS).as_pymongo()
+        count = 0
+        for doc in docs:
+            self.update_user(doc)
+            count += 1
+        return count
+
+    def update_user(self, doc):
+        """Re-encode one user (a raw dict with MATCH_FIELDS and _id)"""
+        with self._lock:
+            row = self._row_of.get(doc['_id'])
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(doc['_id'])
+                self._row_of[doc['_id']] = row
+                self._ensure_capacity(row + 1)
+
+            columns = {kind: self._columns(doc.get(kind)) for kind in KINDS}
+            self._overrides[row] = columns
+            self._set_scalars(row, doc, columns)
+
+            if len(self._overrides) >= self.compact_after:
+                self._compact()
+
+    def remove_user(self, user_id):
+        """Stop suggesting a user (row is kept, just never a candidate)"""
+        with self._lock:
+            row = self._row_of.get(user_id)
+            if row is not None:
+                self._active[row] = False
+
+    def _compact(self):
+        """Fold the overlay rows into the CSC matrices"""
+        n_rows, n_cols = len(self._ids), len(self.vocab)
+        changed = np.fromiter(self._overrides, dtype=np.int64)
+
+        for kind in KINDS:
+            base = self._base[kind].tocsr()
+            base.resize((n_rows, n_cols))
+
+            # blank the changed rows, then add their new contents
+            keep = np.ones(n_rows, dtype=np.float32)
+            keep[changed] = 0
+            base = sparse.diags(keep) @ base
+
+            rows, cols = [], []
+            for row, columns in self._overrides.items():
+                rows.extend([row] * len(columns[kind]))
+                cols.extend(columns[kind])
+            overlay = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_rows, n_cols)
+            )
+
+            merged = (base + overlay).tocsc()
+            merged.eliminate_zeros()
+            self._base[kind] = merged
+
+        self._overrides = {}
+
+    # ===== SCORING =====
+
+    def _overlap(self, kind, columns, n_rows):
+        """Per-row count of `columns` present in the rows of the base matrix"""
+        out = np.zeros(n_rows, dtype=np.float32)
+        base = self._base[kind]
+        for col in columns:
+            if col < base.shape[1]:
+                out[base.indices[base.indptr[col]:base.indptr[col + 1]]] += 1
+        return out
+
+    def match(self, skills=None, interests=None, learning=None, needed=None,
+              years_of_experience=0, timezone='UTC', exclude=None, limit=20):
+        """
+        Top-k candidates for a user profile
+        needed: extra skills the team is looking for (e.g. ?skills=python,ml)
+        Returns [(user_id, score, components), ...] best first
+        """
+        with self._lock:
+            n_rows = len(self._ids)
+            if not n_rows:
+                return []
+
+            have = self._columns(skills, grow=False)
+            want = self._columns(learning, grow=False) | self._columns(needed, grow=False)
+            likes = self._columns(interests, grow=False)
+
+            complement = self._overlap('skills', want, n_rows)
+            shared_skills = self._overlap('skills', have, n_rows)
+            shared_interests = self._overlap('interests', likes, n_rows)
+
+            # rows changed since the last compaction are scored from the overlay
+            for row, columns in self._overrides.items():
+                complement[row] = len(columns['skills'] & want)
+                shared_skills[row] = len(columns['skills'] & have)
+                shared_interests[row] = len(columns['interests'] & likes)
+
+            skill_counts = self._counts['skills'][:n_rows]
+            interest_counts = self._counts['interests'][:n_rows]
+
+            # only users that share something relevant are candidates at all
+            if want or likes:
+                mask = (complement > 0) | (shared_interests > 0)
+            else:
+                mask = skill_counts > shared_skills
+            mask &= self._active[:n_rows]
+
+            if exclude is not None and exclude in self._row_of:
+                mask[self._row_of[exclude]] = False
+
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return []
+
+            components = {
+                'complement': complement[rows] / max(len(want), 1),
+                'novelty': (skill_counts[rows] - shared_skills[rows]) / np.maximum(skill_counts[rows], 1),
+                'interests': shared_interests[rows] / np.sqrt(
+                    np.maximum(interest_counts[rows], 1) * max(len(likes), 1)
+                ),
+                'experience': np.exp(-np.abs(self._experience[rows] - (years_of_experience or 0)) / 3),
+            }
+            tz_gap = np.abs(self._timezone[rows] - utc_offset_hours(timezone or 'UTC'))
+            components['timezone'] = 1 - np.minimum(tz_gap, 24 - tz_gap) / 12
+
+            scores = sum(WEIGHTS[name] * values for name, values in components.items())
+
+            if len(rows) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-scores[top], kind='stable')]
+
+            return [
+                (
+                    self._ids[rows[i]],
+                    float(scores[i]),
+                    {name: round(float(values[i]), 3) for name, values in components.items()}
+                )
+                for i in top
+            ]
+
+    def match_user(self, user, needed=None, limit=20):
+        """Top-k teammates for a User document"""
+        return self.match(
+            skills=user.skills,
+            interests=user.interests,
+            learning=user.learning,
+            needed=needed,
+            years_of_experience=user.years_of_experience,
+            timezone=user.timezone,
+            exclude=user.id,
+            limit=limit
+        )
+
+
+# shared per-process engine
+teammate_matcher = TeammateMatcher()
+
+
+def _on_user_saved(sender, document, created=False, **kwargs):
+    if not teammate_matcher.built:
+        return
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if created or changed & set(MATCH_FIELDS):
+        doc = {field: getattr(document, field) for field in MATCH_FIELDS}
+        doc['_id'] = document.id
+        teammate_matcher.update_user(doc)
+
+
+def _on_user_deleted(sender, document, **kwargs):
+    teammate_matcher.remove_user(document.id)
+
+
+signals.post_save.connect(_on_user_saved, sender=User)
+signals.post_delete.connect(_on_user_deleted, sender=User)
@@ -0,0 +1,123 @@
+"""
+Write-behind view counter for hackathons
+
+Page views are the hottest write path we have, so instead of saving the whole
+hackathon document on every view we just bump an in-memory counter and flush
+all pending counts every few seconds as one bulk_write of $inc updates.
+
+Worst case (hard kill of the worker) we lose the last few seconds of views,
+which is fine for a view counter.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..models.signals import views_flushed
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Buffers view increments per hackathon and flushes them in bulk"""
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval or float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def increment(self, hackathon_id, amount=1):
+        """Record `amount` views - no database work happens here"""
+        with self._lock:
+            self._counts[hackathon_id] += amount
+        self._ensure_started()
+
+    def pending(self, hackathon_id=None):
+        """How many increments are waiting to be flushed (for one hackathon or all)"""
+        with self._lock:
+            if hackathon_id is not None:
+                return self._counts.get(hackathon_id, 0)
+            return sum(self._counts.values())
+
+    def flush(self):
+        """Write all buffered counts to MongoDB, returns how many views were written"""
+        # only one flush at a time, otherwise the timer and atexit could race
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, defaultdict(int)
+
+            if not counts:
+                return 0
+
+            from ..models.hackathon import Hackathon
+
+            ids = list(counts)
+            ops = [
+                UpdateOne({'_id': hackathon_id}, {'$inc': {'view_count': counts[hackathon_id]}})
+                for hackathon_id in ids
+            ]
+
+            failed = ids
+            try:
+                Hackathon._get_collection().bulk_write(ops, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                # unordered: everything but the listed ops was applied
+                failed = [ids[err['index']] for err in e.details.get('writeErrors', [])]
+                logger.error("Failed to flush %d of %d hackathon view counters", len(failed), len(ops))
+            except Exception:
+                logger.exception("Failed to flush %d hackathon view counters", len(ops))
+
+            if failed:
+                # put the counts back so the next flush retries them
+                with self._lock:
+                    for hackathon_id in failed:
+                        self._counts[hackathon_id] += counts.pop(hackathon_id)
+                if not counts:
+                    return 0
+
+            views_flushed.send(self, counts=dict(counts))
+            return sum(counts.values())
+
+    def stop(self):
+        """Stop the timer thread and flush whatever is left"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval)
+        self._thread = None
+        return self.flush()
+
+    def _ensure_started(self):
+        # the thread is started lazily and per process - a thread started
+        # in the gunicorn master would not survive the fork into the workers
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='view-counter-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+# shared instance used by Hackathon.increment_views
+view_counter = ViewCounter()
+
+# flush on normal interpreter exit (gunicorn worker shutdown included)
+atexit.register(view_counter.stop)
@@ -0,0 +1,132 @@
+"""
+Auth helpers for JWT-protected routes
+
+Permission checks only need a user's id, role and account status, so instead
+of hydrating the whole User document (education, projects, badges, ...) on
+every write request we load a tiny Principal through a projection.
+
+Principals are cached on flask.g for the request and in a short-TTL cache
+across requests. The cache entry is dropped as soon as User.save() changes
+role / is_active / is_banned, so bans take effect immediately in this worker
+and within PRINCIPAL_CACHE_TTL seconds everywhere else.
+"""
+import os
+from functools import wraps
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from mongoengine import signals
+
+from ..models.user import User
+from .cache import TTLCache
+
+# fields that decide what a user is allowed to do
+PRINCIPAL_FIELDS = ['role', 'is_active', 'is_banned']
+
+principal_cache = TTLCache(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('PRINCIPAL_CACHE_TTL', 30))
+)
+
+
+class Principal:
+    """The bits of a User needed for permission checks"""
+
+    __slots__ = ('id', 'role', 'is_active', 'is_banned')
+
+    def __init__(self, id, role='user', is_active=True, is_banned=False):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+        self.is_banned = is_banned
+
+    @property
+    def pk(self):
+        return self.id
+
+    def can_act(self):
+        """Inactive and banned accounts can't change anything"""
+        return self.is_active and not self.is_banned
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def can_organize(self):
+        return self.role in ['organizer', 'admin']
+
+    def load_user(self, *fields):
+        """Fetch the full User (or just `fields`) when a route really needs it"""
+        queryset = User.objects.only(*fields) if fields else User.objects
+        return queryset.get(id=self.id)
+
+    def __repr__(self):
+        return f"Principal({self.id}, role={self.role})"
+
+
+def load_principal(user_id):
+    """Principal for a user id - cache first, then a projected query"""
+    try:
+        user_id = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        raise User.DoesNotExist(f"Invalid user id {user_id!r}")
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        doc = User.objects(id=user_id).only(*PRINCIPAL_FIELDS).as_pymongo().first()
+        if doc is None:
+            raise User.DoesNotExist(f"User {user_id} not found")
+
+        principal = Principal(
+            id=user_id,
+            role=doc.get('role', 'user'),
+            is_active=doc.get('is_active', True),
+            is_banned=doc.get('is_banned', False)
+        )
+        principal_cache.set(user_id, principal)
+
+    return principal
+
+
+def get_current_principal():
+    """
+    Principal for the JWT identity of this request
+    Raises User.DoesNotExist if the account is gone
+    """
+    if 'principal' not in g:
+        g.principal = load_principal(get_jwt_identity())
+    return g.principal
+
+
+def principal_required(fn):
+    """
+    Like @jwt_required(), but also rejects inactive / banned accounts
+    The principal is then available through get_current_principal()
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request()
+        try:
+            principal = get_current_principal()
+        except User.DoesNotExist:
+            return jsonify({'error': 'User not found'}), 404
+
+        if not principal.can_act():
+            return jsonify({'error': 'Your account is inactive or banned'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _on_user_saved(sender, document, created=False, **kwargs):
+    changed = {f.split('.')[0] for f in document._get_changed_fields()}
+    if changed & set(PRINCIPAL_FIELDS):
+        principal_cache.delete(document.id)
+
+
+def _on_user_deleted(sender, document, **kwargs):
+    principal_cache.delete(document.id)
+
+
+signals.post_save.connect(_on_user_saved, sender=User)
+signals.post_delete.connect(_on_user_deleted, sender=User)
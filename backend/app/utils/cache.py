@@ -0,0 +1,143 @@
+"""
+Small in-process caches
+
+TTLCache is a thread-safe LRU with a per-entry time to live. It is per worker
+process, so entries in other workers only go stale for at most `ttl` seconds
+after an invalidation.
+
+cached_response() wraps a read-only JSON route: the serialized body and its
+strong ETag are cached per (path, query args), and a request whose
+If-None-Match matches the cached ETag gets a 304 without touching MongoDB.
+
+SharedVersion carries invalidations across workers: a counter in one small
+document, bumped by every write that affects the cached data. Each process
+re-reads it at most every `ttl` seconds (one _id lookup, only on a cache
+hit), so a cached_response(..., version=...) entry outlives a write made in
+another worker by at most that long.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from mongoengine import connection as me_connection
+
+
+class TTLCache:
+    """LRU cache where every entry also expires after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedVersion:
+    """Invalidation counter shared by all processes (cache_versions collection)"""
+
+    def __init__(self, name, ttl=5):
+        self.name = name
+        self.ttl = ttl
+        self._value = None
+        self._read_at = None
+
+    @staticmethod
+    def _collection():
+        return me_connection.get_db()['cache_versions']
+
+    def get(self, refresh=True):
+        """
+        The version as read at most `ttl` seconds ago
+        refresh=False takes whatever was read last (reads only the first time).
+        """
+        now = time.monotonic()
+        if self._read_at is None or (refresh and now - self._read_at > self.ttl):
+            doc = self._collection().find_one({'_id': self.name}, {'version': 1})
+            self._value = (doc or {}).get('version', 0)
+            self._read_at = now
+        return self._value
+
+    def bump(self):
+        """Invalidate everywhere - this process re-reads on its next check"""
+        self._collection().update_one({'_id': self.name}, {'$inc': {'version': 1}}, upsert=True)
+        self._read_at = None
+
+
+def make_etag(*parts):
+    """Strong ETag value from things like (id, updated_at)"""
+    raw = '|'.join(str(p) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_response(cache, version=None):
+    """
+    Cache a GET route's 200 responses in `cache`
+    The view can set its own ETag (e.g. from updated_at); otherwise one is
+    derived from the body. Responses are always conditional (304 on match).
+    version: optional SharedVersion, entries made under an older one are stale.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            entry = cache.get(key)
+            if entry is not None and version is not None and entry[3] != version.get():
+                entry = None
+
+            if entry is None:
+                # read before the view runs, so the entry is never tagged newer than its data;
+                # a miss doesn't refresh it - an old tag only costs one more miss later
+                current = version.get(refresh=False) if version is not None else None
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+                body = response.get_data()
+                etag = response.get_etag()[0] or hashlib.sha1(body).hexdigest()
+                entry = (etag, body, response.mimetype, current)
+                cache.set(key, entry)
+
+            etag, body, mimetype, _ = entry
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            # clients may keep it but must revalidate (cheap 304s)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,156 @@
+"""
+MongoDB connection management
+
+    create_app() -> init_db(app)   registers the connection settings only,
+                                   no MongoClient and no sockets yet
+    first query in a process       mongoengine creates the MongoClient there
+    fork (gunicorn --preload)      reset_after_fork() drops whatever client
+                                   the parent had; the child builds its own
+                                   on its first query
+    deploy step                    `flask create-indexes` (or
+                                   `python -m app.utils.db --create-indexes`)
+
+A MongoClient must not cross a fork (its pool and monitor threads belong to
+the parent), which is why nothing here connects eagerly. Index creation is
+its own step as well: with auto_create_index on, every worker would send
+createIndexes for each model on first use, which is slow cold-start work
+that only needs to happen once per deploy.
+"""
+import argparse
+import importlib
+import logging
+import os
+import threading
+
+from mongoengine import Document, connection as me_connection
+from mongoengine.base.common import _document_registry, _get_documents_by_db
+
+logger = logging.getLogger(__name__)
+
+ALIAS = me_connection.DEFAULT_CONNECTION_NAME
+
+# every module under app/models with Document classes
+MODEL_MODULES = [
+    'user', 'org', 'team', 'registration', 'hackathon', 'reminder',
+    'notification', 'chat', 'resume', 'analytics', 'calendar'
+]
+
+_fork_hook_lock = threading.Lock()
+_fork_hook_installed = False
+
+
+def connection_settings(config):
+    """MongoClient options from the MONGO_* config values"""
+    return {
+        'host': config['MONGODB_URI'],
+        'maxPoolSize': config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': config['MONGO_MIN_POOL_SIZE'],
+        'maxIdleTimeMS': config['MONGO_MAX_IDLE_TIME_MS'],
+        'connectTimeoutMS': config['MONGO_CONNECT_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        'socketTimeoutMS': config['MONGO_SOCKET_TIMEOUT_MS'],
+        'waitQueueTimeoutMS': config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        'appname': config['MONGO_APP_NAME'],
+        'retryWrites': True,
+        # don't start monitor threads until the first operation
+        'connect': False,
+    }
+
+
+def import_models():
+    """Import every model module so all Document classes are registered"""
+    for name in MODEL_MODULES:
+        importlib.import_module(f'app.models.{name}')
+
+
+def document_classes():
+    """Concrete Document classes (no embedded or abstract ones)"""
+    return [
+        cls for cls in _document_registry.values()
+        if issubclass(cls, Document) and not cls._meta.get('abstract')
+    ]
+
+
+def set_auto_create_index(enabled):
+    for cls in document_classes():
+        cls._meta['auto_create_index'] = enabled
+
+
+def reset_after_fork():
+    """
+    Forget the parent's MongoClient in a freshly forked child
+    Not disconnect(): closing would end sessions the parent still uses.
+    The registered settings stay, so the next query connects again.
+    """
+    if me_connection._connections.pop(ALIAS, None) is None and ALIAS not in me_connection._dbs:
+        return
+    me_connection._dbs.pop(ALIAS, None)
+    # documents cache their Collection, which points at the old client
+    for cls in _get_documents_by_db(ALIAS, ALIAS):
+        if issubclass(cls, Document):
+            cls._disconnect()
+
+
+def _install_fork_hook():
+    global _fork_hook_installed
+    with _fork_hook_lock:
+        if not _fork_hook_installed and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=reset_after_fork)
+            _fork_hook_installed = True
+
+
+def init_db(app):
+    """Register the pooled connection and the create-indexes command (no I/O)"""
+    config = app.config
+
+    # a connection set up earlier (tests, scripts) wins
+    if ALIAS not in me_connection._connection_settings:
+        me_connection.register_connection(ALIAS, **connection_settings(config))
+
+    import_models()
+    set_auto_create_index(config['MONGO_AUTO_CREATE_INDEX'])
+    _install_fork_hook()
+
+    @app.cli.command('create-indexes')
+    def create_indexes_command():
+        """Create the indexes declared in every model's meta"""
+        for name in ensure_indexes():
+            print(f"indexes ok: {name}")
+
+
+def ensure_indexes():
+    """Create the declared indexes of every model, returns the collection names"""
+    import_models()
+    names = []
+    for cls in sorted(document_classes(), key=lambda c: c._get_collection_name() or ''):
+        cls.ensure_indexes()
+        names.append(cls._get_collection_name())
+    return names
+
+
+def ping():
+    """Round trip to the server (readiness checks)"""
+    return me_connection.get_db(ALIAS).command('ping')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB maintenance")
+    parser.add_argument('--create-indexes', action='store_true', help="create every model's indexes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from ..config import get_config
+    config_class = get_config()
+    config = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+    me_connection.connect(alias=ALIAS, **connection_settings(config))
+
+    if not args.create_indexes:
+        parser.print_help()
+        return
+
+    for name in ensure_indexes():
+        print(f"indexes ok: {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Batch dereferencing helpers
+
+mongoengine dereferences ReferenceFields lazily - one query per reference the
+first time you touch it. Serializing a list of documents that way is a classic
+N+1. These helpers let a route collect all the referenced ids first (straight
+from the raw document data, no queries) and then fetch them with a single $in
+query that only pulls the fields the serializer needs.
+"""
+from bson import DBRef, ObjectId
+from mongoengine import Document
+
+
+def ref_id(value):
+    """Get the ObjectId out of a reference without dereferencing it"""
+    if value is None:
+        return None
+    if isinstance(value, (DBRef, Document)):
+        return value.id
+    if isinstance(value, ObjectId):
+        return value
+    # anything else with an id (e.g. a lightweight principal object)
+    return getattr(value, 'id', value)
+
+
+def raw_ref(document, field):
+    """Id stored in a ReferenceField, read from the raw data (no query)"""
+    return ref_id(document._data.get(field))
+
+
+def raw_refs(document, field):
+    """Ids stored in a ListField(ReferenceField), read from the raw data (no query)"""
+    return [ref_id(v) for v in (document._data.get(field) or [])]
+
+
+def fetch_many(model, ids, fields=None):
+    """
+    Load many documents with one $in query
+    Returns {id: document}; missing ids are simply not in the dict
+    """
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+
+    queryset = model.objects(id__in=list(ids))
+    if fields:
+        queryset = queryset.only(*fields)
+    return {doc.id: doc for doc in queryset}
+
+
+def collect_refs(documents, field, many=False):
+    """All distinct ids referenced by `field` across a result set"""
+    ids = set()
+    for document in documents:
+        if many:
+            ids.update(raw_refs(document, field))
+        else:
+            ids.add(raw_ref(document, field))
+    ids.discard(None)
+    return ids
@@ -0,0 +1,46 @@
+"""
+Sparse fieldsets for listing endpoints
+
+    ?view=summary              -> the model's SUMMARY_FIELDS
+    ?view=detail               -> everything (the default)
+    ?fields=name,slug,logo_url -> exactly these keys (plus id)
+
+The chosen keys are pushed down to MongoDB with .only() and the serializer
+builds just those keys, so a list page doesn't pay for descriptions, rules,
+schedules and FAQs it never shows.
+"""
+
+
+def parse_fieldset(args, model, default_view='detail'):
+    """
+    Work out which JSON keys a listing request wants
+    Returns a list of keys, or None for the full representation.
+    Raises ValueError on unknown fields / views.
+    """
+    fields = args.get('fields')
+    if fields:
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in model.JSON_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+        # id always comes first so the frontend can key on it
+        return ['id'] + [f for f in dict.fromkeys(requested) if f != 'id']
+
+    view = args.get('view', default_view)
+    if view == 'summary':
+        return list(model.SUMMARY_FIELDS)
+    if view == 'detail':
+        return None
+
+    raise ValueError("view must be 'summary' or 'detail'")
+
+
+def apply_fieldset(queryset, model, fields, extra=None):
+    """
+    Restrict a queryset to the database fields needed for `fields`
+    extra: fields the route itself needs, e.g. the pagination sort key
+    """
+    if fields is None:
+        return queryset
+    return queryset.only(*set(model.projection_for(fields)) | set(extra or []))
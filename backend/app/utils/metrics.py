@@ -0,0 +1,433 @@
+"""
+MongoDB command instrumentation and Prometheus metrics
+
+A pymongo CommandListener (registered globally by init_metrics() before any
+client is created) sees every command the driver sends. Each one is counted
+per command name and, when it happens during a request, also added to that
+request's QueryStats:
+
+    before_request   -> new QueryStats in a context variable
+    listener         -> commands += 1, db time, reply bytes
+    after_request    -> per-route histograms, budget warning, Server-Timing
+
+Everything is exposed in the Prometheus text format at GET /metrics. A
+request that sends more than QUERY_BUDGET commands is logged with its
+per-command breakdown, which is how N+1 loops in to_json() show up.
+
+Metrics are recorded in the worker process. With several gunicorn workers
+set METRICS_DIR (gunicorn.conf.py does): every worker writes a snapshot of
+its registry there every few seconds and at exit, and /metrics adds up its
+own live values and everyone else's snapshots, so whichever worker gets the
+scrape answers for all of them (other workers' values are up to
+METRICS_WRITE_INTERVAL old). Exited workers are folded into one file by the
+gunicorn master so their counts stay in the totals.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter as TallyCounter
+from contextvars import ContextVar
+
+import bson
+from flask import Response, g, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# latency buckets in seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# database commands per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _add(a, b):
+    """Sum two metric states: counter totals, or [bucket counts, sum, count]"""
+    if isinstance(a, list):
+        return [_add(x, y) for x, y in zip(a, b)]
+    return a + b
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def state(self):
+        """{label values: total} copy"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self, state=None):
+        items = sorted((self.state() if state is None else state).items())
+        for values, total in items:
+            yield f'{self.name}{_labels(self.labels, values)} {_number(total)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # one count per bucket plus +Inf, then sum and count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def state(self):
+        """{label values: [bucket counts, sum, count]} copy"""
+        with self._lock:
+            return {values: [[*s[0]], s[1], s[2]] for values, s in self._series.items()}
+
+    def samples(self, state=None):
+        items = sorted((self.state() if state is None else state).items())
+        for values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, values)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labels, values)} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """JSON-able state of every metric"""
+        return {
+            metric.name: [[list(values), value] for values, value in metric.state().items()]
+            for metric in self._metrics
+        }
+
+    def render(self, snapshots=()):
+        """Text format of this process's values plus other processes' snapshots"""
+        lines = []
+        for metric in self._metrics:
+            state = metric.state()
+            for snapshot in snapshots:
+                for values, value in snapshot.get(metric.name, ()):
+                    values = tuple(values)
+                    state[values] = _add(state[values], value) if values in state else value
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples(state))
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_snapshots(a, b):
+    merged = {}
+    for snapshot in (a, b):
+        for name, items in snapshot.items():
+            series = merged.setdefault(name, {})
+            for values, value in items:
+                values = tuple(values)
+                series[values] = _add(series[values], value) if values in series else value
+    return {name: [[list(v), value] for v, value in series.items()] for name, series in merged.items()}
+
+
+class MetricsDir:
+    """
+    Registry snapshots of every worker in one directory
+    Each process writes <pid>-<random>.json (atomically, via rename);
+    exited.json holds the sum of the workers that have exited.
+    """
+
+    EXITED = 'exited.json'
+
+    def __init__(self, path, registry=None, interval=None):
+        self.path = path
+        self.registry = registry
+        self.interval = interval or float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+        self._name = None
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _write_json(self, name, data):
+        tmp = os.path.join(self.path, f'.{name}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def _read_json(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # gone (folded into exited.json) or from an older format
+            return None
+
+    def write(self):
+        """Write this process's snapshot"""
+        if self._name is not None and self._pid == os.getpid():
+            self._write_json(self._name, self.registry.snapshot())
+
+    def others(self):
+        """Snapshots of every other process, exited ones included"""
+        snapshots = []
+        for name in os.listdir(self.path):
+            if name.endswith('.json') and name != self._name:
+                snapshot = self._read_json(name)
+                if snapshot:
+                    snapshots.append(snapshot)
+        return snapshots
+
+    def ensure_started(self):
+        # per process, like the other background threads - the master's doesn't survive a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._name = f'{self._pid}-{uuid.uuid4().hex[:8]}.json'
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.write)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                logger.exception("Could not write metrics snapshot to %s", self.path)
+
+    # ===== GUNICORN MASTER =====
+
+    def reset(self):
+        """Start from an empty directory (server start)"""
+        os.makedirs(self.path, exist_ok=True)
+        for name in os.listdir(self.path):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                os.remove(os.path.join(self.path, name))
+
+    def collect_exited(self, pid):
+        """Fold an exited worker's snapshot into exited.json"""
+        for name in os.listdir(self.path):
+            if name.startswith(f'{pid}-') and name.endswith('.json'):
+                snapshot = self._read_json(name)
+                if snapshot:
+                    self._write_json(self.EXITED, _merge_snapshots(self._read_json(self.EXITED) or {}, snapshot))
+                os.remove(os.path.join(self.path, name))
+
+
+registry = Registry()
+
+MONGO_COMMANDS = registry.register(Counter(
+    'mongo_commands_total', 'MongoDB commands sent', ['command']))
+MONGO_FAILURES = registry.register(Counter(
+    'mongo_command_failures_total', 'MongoDB commands that failed', ['command']))
+MONGO_DURATION = registry.register(Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command round trip time', ['command']))
+MONGO_REPLY_BYTES = registry.register(Counter(
+    'mongo_reply_bytes_total', 'Bytes of MongoDB replies', ['command']))
+
+HTTP_REQUESTS = registry.register(Counter(
+    'http_requests_total', 'HTTP requests', ['method', 'route', 'status']))
+HTTP_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route']))
+HTTP_MONGO_COMMANDS = registry.register(Histogram(
+    'http_request_mongo_commands', 'MongoDB commands per HTTP request', ['method', 'route'],
+    buckets=COUNT_BUCKETS))
+HTTP_MONGO_DURATION = registry.register(Histogram(
+    'http_request_mongo_duration_seconds', 'MongoDB time per HTTP request', ['method', 'route']))
+HTTP_MONGO_REPLY_BYTES = registry.register(Counter(
+    'http_request_mongo_reply_bytes_total', 'Bytes of MongoDB replies read by HTTP requests',
+    ['method', 'route']))
+QUERY_BUDGET_EXCEEDED = registry.register(Counter(
+    'http_query_budget_exceeded_total', 'Requests that sent more MongoDB commands than QUERY_BUDGET',
+    ['method', 'route']))
+
+
+class QueryStats:
+    """MongoDB work done on behalf of one request"""
+
+    __slots__ = ('commands', 'duration', 'reply_bytes', 'by_command')
+
+    def __init__(self):
+        self.commands = 0
+        self.duration = 0.0
+        self.reply_bytes = 0
+        self.by_command = TallyCounter()
+
+
+# stats of the request being handled in this thread / greenlet
+_current_stats = ContextVar('mongo_query_stats', default=None)
+
+
+def current_query_stats():
+    return _current_stats.get()
+
+
+class QueryListener(monitoring.CommandListener):
+    """Counts every command globally and against the current request"""
+
+    def __init__(self, measure_replies=True):
+        # encoding replies again to measure them costs CPU, it can be switched off
+        self.measure_replies = measure_replies
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        size = len(bson.encode(event.reply)) if self.measure_replies and event.reply else 0
+        self._record(event.command_name, seconds, size)
+
+    def failed(self, event):
+        MONGO_FAILURES.inc(event.command_name)
+        self._record(event.command_name, event.duration_micros / 1e6, 0)
+
+    def _record(self, command, seconds, size):
+        MONGO_COMMANDS.inc(command)
+        MONGO_DURATION.observe(seconds, command)
+        if size:
+            MONGO_REPLY_BYTES.inc(command, amount=size)
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.duration += seconds
+            stats.reply_bytes += size
+            stats.by_command[command] += 1
+
+
+_listener = None
+
+
+def install_listener(measure_replies=True):
+    """Register the listener once per process (affects clients created afterwards)"""
+    global _listener
+    if _listener is None:
+        _listener = QueryListener(measure_replies=measure_replies)
+        monitoring.register(_listener)
+    return _listener
+
+
+def init_metrics(app):
+    """Per-request query stats, the query budget warning and GET /metrics"""
+    app.config.setdefault('QUERY_BUDGET', int(os.getenv('QUERY_BUDGET', 25)))
+    app.config.setdefault('METRICS_TOKEN', os.getenv('METRICS_TOKEN'))
+    app.config.setdefault('METRICS_DIR', os.getenv('METRICS_DIR'))
+    app.config.setdefault('QUERY_STATS_HEADER', os.getenv('QUERY_STATS_HEADER', '').lower() == 'true')
+    install_listener(measure_replies=os.getenv('MONGO_METRICS_REPLY_BYTES', 'true').lower() == 'true')
+
+    shared = None
+    if app.config['METRICS_DIR']:
+        shared = MetricsDir(app.config['METRICS_DIR'], registry)
+        os.makedirs(shared.path, exist_ok=True)
+
+    @app.before_request
+    def start_query_stats():
+        if shared is not None:
+            shared.ensure_started()
+        g.query_stats_token = _current_stats.set(QueryStats())
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_query_stats(response):
+        stats = _current_stats.get()
+        started = g.pop('request_started', None)
+        if stats is None or started is None:
+            return response
+
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        if route == '/metrics':
+            return response
+
+        method = request.method
+        HTTP_REQUESTS.inc(method, route, str(response.status_code))
+        HTTP_DURATION.observe(time.perf_counter() - started, method, route)
+        HTTP_MONGO_COMMANDS.observe(stats.commands, method, route)
+        HTTP_MONGO_DURATION.observe(stats.duration, method, route)
+        if stats.reply_bytes:
+            HTTP_MONGO_REPLY_BYTES.inc(method, route, amount=stats.reply_bytes)
+
+        budget = app.config['QUERY_BUDGET']
+        if budget and stats.commands > budget:
+            QUERY_BUDGET_EXCEEDED.inc(method, route)
+            logger.warning(
+                "%s %s sent %d MongoDB commands (budget %d, %.1fms, %d bytes): %s",
+                method, route, stats.commands, budget, stats.duration * 1000, stats.reply_bytes,
+                ', '.join(f'{name}={n}' for name, n in stats.by_command.most_common())
+            )
+
+        if app.config['QUERY_STATS_HEADER']:
+            response.headers['Server-Timing'] = f'db;dur={stats.duration * 1000:.1f};desc="{stats.commands} queries"'
+        return response
+
+    @app.teardown_request
+    def clear_query_stats(exc=None):
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            try:
+                _current_stats.reset(token)
+            except ValueError:
+                # torn down in another context (e.g. a streamed response)
+                _current_stats.set(None)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        snapshots = shared.others() if shared is not None else ()
+        return Response(registry.render(snapshots), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination
+
+Instead of skip/limit - which makes MongoDB walk past every skipped document
+and shifts pages when new documents are inserted - each page is fetched with
+a range query on an indexed sort key plus _id as tie breaker:
+
+    (sort_key > last_value) OR (sort_key == last_value AND _id > last_id)
+
+The last (value, id) pair is handed to the client as an opaque cursor token,
+so page 1000 costs the same as page 1.
+"""
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine.queryset.visitor import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token can't be decoded"""
+
+
+def encode_cursor(value, last_id):
+    """Build an opaque cursor token from the last row of a page"""
+    if isinstance(value, datetime):
+        payload = ['dt', value.isoformat(), str(last_id)]
+    else:
+        payload = ['v', value, str(last_id)]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor - returns (value, last_id)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        kind, value, last_id = json.loads(raw)
+        if kind == 'dt':
+            value = datetime.fromisoformat(value)
+        return value, ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def parse_limit(args, default, maximum):
+    """
+    Page size from ?limit=, clamped to 1..maximum
+    0 or a negative value would mean "no limit" to MongoDB, and an empty
+    page can't produce a cursor.
+    """
+    return max(1, min(int(args.get('limit', default)), maximum))
+
+
+def keyset_page(queryset, sort_field, limit, cursor=None):
+    """
+    Fetch one page ordered by (sort_field, _id) ascending
+    Returns (documents, next_cursor) - next_cursor is None on the last page.
+    The queryset must load `sort_field` (keep it in any .only() projection).
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{sort_field}__gt': value}) |
+            Q(**{sort_field: value, 'id__gt': last_id})
+        )
+
+    limit = max(1, limit)
+
+    # one extra row tells us whether there is another page
+    documents = list(queryset.order_by(sort_field, 'id').limit(limit + 1))
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+
+    return documents, next_cursor
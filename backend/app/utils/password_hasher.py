@@ -0,0 +1,104 @@
+"""
+Password hashing off the request path
+
+bcrypt is deliberately slow, and doing it inline means a login storm pins
+every gunicorn worker thread on CPU. Hashing and checking run in a small
+bounded pool instead:
+
+- PASSWORD_HASH_WORKERS   pool size (default: number of CPUs)
+- PASSWORD_HASH_QUEUE     max jobs running + waiting before we push back
+- PASSWORD_HASH_TIMEOUT   seconds to wait for a free slot before giving up
+- PASSWORD_HASH_EXECUTOR  'thread' (default - bcrypt releases the GIL) or 'process'
+- BCRYPT_ROUNDS           cost factor for new hashes (default 12)
+
+When the queue is full HasherBusy is raised so the route can answer 503
+quickly instead of piling up requests. Hashes made with another algorithm
+(old werkzeug pbkdf2/scrypt hashes) or another cost are reported by
+needs_rehash() so they can be upgraded at the next successful login.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from werkzeug.security import check_password_hash
+
+
+class HasherBusy(Exception):
+    """Too many password operations in flight - try again later"""
+
+
+def _bcrypt_hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def _verify(password, hashed):
+    if hashed.startswith('$2'):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('ascii'))
+    # legacy werkzeug hash (pbkdf2:... / scrypt:...)
+    return check_password_hash(hashed, password)
+
+
+class PasswordHasher:
+    """Bounded pool for bcrypt work"""
+
+    def __init__(self, rounds=None, workers=None, max_pending=None, timeout=None, executor=None):
+        self.rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+        self.workers = workers or int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+        self.max_pending = max_pending or int(os.getenv('PASSWORD_HASH_QUEUE', self.workers * 4))
+        self.timeout = timeout if timeout is not None else float(os.getenv('PASSWORD_HASH_TIMEOUT', 2))
+        self.executor_type = executor or os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # created lazily and per process - pools don't survive a fork
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    pool = ProcessPoolExecutor if self.executor_type == 'process' else ThreadPoolExecutor
+                    self._executor = pool(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """bcrypt hash with the configured cost"""
+        return self._run(_bcrypt_hash, password, self.rounds)
+
+    def verify(self, password, hashed):
+        """Check a password against a bcrypt or legacy werkzeug hash"""
+        if not hashed:
+            return False
+        return self._run(_verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """True if `hashed` isn't bcrypt with the configured cost"""
+        if not hashed or not hashed.startswith('$2'):
+            return True
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# shared per-process hasher
+password_hasher = PasswordHasher()
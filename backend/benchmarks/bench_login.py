@@ -0,0 +1,82 @@
+"""
+Login throughput benchmark for the password hashing pool
+
+Simulates a login storm: `--clients` request threads (think gunicorn
+threads) each verify passwords as fast as they can, once with bcrypt called
+inline and once through the bounded PasswordHasher pool. Reports logins per
+second, latency percentiles and how many requests were shed with HasherBusy.
+
+    cd backend
+    python -m benchmarks.bench_login --clients 32 --logins 400 --rounds 10
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.password_hasher import PasswordHasher, HasherBusy, _verify
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(label, verify, password, hashed, clients, logins):
+    timings, busy = [], 0
+
+    def one_login(_):
+        t0 = time.perf_counter()
+        try:
+            ok = verify(password, hashed)
+        except HasherBusy:
+            return None
+        assert ok
+        return (time.perf_counter() - t0) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as request_threads:
+        for result in request_threads.map(one_login, range(logins)):
+            if result is None:
+                busy += 1
+            else:
+                timings.append(result)
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    print(f"{label:<8} {len(timings) / elapsed:8.1f} logins/s  "
+          f"p50={percentile(timings, 50):7.1f}ms  "
+          f"p95={percentile(timings, 95):7.1f}ms  "
+          f"p99={percentile(timings, 99):7.1f}ms  "
+          f"shed={busy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32, help="concurrent request threads")
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--rounds', type=int, default=10, help="bcrypt cost")
+    parser.add_argument('--workers', type=int, default=None, help="hasher pool size")
+    parser.add_argument('--queue', type=int, default=None, help="hasher max pending jobs")
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(
+        rounds=args.rounds,
+        workers=args.workers,
+        max_pending=args.queue,
+        executor=args.executor
+    )
+    password = 'correct horse battery staple'
+    hashed = hasher.hash(password)
+
+    print(f"bcrypt cost={args.rounds}, {args.clients} clients, {args.logins} logins, "
+          f"pool={hasher.workers} {args.executor}s, queue={hasher.max_pending}")
+    run('inline', _verify, password, hashed, args.clients, args.logins)
+    run('pool', hasher.verify, password, hashed, args.clients, args.logins)
+    hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
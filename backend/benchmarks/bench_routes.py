@@ -0,0 +1,470 @@
+"""
+Route benchmarks against a seeded dataset, with a regression baseline
+
+Seeds a throwaway database with `--users` users, `--orgs` organizations and
+`--hackathons` hackathons (plus org members and registrations), then drives
+the blueprint routes in-process through Flask's test client. For every route
+it reports latency percentiles and MongoDB commands per request (read from the
+Server-Timing header written by utils/metrics.py).
+
+The results are compared with a stored baseline (benchmarks/baseline_routes.json):
+
+    queries    more commands per request than the baseline fails the run,
+               whatever the dataset sizes - an N+1 in to_json() shows up here
+               first - but only against a baseline from the same backend
+    latency    p95 above baseline * (1 + --tolerance), and at least
+               --min-delta-ms slower, fails the run - only compared between
+               runs on a real server with the same dataset sizes
+
+    cd backend
+    python -m benchmarks.bench_routes --mongomock
+    python -m benchmarks.bench_routes --uri mongodb://localhost:27017/thonhub_bench --hackathons 2000
+    python -m benchmarks.bench_routes --mongomock --write-baseline
+
+mongomock runs are smoke runs. Their query counts are collection calls
+(count_mongomock_commands), not wire commands: a server run also counts the
+getMore / killCursors of every cursor, so the two are never compared with
+each other. The committed baseline is a mongomock one; gate a server run by
+writing a baseline from it (--write-baseline --baseline <file>). mongomock
+latencies are printed but never gated on. The database is dropped before
+seeding, so --uri has to point at a database whose name ends in _bench or _test.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import wraps
+from pathlib import Path
+
+import mongoengine
+from bson import ObjectId
+from pymongo.uri_parser import parse_uri
+
+DEFAULT_URI = 'mongodb://localhost:27017/thonhub_bench'
+DEFAULT_BASELINE = Path(__file__).with_name('baseline_routes.json')
+
+WORDS = (
+    'climate ai health fintech web3 robotics space education open source data '
+    'privacy security mobile cloud games music civic energy food mobility'
+).split()
+SKILLS = ['python', 'javascript', 'react', 'go', 'rust', 'ml', 'design', 'devops', 'sql', 'flutter']
+COUNTRIES = ['India', 'USA', 'Germany', 'Brazil', 'Nigeria', 'Japan', 'Canada']
+MODES = ['online', 'offline', 'hybrid']
+
+SERVER_TIMING = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ---------------------------------------------------------------------------
+# database
+
+def connect(args):
+    from app.utils.metrics import install_listener
+
+    # pymongo only reports to listeners registered before the client exists
+    install_listener()
+
+    if args.mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--mongomock needs the mongomock package (pip install mongomock)")
+        mongoengine.connect('thonhub_bench', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+        count_mongomock_commands(mongomock.collection.Collection)
+        return 'mongomock'
+
+    database = parse_uri(args.uri).get('database') or ''
+    if not database.endswith(('_bench', '_test')):
+        sys.exit(f"refusing to drop database {database!r}: use a *_bench or *_test database")
+    mongoengine.connect(host=args.uri)
+    return 'mongodb'
+
+
+# collection methods that are one command each on a real server
+MONGOMOCK_COMMANDS = {
+    'find': 'find', 'find_one': 'find', 'aggregate': 'aggregate', 'distinct': 'distinct',
+    'count_documents': 'aggregate', 'estimated_document_count': 'count',
+    'insert_one': 'insert', 'insert_many': 'insert', 'bulk_write': 'bulk_write',
+    'update_one': 'update', 'update_many': 'update', 'replace_one': 'update',
+    'delete_one': 'delete', 'delete_many': 'delete',
+    'find_one_and_update': 'findAndModify', 'find_one_and_replace': 'findAndModify',
+    'find_one_and_delete': 'findAndModify',
+}
+
+_in_command = ContextVar('bench_in_command', default=False)
+
+
+def count_mongomock_commands(collection_class):
+    """
+    mongomock never talks to pymongo, so the metrics CommandListener sees
+    nothing. Count its collection calls against the request's QueryStats
+    instead (outermost call only - find_one() goes through find()).
+    """
+    from app.utils.metrics import current_query_stats
+
+    def counted(command, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if _in_command.get():
+                return method(*args, **kwargs)
+            stats = current_query_stats()
+            if stats is not None:
+                stats.commands += 1
+                stats.by_command[command] += 1
+            token = _in_command.set(True)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _in_command.reset(token)
+        return wrapper
+
+    for name, command in MONGOMOCK_COMMANDS.items():
+        if hasattr(collection_class, name):
+            setattr(collection_class, name, counted(command, getattr(collection_class, name)))
+
+
+def insert_documents(documents):
+    """Validate and bulk insert, skipping save() and its signal handlers"""
+    if not documents:
+        return
+    for doc in documents:
+        doc.validate()
+    documents[0]._get_collection().insert_many([doc.to_mongo() for doc in documents], ordered=False)
+
+
+def seed(args, rng):
+    """Fill the database, returns the ids the scenarios need"""
+    from app.models.hackathon import Hackathon, Prize, Schedule, Track
+    from app.models.org import Organization
+    from app.models.registration import Registration
+    from app.models.user import User
+
+    now = datetime.utcnow().replace(microsecond=0)
+
+    def words(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    users = []
+    for i in range(args.users):
+        xp = rng.randint(0, 5000)
+        users.append(User(
+            id=ObjectId(),
+            email=f'bench{i}@example.com',
+            username=f'bench{i}',
+            password_hash='!',  # nobody logs in, tokens are minted directly
+            first_name=f'First{i}',
+            last_name=f'Last{i}',
+            country=rng.choice(COUNTRIES),
+            skills=rng.sample(SKILLS, 3),
+            interests=rng.sample(WORDS, 3),
+            learning=rng.sample(SKILLS, 2),
+            years_of_experience=rng.randint(0, 15),
+            xp=xp,
+            level=xp // 100 + 1,
+            referral_code=f'BENCH{i:07d}',
+            created_at=now - timedelta(days=rng.randint(0, 700)),
+        ))
+    insert_documents(users)
+    user_ids = [u.id for u in users]
+
+    orgs, org_people = [], []
+    for i in range(args.orgs):
+        people = rng.sample(user_ids, min(len(user_ids), args.members + 3))
+        org_people.append(people)
+        orgs.append(Organization(
+            id=ObjectId(),
+            name=f'Bench Org {i}',
+            slug=f'bench-org-{i}',
+            email=f'org{i}@example.com',
+            description=words(20),
+            city=rng.choice(WORDS).title(),
+            country=rng.choice(COUNTRIES),
+            owner=people[0],
+            admins=people[1:3],
+            members=people[3:],
+            is_verified=i % 3 == 0,
+            created_at=now - timedelta(days=args.orgs - i),
+            updated_at=now,
+        ))
+    insert_documents(orgs)
+
+    # hackathons go through save(): status planning, search and calendar hooks
+    hackathon_ids = []
+    for i in range(args.hackathons):
+        n = rng.randrange(len(orgs)) if orgs else None
+        org = orgs[n] if orgs else None
+        start = now + timedelta(days=rng.randint(-30, 120), hours=rng.randint(0, 23))
+        hackathon = Hackathon(
+            name=f'{words(2).title()} Hack {i}',
+            slug=f'bench-hack-{i}',
+            tagline=words(6),
+            description=words(120),
+            theme=words(2),
+            organization=org,
+            created_by=org_people[n][0] if orgs else rng.choice(user_ids),
+            organizers=rng.sample(user_ids, 2),
+            judges=rng.sample(user_ids, 3),
+            registration_start=start - timedelta(days=30),
+            registration_deadline=start - timedelta(days=1),
+            start_date=start,
+            end_date=start + timedelta(hours=48),
+            submission_deadline=start + timedelta(hours=46),
+            mode=rng.choice(MODES),
+            city=rng.choice(WORDS).title(),
+            country=rng.choice(COUNTRIES),
+            max_participants=args.registrations * 4,
+            prizes=[Prize(position=str(p), title=f'Prize {p}', amount=1000 / p) for p in (1, 2, 3)],
+            tracks=[Track(name=w.title()) for w in rng.sample(WORDS, 3)],
+            schedule=[
+                Schedule(title='Opening', start_time=start),
+                Schedule(title='Demos', start_time=start + timedelta(hours=47)),
+            ],
+            hashtags=rng.sample(WORDS, 2),
+            is_published=i % 10 != 0,
+            is_featured=i % 7 == 0,
+            published_at=now,
+        )
+        hackathon.save()
+        hackathon_ids.append(hackathon.id)
+
+    registrations = []
+    for hackathon_id in hackathon_ids:
+        for user_id in rng.sample(user_ids, min(len(user_ids), args.registrations)):
+            registrations.append(Registration(
+                hackathon=hackathon_id, user=user_id, status='approved', registered_at=now
+            ))
+    insert_documents(registrations)
+    per_hackathon = min(len(user_ids), args.registrations)
+    Hackathon.objects(id__in=hackathon_ids).update(set__registration_count=per_hackathon)
+
+    published = [d['_id'] for d in Hackathon.objects(is_published=True).only('id').as_pymongo()]
+    return {
+        'user_ids': user_ids,
+        'org_id': orgs[0].id,
+        # owner, two admins, then members
+        'org_people': org_people[0],
+        'hackathon_ids': published,
+    }
+
+
+# ---------------------------------------------------------------------------
+# scenarios
+
+def scenarios(data, rng):
+    """
+    name -> (method, path or callable(i) returning (path, json body), auth user id)
+    They run in this order, so a removal undoes the additions before it.
+    """
+    org_id = str(data['org_id'])
+    owner = str(data['org_people'][0])
+    in_org = set(data['org_people'])
+    outsiders = [str(u) for u in data['user_ids'] if u not in in_org]
+    hackathon_ids = [str(h) for h in data['hackathon_ids']]
+
+    def hackathon_detail(i):
+        return f'/api/hackathons/{hackathon_ids[i % len(hackathon_ids)]}', None
+
+    def add_member(i):
+        return f'/api/orgs/{org_id}/members', {'user_id': outsiders[i % len(outsiders)]}
+
+    def remove_member(i):
+        return f'/api/orgs/{org_id}/members/{outsiders[i % len(outsiders)]}', None
+
+    def add_members_bulk(i):
+        start = (i * 10) % max(1, len(outsiders) - 10)
+        return f'/api/orgs/{org_id}/members', {'user_ids': outsiders[start:start + 10]}
+
+    word = rng.choice(WORDS)
+    return {
+        'hackathons.list': ('GET', '/api/hackathons/?limit=20', None),
+        'hackathons.list_detail': ('GET', '/api/hackathons/?limit=20&view=detail', None),
+        'hackathons.search': ('GET', f'/api/hackathons/search?q={word}', None),
+        'hackathons.detail': ('GET', hackathon_detail, None),
+        'orgs.list': ('GET', '/api/orgs/?limit=50', None),
+        'orgs.list_detail': ('GET', '/api/orgs/?limit=50&view=detail', None),
+        'orgs.detail': ('GET', f'/api/orgs/{org_id}', None),
+        'orgs.members': ('GET', f'/api/orgs/{org_id}/members', None),
+        'orgs.add_member': ('POST', add_member, owner),
+        'orgs.remove_member': ('DELETE', remove_member, owner),
+        'orgs.add_members_bulk': ('POST', add_members_bulk, owner),
+        'users.leaderboard': ('GET', '/api/leaderboard?limit=100', None),
+        'users.teammates': ('GET', '/api/teammates?skills=python,ml', owner),
+        'notifications.list': ('GET', '/api/notifications/', owner),
+        'calendar.events': ('GET', '/api/calendar/events', None),
+    }
+
+
+def run_scenario(client, method, target, token, warmup, requests):
+    """Returns (timings in ms, commands per request, error message or None)"""
+    from app.routes.orgs import org_cache
+
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    timings, queries = [], []
+
+    for i in range(warmup + requests):
+        path, body = target(i) if callable(target) else (target, None)
+        # measure the route, not the response cache in front of it
+        org_cache.clear()
+
+        t0 = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers=headers)
+        elapsed = (time.perf_counter() - t0) * 1000
+
+        if response.status_code >= 400:
+            return timings, queries, f'{response.status_code} {response.get_data(as_text=True)[:200]}'
+        if i < warmup:
+            continue
+
+        timings.append(elapsed)
+        match = SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        queries.append(int(match.group(1)) if match else 0)
+
+    return timings, queries, None
+
+
+# ---------------------------------------------------------------------------
+# baseline
+
+def compare(results, baseline, dataset, tolerance, min_delta_ms):
+    """Returns the list of regressions (empty when the run passes)"""
+    regressions = []
+    baseline_backend = baseline.get('dataset', {}).get('backend')
+    if baseline_backend != dataset['backend']:
+        print(f"baseline is from {baseline_backend}, this run used {dataset['backend']}: nothing compared "
+              f"(write a baseline from a {dataset['backend']} run with --write-baseline --baseline <file>)")
+        return regressions
+
+    same_dataset = baseline.get('dataset') == dataset and dataset['backend'] == 'mongodb'
+    if not same_dataset:
+        print("latency not compared (mongomock, or the baseline used another dataset): checking queries only")
+
+    for name, current in results.items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries per request (baseline {previous['queries']})")
+        if same_dataset:
+            limit = previous['p95'] * (1 + tolerance)
+            if current['p95'] > limit and current['p95'] - previous['p95'] >= min_delta_ms:
+                regressions.append(f"{name}: p95 {current['p95']:.2f}ms (baseline {previous['p95']:.2f}ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_BENCH_URI', DEFAULT_URI))
+    parser.add_argument('--mongomock', action='store_true', help="in-memory smoke run, no server needed")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--orgs', type=int, default=100)
+    parser.add_argument('--hackathons', type=int, default=300)
+    parser.add_argument('--members', type=int, default=50, help="members per organization")
+    parser.add_argument('--registrations', type=int, default=30, help="registrations per hackathon")
+    parser.add_argument('--requests', type=int, default=100, help="measured requests per route")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', default='', help="comma separated route names (prefix match)")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--write-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p95 slowdown (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="ignore p95 slowdowns smaller than this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    backend = connect(args)
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.utils.db import ensure_indexes
+
+    # the connection registered above wins over MONGODB_URI (utils/db.py)
+    app = create_app('testing')
+    app.config['QUERY_STATS_HEADER'] = True
+    app.config['JWT_SECRET_KEY'] = os.urandom(32).hex()
+
+    db = mongoengine.connection.get_db()
+    db.client.drop_database(db.name)
+    ensure_indexes()
+
+    started = time.perf_counter()
+    data = seed(args, rng)
+    print(f"seeded {args.users} users, {args.orgs} orgs, {args.hackathons} hackathons "
+          f"on {backend} in {time.perf_counter() - started:.1f}s")
+
+    with app.app_context():
+        owner = str(data['org_people'][0])
+        tokens = {owner: create_access_token(identity=owner)}
+
+    selected = [s for s in args.only.split(',') if s]
+    results = {}
+    failures = []
+    client = app.test_client()
+
+    for name, (method, target, auth) in scenarios(data, rng).items():
+        if selected and not any(name.startswith(s) for s in selected):
+            continue
+
+        timings, queries, error = run_scenario(
+            client, method, target, tokens.get(auth), args.warmup, args.requests
+        )
+        if error:
+            failures.append(f"{name}: {error}")
+            print(f"{name:<24} FAILED {error}")
+            continue
+
+        timings.sort()
+        results[name] = {
+            'p50': round(percentile(timings, 50), 3),
+            'p95': round(percentile(timings, 95), 3),
+            'p99': round(percentile(timings, 99), 3),
+            'queries': max(queries),
+        }
+        print(f"{name:<24} p50={results[name]['p50']:7.2f}ms  "
+              f"p95={results[name]['p95']:7.2f}ms  "
+              f"p99={results[name]['p99']:7.2f}ms  "
+              f"queries={results[name]['queries']}")
+
+    dataset = {
+        'backend': backend,
+        'users': args.users,
+        'orgs': args.orgs,
+        'hackathons': args.hackathons,
+        'members': args.members,
+        'registrations': args.registrations,
+    }
+
+    if args.write_baseline:
+        if failures:
+            sys.exit("not writing a baseline from a run with failing routes")
+        args.baseline.write_text(json.dumps({'dataset': dataset, 'routes': results}, indent=2) + '\n')
+        print(f"baseline written to {args.baseline}")
+        return
+
+    regressions = list(failures)
+    if args.baseline.exists():
+        regressions += compare(results, json.loads(args.baseline.read_text()), dataset,
+                               args.tolerance, args.min_delta_ms)
+    else:
+        print(f"no baseline at {args.baseline} (run with --write-baseline)")
+
+    if regressions:
+        print("\nREGRESSIONS")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Query latency benchmark for the in-process hackathon search index
+
+Builds the index straight from synthetic documents (no MongoDB needed) and
+times a mix of one, two and three word queries, with and without filters.
+
+    cd backend
+    python -m benchmarks.bench_search --docs 100000 --queries 2000
+"""
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from app.services.search_service import SearchIndex
+
+WORDS = (
+    'ai ml web3 blockchain climate health fintech edtech iot robotics cloud '
+    'security data vision nlp mobile game sustainability energy water food '
+    'agriculture space quantum open source devtools api react python rust '
+    'go java kotlin swift flutter design accessibility social impact women '
+    'students beginners global hack build ship innovate future smart city '
+    'mobility transport finance payments privacy identity chat community'
+).split()
+
+MODES = ['online', 'offline', 'hybrid']
+STATUSES = ['published', 'registration_open', 'registration_closed', 'ongoing', 'completed']
+COUNTRIES = ['India', 'USA', 'Germany', 'Brazil', 'Nigeria', 'Japan', 'Canada']
+
+
+def fake_hackathon(rng):
+    def words(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    return {
+        '_id': ObjectId(),
+        'name': f"{words(2).title()} Hack {rng.randint(1, 9999)}",
+        'tagline': words(6),
+        'theme': words(2),
+        'description': words(rng.randint(40, 120)),
+        'tracks': [{'name': words(2)} for _ in range(rng.randint(1, 4))],
+        'hashtags': [rng.choice(WORDS) for _ in range(3)],
+        'mode': rng.choice(MODES),
+        'status': rng.choice(STATUSES),
+        'country': rng.choice(COUNTRIES),
+        'is_published': True
+    }
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SearchIndex()
+
+    started = time.perf_counter()
+    for _ in range(args.docs):
+        index.add(fake_hackathon(rng))
+    index.built = True
+    print(f"indexed {args.docs} docs in {time.perf_counter() - started:.1f}s "
+          f"({len(index._postings)} terms)")
+
+    timings = []
+    for i in range(args.queries):
+        query = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+        filters = {}
+        if i % 2:
+            filters = {'mode': rng.choice(MODES), 'country': rng.choice(COUNTRIES)}
+
+        t0 = time.perf_counter()
+        index.search(query, limit=20, **filters)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    timings.sort()
+    print(f"{args.queries} queries: "
+          f"p50={percentile(timings, 50):.2f}ms "
+          f"p95={percentile(timings, 95):.2f}ms "
+          f"p99={percentile(timings, 99):.2f}ms "
+          f"max={timings[-1]:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+gunicorn settings
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the app is imported once in the master and forked into the
+workers, so each worker starts without re-importing anything. That is safe
+because create_app() never opens a MongoDB connection (utils/db.py): every
+worker opens its own pool on its first query. Indexes are not created here -
+run `flask create-indexes` once per deploy.
+
+These are gthread workers: a request holds a thread until it finishes, so
+they must not serve long-lived chat streams. Those go to the gevent server
+in gunicorn_stream.conf.py; here at most CHAT_MAX_STREAMS per worker are
+accepted (keep it below GUNICORN_THREADS).
+
+Workers share their /metrics values through METRICS_DIR (a fresh temp
+directory per server unless set); the master clears it on start and folds
+in the counts of workers that exit.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# read by config.py when the app is loaded
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'thonhub-metrics-api'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# threads share the worker's MongoDB pool (MONGO_MAX_POOL_SIZE)
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    from app.utils.metrics import MetricsDir
+    MetricsDir(os.environ['METRICS_DIR']).reset()
+
+
+def child_exit(server, worker):
+    from app.utils.metrics import MetricsDir
+    MetricsDir(os.environ['METRICS_DIR']).collect_exited(worker.pid)
+
+
+def post_fork(server, worker):
+    # os.register_at_fork already does this; explicit in case the master
+    # touched the database while preloading
+    from app.utils.db import reset_after_fork
+    reset_after_fork()
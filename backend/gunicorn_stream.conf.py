@@ -0,0 +1,42 @@
+"""
+gunicorn settings for the live chat stream server
+
+    cd backend
+    gunicorn -c gunicorn_stream.conf.py wsgi:app
+
+GET /api/chat/<team_id>/stream keeps its connection open for minutes. On the
+API workers (gunicorn.conf.py, gthread) every open stream holds one of the
+worker's few threads, so they are capped there at CHAT_MAX_STREAMS. Run this
+server next to the API and route the stream path to it, e.g. in nginx:
+
+    location ~ ^/api/chat/[^/]+/stream$ { proxy_pass http://127.0.0.1:5001; proxy_buffering off; }
+
+gevent workers park an idle stream on a greenlet instead of a thread, so one
+worker holds thousands. Needs the `gevent` package; with more than one worker
+set CHAT_BROKER_URL so messages reach every worker (services/chat_broker.py).
+Its workers share /metrics values through their own METRICS_DIR, new for
+every start of this master. The master doesn't import the app (that would
+happen before gevent patches the workers), so unlike gunicorn.conf.py it
+has no hooks; stream workers aren't recycled, so none are needed.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# read by config.py when the app is loaded
+os.environ.setdefault('ENABLED_BLUEPRINTS', 'chat')
+os.environ.setdefault('CHAT_MAX_STREAMS', '0')
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'thonhub-metrics-stream-{os.getpid()}'))
+
+bind = os.getenv('GUNICORN_STREAM_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_STREAM_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('GUNICORN_STREAM_CONNECTIONS', 2000))
+# gevent patches the standard library in each worker; the app is imported after that
+preload_app = False
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'